@@ -0,0 +1,18 @@
+"""
+性能基准测试
+
+使用本地合成数据测量各处理阶段（解析、集合运算、规范化、快照、配置生成）的耗时和内存峰值，
+结果保存为 JSON，可与基线比较并在退化超过阈值时返回非零退出码。
+
+用法：python -m benchmark --help
+"""
+from .fixtures import build_fixtures
+from .runner import Benchmark, Regression, compare_results, run_benchmarks
+
+__all__ = [
+    'Benchmark',
+    'Regression',
+    'build_fixtures',
+    'compare_results',
+    'run_benchmarks',
+]
@@ -0,0 +1,262 @@
+"""
+基准测试数据
+
+按固定随机种子生成与真实数据源规模、格式相近的本地数据文件，
+生成结果缓存在数据目录中，种子和规模不变时直接复用。
+"""
+import json
+import os
+import random
+from typing import Dict, List, Tuple
+
+from utils.interval import IpVersion, format_ip
+
+FIXTURE_FORMAT = 2
+DEFAULT_SEED = 20240501
+
+# 各数据文件在 scale=1 时的规模，与真实数据源大致相当
+APNIC_IPV4_RECORDS = 48000
+APNIC_IPV6_RECORDS = 18000
+APNIC_ASN_RECORDS = 12000
+CLANG_IPV4_PREFIXES = 8000
+CLANG_IPV6_PREFIXES = 3000
+LARGE_PREFIXES = 1000000
+GOOGLE_PREFIXES = 100
+AWS_IPV4_PREFIXES = 9000
+AWS_IPV6_PREFIXES = 3000
+
+# 五大 RIR delegated-extended 文件的 (IPv4, IPv6, ASN) 记录数
+RIR_RECORDS = {
+    'afrinic': (6000, 3000, 2500),
+    'apnic': (48000, 18000, 12000),
+    'arin': (60000, 30000, 32000),
+    'lacnic': (14000, 14000, 12000),
+    'ripencc': (90000, 40000, 38000),
+}
+
+FIXTURE_FILES = {
+    'apnic': 'delegated-apnic-latest',
+    'clang_ipv4': 'all_cn_cidr.txt',
+    'clang_ipv6': 'all_cn_ipv6.txt',
+    'large': 'prefixes-1m.txt',
+    'google': 'goog.json',
+    'aws': 'ip-ranges.json',
+}
+FIXTURE_FILES.update(
+    (f'rir_{registry}', f'delegated-{registry}-extended-latest') for registry in RIR_RECORDS
+)
+
+_COUNTRIES = ('CN', 'CN', 'CN', 'JP', 'KR', 'AU', 'IN', 'HK', 'SG', 'TW', 'VN', 'ID')
+_RIR_COUNTRIES = {
+    'afrinic': ('ZA', 'EG', 'NG', 'KE', 'MA'),
+    'apnic': _COUNTRIES,
+    'arin': ('US', 'US', 'US', 'CA', 'PR'),
+    'lacnic': ('BR', 'BR', 'MX', 'AR', 'CL', 'CO'),
+    'ripencc': ('DE', 'GB', 'FR', 'NL', 'RU', 'IT', 'SE', 'US'),
+}
+_AWS_REGIONS = ('us-east-1', 'us-west-2', 'eu-west-1', 'ap-northeast-1', 'ap-east-1')
+
+
+def _random_prefixes(rng: random.Random, count: int, version: str) -> List[Tuple[int, int]]:
+    """生成对齐的随机网段，IPv4 以 /16～/24 为主，IPv6 位于 2400::/12 内"""
+    prefixes = []
+    for _ in range(count):
+        if version == 'ipv4':
+            prefix_len = min(32, max(8, int(rng.gauss(21, 3))))
+            value = rng.randrange(1 << 24, 224 << 24)
+            bits = 32
+        else:
+            prefix_len = min(64, max(20, int(rng.gauss(32, 5))))
+            value = (0x240 << 116) | rng.getrandbits(116)
+            bits = 128
+        host_mask = (1 << (bits - prefix_len)) - 1
+        prefixes.append((value & ~host_mask, prefix_len))
+    return prefixes
+
+
+def _write_prefix_list(path: str, prefixes: List[Tuple[int, int]], version: IpVersion) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        for value, prefix_len in prefixes:
+            f.write(f'{format_ip(value, version)}/{prefix_len}\n')
+
+
+def _write_delegated(path: str, rng: random.Random, scale: float) -> None:
+    """生成 RIR delegated 格式的分配数据"""
+    ipv4_count = max(1, int(APNIC_IPV4_RECORDS * scale))
+    ipv6_count = max(1, int(APNIC_IPV6_RECORDS * scale))
+    asn_count = max(1, int(APNIC_ASN_RECORDS * scale))
+    lines = [
+        '# synthetic delegated-apnic-latest for benchmarks',
+        f'2|apnic|20240501|{ipv4_count + ipv6_count + asn_count}|19830613|20240430|+1000',
+        f'apnic|*|asn|*|{asn_count}|summary',
+        f'apnic|*|ipv4|*|{ipv4_count}|summary',
+        f'apnic|*|ipv6|*|{ipv6_count}|summary',
+    ]
+    
+    for asn in rng.sample(range(1, 150000), asn_count):
+        lines.append(f'apnic|{rng.choice(_COUNTRIES)}|asn|{asn}|1|20100101|allocated')
+    
+    # IPv4 记录按地址递增且互不重叠，少量记录大小不是 2 的幂
+    start = 1 << 24
+    step = ((224 << 24) - start) // ipv4_count
+    for _ in range(ipv4_count):
+        size = 1 << rng.randint(8, 16)
+        if rng.random() < 0.05:
+            size += size // 2
+        size = min(size, step)
+        status = 'assigned' if rng.random() < 0.3 else 'allocated'
+        lines.append(
+            f'apnic|{rng.choice(_COUNTRIES)}|ipv4|{format_ip(start, "ipv4")}|{size}|20100101|{status}'
+        )
+        start += step
+    
+    for value, prefix_len in sorted(_random_prefixes(rng, ipv6_count, 'ipv6')):
+        lines.append(
+            f'apnic|{rng.choice(_COUNTRIES)}|ipv6|{format_ip(value, "ipv6")}|{prefix_len}|20100101|allocated'
+        )
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+        f.write('\n')
+
+
+def _write_rir_delegated(paths: Dict[str, str], rng: random.Random, scale: float) -> None:
+    """
+    生成五大 RIR 的 delegated-extended 数据
+    
+    各 RIR 的 IPv4 记录交错分布在同一地址空间中且互不重叠，与真实数据一样
+    按地址递增排列；另有少量国家代码为空的 available、reserved 记录。
+    """
+    registries = list(RIR_RECORDS)
+    counts = {
+        registry: tuple(max(1, int(count * scale)) for count in RIR_RECORDS[registry])
+        for registry in registries
+    }
+    records: Dict[str, Dict[str, List[str]]] = {
+        registry: {'asn': [], 'ipv4': [], 'ipv6': []} for registry in registries
+    }
+    
+    def record(registry: str, kind: str, value: str, size: int, status: str) -> str:
+        country = '' if status in ('available', 'reserved') else rng.choice(_RIR_COUNTRIES[registry])
+        date = '' if not country else '20100101'
+        return f'{registry}|{country}|{kind}|{value}|{size}|{date}|{status}|{rng.getrandbits(32):08x}'
+    
+    def statuses() -> str:
+        roll = rng.random()
+        return 'available' if roll < 0.03 else 'reserved' if roll < 0.05 else (
+            'assigned' if roll < 0.35 else 'allocated'
+        )
+    
+    # IPv4 和 ASN：按各 RIR 的记录数加权分配连续的地址槽
+    for kind, column, first, limit in (('ipv4', 0, 1 << 24, 224 << 24), ('asn', 2, 1, 400000)):
+        owners = [registry for registry in registries for _ in range(counts[registry][column])]
+        rng.shuffle(owners)
+        step = max(1, (limit - first) // len(owners))
+        for slot, registry in enumerate(owners):
+            start = first + slot * step
+            if kind == 'asn':
+                records[registry]['asn'].append(record(registry, 'asn', str(start), 1, 'allocated'))
+                continue
+            size = min(1 << rng.randint(8, 16), step)
+            records[registry]['ipv4'].append(
+                record(registry, 'ipv4', format_ip(start, 'ipv4'), size, statuses())
+            )
+    
+    for registry in registries:
+        prefixes = sorted(set(_random_prefixes(rng, counts[registry][1], 'ipv6')))
+        records[registry]['ipv6'] = [
+            record(registry, 'ipv6', format_ip(value, 'ipv6'), prefix_len, statuses())
+            for value, prefix_len in prefixes
+        ]
+        
+        total = sum(len(lines) for lines in records[registry].values())
+        with open(paths[f'rir_{registry}'], 'w', encoding='utf-8') as f:
+            f.write(f'2.3|{registry}|20240501|{total}|19830613|20240430|+0000\n')
+            for kind in ('asn', 'ipv4', 'ipv6'):
+                f.write(f'{registry}|*|{kind}|*|{len(records[registry][kind])}|summary\n')
+            for kind in ('asn', 'ipv4', 'ipv6'):
+                for line in records[registry][kind]:
+                    f.write(line)
+                    f.write('\n')
+
+
+def _write_google(path: str, rng: random.Random) -> None:
+    prefixes = []
+    for value, prefix_len in _random_prefixes(rng, GOOGLE_PREFIXES, 'ipv4'):
+        prefixes.append({'ipv4Prefix': f'{format_ip(value, "ipv4")}/{prefix_len}'})
+    for value, prefix_len in _random_prefixes(rng, GOOGLE_PREFIXES // 3, 'ipv6'):
+        prefixes.append({'ipv6Prefix': f'{format_ip(value, "ipv6")}/{prefix_len}'})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'syncToken': '1', 'creationTime': '2024-05-01T00:00:00', 'prefixes': prefixes}, f, indent=2)
+
+
+def _write_aws(path: str, rng: random.Random, scale: float) -> None:
+    prefixes = [
+        {
+            'ip_prefix': f'{format_ip(value, "ipv4")}/{prefix_len}',
+            'region': rng.choice(_AWS_REGIONS),
+            'service': 'AMAZON',
+            'network_border_group': 'us-east-1',
+        }
+        for value, prefix_len in _random_prefixes(rng, max(1, int(AWS_IPV4_PREFIXES * scale)), 'ipv4')
+    ]
+    ipv6_prefixes = [
+        {
+            'ipv6_prefix': f'{format_ip(value, "ipv6")}/{prefix_len}',
+            'region': rng.choice(_AWS_REGIONS),
+            'service': 'AMAZON',
+            'network_border_group': 'us-east-1',
+        }
+        for value, prefix_len in _random_prefixes(rng, max(1, int(AWS_IPV6_PREFIXES * scale)), 'ipv6')
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'syncToken': '1',
+            'createDate': '2024-05-01-00-00-00',
+            'prefixes': prefixes,
+            'ipv6_prefixes': ipv6_prefixes,
+        }, f, indent=2)
+
+
+def build_fixtures(directory: str, scale: float = 1.0, seed: int = DEFAULT_SEED) -> Dict[str, str]:
+    """
+    生成基准测试数据文件
+    
+    Args:
+        directory: 数据目录
+        scale: 规模系数，1 表示与真实数据源相当
+        seed: 随机种子
+        
+    Returns:
+        数据名称到文件路径的映射
+    """
+    paths = {name: os.path.join(directory, filename) for name, filename in FIXTURE_FILES.items()}
+    manifest_path = os.path.join(directory, 'manifest.json')
+    manifest = {'format': FIXTURE_FORMAT, 'seed': seed, 'scale': scale}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == manifest and all(os.path.exists(p) for p in paths.values()):
+                return paths
+    except (OSError, ValueError):
+        pass
+    
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    _write_delegated(paths['apnic'], rng, scale)
+    _write_prefix_list(
+        paths['clang_ipv4'], _random_prefixes(rng, max(1, int(CLANG_IPV4_PREFIXES * scale)), 'ipv4'), 'ipv4'
+    )
+    _write_prefix_list(
+        paths['clang_ipv6'], _random_prefixes(rng, max(1, int(CLANG_IPV6_PREFIXES * scale)), 'ipv6'), 'ipv6'
+    )
+    _write_prefix_list(
+        paths['large'], _random_prefixes(rng, max(1, int(LARGE_PREFIXES * scale)), 'ipv4'), 'ipv4'
+    )
+    _write_google(paths['google'], rng)
+    _write_aws(paths['aws'], rng, scale)
+    # 单独的随机序列，其他数据文件的内容不受影响
+    _write_rir_delegated(paths, random.Random(seed + 1), scale)
+    
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return paths
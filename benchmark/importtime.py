@@ -0,0 +1,148 @@
+"""
+启动导入耗时检查
+
+用 python -X importtime 运行 main.py --help，扣除裸解释器启动（python -c pass）
+本身导入的模块后，统计命令行自身引入的模块及其导入耗时，并与
+benchmark/importtime_budget.json 中记录的预算比较：
+
+    forbidden      --help 时不允许加载的模块（如 requests、loguru）
+    max_import_ms  命令行自身导入耗时之和的上限（毫秒）
+
+同时报告相对裸解释器启动的墙钟时间开销，仅作参考，不参与判断。
+
+用法：python -m benchmark.importtime [--help]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(ROOT, 'benchmark', 'importtime_budget.json')
+DEFAULT_REPEAT = 5
+
+
+def _import_times(args: List[str]) -> Dict[str, int]:
+    """
+    运行一次 python -X importtime 并解析输出
+    
+    Args:
+        args: 解释器参数
+        
+    Returns:
+        模块名到自身导入耗时（微秒）的映射
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + args,
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 表头
+        times[fields[2].strip()] = int(fields[0])
+    return times
+
+
+def _wall_time(args: List[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def measure_startup(argv: List[str], repeat: int = DEFAULT_REPEAT) -> Tuple[Dict[str, int], float, float]:
+    """
+    测量命令行启动的导入开销
+    
+    Args:
+        argv: 传给 main.py 的参数
+        repeat: 重复次数，导入耗时取每个模块的最小值，墙钟时间取中位数
+        
+    Returns:
+        (命令行自身导入的模块及耗时（微秒）, 墙钟时间（秒）, 裸解释器墙钟时间（秒）)
+    """
+    bare = set(_import_times(['-c', 'pass']))
+    command = ['main.py'] + argv
+    modules: Dict[str, int] = {}
+    for _ in range(repeat):
+        for name, self_us in _import_times(command).items():
+            if name not in bare:
+                modules[name] = min(self_us, modules.get(name, self_us))
+    
+    wall = statistics.median(_wall_time(command) for _ in range(repeat))
+    bare_wall = statistics.median(_wall_time(['-c', 'pass']) for _ in range(repeat))
+    return modules, wall, bare_wall
+
+
+def check_budget(modules: Dict[str, int], budget: Dict[str, Any]) -> List[str]:
+    """
+    检查导入结果是否超出预算
+    
+    Args:
+        modules: measure_startup 返回的模块耗时
+        budget: 预算，包含 forbidden 和 max_import_ms
+        
+    Returns:
+        违反预算的说明，为空表示通过
+    """
+    violations = []
+    for name in budget.get('forbidden', []):
+        loaded = sorted(m for m in modules if m == name or m.startswith(name + '.'))
+        if loaded:
+            violations.append(f'{name} is imported ({len(loaded)} modules)')
+    
+    total_ms = sum(modules.values()) / 1000
+    max_ms = budget.get('max_import_ms')
+    if max_ms is not None and total_ms > max_ms:
+        violations.append(f'import time {total_ms:.1f} ms exceeds budget of {max_ms} ms')
+    return violations
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口
+    
+    Returns:
+        退出码：0 正常，1 超出预算
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmark.importtime',
+        description='检查 main.py 启动时的导入耗时是否超出预算',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python -m benchmark.importtime                      # 检查 main.py --help
+  python -m benchmark.importtime -- lookup --help     # 检查其他参数
+  python -m benchmark.importtime --top 20             # 列出耗时最多的 20 个模块
+        '''
+    )
+    parser.add_argument('command', nargs='*', default=['--help'], help='传给 main.py 的参数 (默认: --help)')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help='预算文件路径 (默认: benchmark/importtime_budget.json)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'重复次数 (默认: {DEFAULT_REPEAT})')
+    parser.add_argument('--top', type=int, default=10, help='列出耗时最多的模块数 (默认: 10)')
+    args = parser.parse_args(argv)
+    
+    modules, wall, bare_wall = measure_startup(args.command, args.repeat)
+    print(f'main.py {" ".join(args.command)}: {len(modules)} modules, '
+          f'{sum(modules.values()) / 1000:.1f} ms import time, '
+          f'{wall * 1000:.1f} ms wall ({(wall - bare_wall) * 1000:+.1f} ms over bare interpreter)')
+    for name, self_us in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'  {self_us / 1000:>8.2f} ms  {name}')
+    
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+    violations = check_budget(modules, budget)
+    for violation in violations:
+        print(f'Budget violation: {violation}', file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
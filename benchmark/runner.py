@@ -0,0 +1,400 @@
+"""
+基准测试运行与比较
+
+每个基准由准备函数和被测函数组成：准备函数在计时外执行并返回被测函数的参数，
+被测函数重复执行取最小值和中位数；另在 tracemalloc 下单独执行一次记录内存峰值，
+避免内存跟踪的开销影响计时。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from .fixtures import DEFAULT_SEED, build_fixtures
+
+RESULT_FORMAT = 1
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'benchmark')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25     # 相对基线的最大允许退化比例
+MIN_TIME_DELTA = 0.002       # 绝对差值小于此值（秒）的计时变化视为噪声
+MIN_MEMORY_DELTA = 256       # 绝对差值小于此值（KiB）的内存变化视为噪声
+
+
+class Benchmark(NamedTuple):
+    """基准测试项"""
+    name: str                                  # 名称，形如 '阶段.项目'
+    setup: Callable[[], Tuple[Any, ...]]       # 准备函数，返回被测函数的参数
+    func: Callable[..., Any]                   # 被测函数
+
+
+class Regression(NamedTuple):
+    """相对基线的退化"""
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float('inf')
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def build_benchmarks(paths: Dict[str, str], workdir: str) -> List[Benchmark]:
+    """
+    构建全部基准测试项
+    
+    Args:
+        paths: 数据名称到文件路径的映射
+        workdir: 生成器输出目录
+        
+    Returns:
+        基准测试项列表
+    """
+    from generator import (
+        generate_bird_prefix_set,
+        generate_bird_route,
+        generate_bird_static,
+        generate_list,
+        generate_ros_delta_script,
+        generate_ros_ipv6_script,
+        generate_ros_script,
+    )
+    from source.apnic import ApnicIndex, iter_delegated_records
+    from source.aws import parse_aws_catalog
+    from source.google import parse_google_catalog
+    from source.rir import build_rir_index
+    from utils.aggregate import aggregate_cidr
+    from utils.interval import IP_VERSIONS, IntervalSet
+    from utils.ip import (
+        canonicalize_cidr,
+        get_opposite_cidr,
+        get_opposite_ipv6_cidr,
+        normalize_cidr_text,
+    )
+    from utils.labelled import LabelledIntervalMap
+    from utils.snapshot import load_snapshots, write_snapshots
+    
+    apnic_lines = _read_text(paths['apnic']).splitlines()
+    clang_text = _read_text(paths['clang_ipv4'])
+    clang = clang_text.split()
+    clang_v6 = _read_text(paths['clang_ipv6']).split()
+    large_text = _read_text(paths['large'])
+    large = large_text.split()
+    google_text = _read_text(paths['google'])
+    aws_text = _read_text(paths['aws'])
+    
+    clang_set = IntervalSet.from_cidrs(clang)
+    large_set = IntervalSet.from_cidrs(large)
+    cn_cidr = clang_set.to_cidrs()
+    non_cn = get_opposite_cidr(cn_cidr)
+    non_cn_v6 = get_opposite_ipv6_cidr(clang_v6)
+    
+    # 快照：APNIC 各国家数据集加上 1M 列表
+    apnic_index = ApnicIndex.from_records(iter_delegated_records(apnic_lines))
+    datasets = {
+        (f'apnic-{country}', version): apnic_index.get_set(country, version)
+        for version in IP_VERSIONS for country in apnic_index.countries(version)
+    }
+    datasets['large', 'ipv4'] = large_set
+    snapshot_dir = os.path.join(workdir, 'snapshots')
+    write_snapshots(datasets, snapshot_dir)
+    
+    def snapshot_write_setup() -> Tuple[Any, ...]:
+        """每次写入新目录，避免内容未变化时跳过写入"""
+        path = os.path.join(workdir, 'snapshots-write')
+        shutil.rmtree(path, ignore_errors=True)
+        return (datasets, path)
+    
+    # 增量脚本：上一版状态为去掉每 20 条中的一条，并加入一部分 1M 列表中的网段
+    state_path = os.path.join(workdir, 'delta.state')
+    previous = [c for i, c in enumerate(non_cn) if i % 20] + large[:len(non_cn) // 20]
+    
+    def output(name: str) -> Callable[[], Tuple[Any, ...]]:
+        """生成器的输出路径，每次执行前删除，保证测量的是完整写入"""
+        path = os.path.join(workdir, name)
+        
+        def setup() -> Tuple[Any, ...]:
+            if os.path.exists(path):
+                os.remove(path)
+            return (path,)
+        return setup
+    
+    def delta_setup() -> Tuple[Any, ...]:
+        with open(state_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sorted(previous)))
+        return (non_cn, 'GLOBAL', os.path.join(workdir, 'delta.rsc'), state_path)
+    
+    def aws_regions(catalog: Any) -> Dict[str, List[str]]:
+        """新构建的目录上查询各区域的规范化列表（目录会缓存查询结果）"""
+        return {region: catalog.get_cidrs('ipv4', region) for region in catalog.values('region', 'ipv4')}
+    
+    def args(*values: Any) -> Callable[[], Tuple[Any, ...]]:
+        return lambda: values
+    
+    def with_output(name: str, func: Callable[..., Any], *values: Any) -> Benchmark:
+        setup = output(f'{name}.out')
+        return Benchmark(f'generate.{name}', lambda: values + setup(), func)
+    
+    return [
+        # 解析
+        Benchmark('parse.apnic_records', args(apnic_lines), lambda lines: list(iter_delegated_records(lines))),
+        Benchmark(
+            'parse.apnic_index', args(apnic_lines),
+            lambda lines: ApnicIndex.from_records(iter_delegated_records(lines))
+        ),
+        Benchmark(
+            'parse.rir_index', args({name[4:]: path for name, path in paths.items() if name.startswith('rir_')}),
+            build_rir_index
+        ),
+        Benchmark('parse.clang_normalize', args(clang_text), lambda text: normalize_cidr_text(text, 'ipv4')),
+        Benchmark('parse.large_normalize', args(large_text), lambda text: normalize_cidr_text(text, 'ipv4')),
+        Benchmark('parse.large_interval_set', args(large), IntervalSet.from_cidrs),
+        Benchmark('parse.google_json', args(google_text), parse_google_catalog),
+        Benchmark('parse.aws_json', args(aws_text), parse_aws_catalog),
+        # 集合运算
+        Benchmark('algebra.union', args(large_set, clang_set), IntervalSet.union),
+        Benchmark('algebra.difference', args(large_set, clang_set), IntervalSet.difference),
+        Benchmark('algebra.intersection', args(large_set, clang_set), IntervalSet.intersection),
+        Benchmark('algebra.complement', args(large_set), IntervalSet.complement),
+        Benchmark('algebra.to_cidrs', args(large_set), IntervalSet.to_cidrs),
+        Benchmark('algebra.opposite_cidr', args(cn_cidr), get_opposite_cidr),
+        Benchmark(
+            'algebra.labelled_map', args({'clang': clang_set, 'large': large_set}),
+            LabelledIntervalMap.from_sets
+        ),
+        Benchmark('algebra.opposite_ipv6_cidr', args(clang_v6), get_opposite_ipv6_cidr),
+        # 规范化与聚合
+        Benchmark('canonicalize.clang', args(clang), canonicalize_cidr),
+        Benchmark('canonicalize.large', args(large), canonicalize_cidr),
+        Benchmark(
+            'canonicalize.aggregate', args(non_cn),
+            lambda cidr: aggregate_cidr(cidr, max_entries=max(1, len(cidr) // 4))
+        ),
+        Benchmark('canonicalize.aws_regions', lambda: (parse_aws_catalog(aws_text),), aws_regions),
+        # 快照
+        Benchmark('snapshot.write', snapshot_write_setup, write_snapshots),
+        Benchmark('snapshot.load', args(snapshot_dir), load_snapshots),
+        Benchmark(
+            'snapshot.load_query', args(snapshot_dir),
+            lambda path: [ip_set.size for ip_set in load_snapshots(path).values()]
+        ),
+        # 生成器
+        with_output('ros', lambda cidr, name, path: generate_ros_script(cidr, name, path), non_cn, 'GLOBAL'),
+        with_output(
+            'ros_ipv6', lambda cidr, name, path: generate_ros_ipv6_script(cidr, name, path),
+            non_cn_v6, 'GLOBAL6'
+        ),
+        Benchmark('generate.ros_delta', delta_setup, generate_ros_delta_script),
+        with_output(
+            'bird', lambda cidr, hop, path: generate_bird_route(cidr, hop, path), non_cn, '192.168.1.1'
+        ),
+        with_output('bird_prefix_set', lambda cidr, path: generate_bird_prefix_set(cidr, path), non_cn),
+        with_output(
+            'bird_static', lambda cidr, hops, path: generate_bird_static(cidr, hops, path),
+            non_cn, ('192.168.1.1', '192.168.1.2')
+        ),
+        with_output('ikuai', lambda cidr, path: generate_list(cidr, path), non_cn),
+    ]
+
+
+def _measure(benchmark: Benchmark, repeat: int) -> Dict[str, float]:
+    """执行单个基准，返回计时和内存峰值"""
+    times = []
+    for _ in range(repeat):
+        values = benchmark.setup()
+        started = time.perf_counter()
+        benchmark.func(*values)
+        times.append(time.perf_counter() - started)
+    
+    values = benchmark.setup()
+    tracemalloc.start()
+    try:
+        benchmark.func(*values)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'min': round(min(times), 6),
+        'median': round(statistics.median(times), 6),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(
+    fixture_dir: str = DEFAULT_FIXTURE_DIR,
+    scale: float = 1.0,
+    repeat: int = DEFAULT_REPEAT,
+    only: Optional[List[str]] = None,
+    seed: int = DEFAULT_SEED
+) -> Dict[str, Any]:
+    """
+    运行基准测试
+    
+    Args:
+        fixture_dir: 测试数据目录
+        scale: 数据规模系数
+        repeat: 每项重复次数
+        only: 只运行名称包含其中任一子串的项
+        seed: 数据随机种子
+        
+    Returns:
+        测试结果，含运行环境信息和各项计时、内存峰值
+    """
+    started = time.perf_counter()
+    paths = build_fixtures(os.path.join(fixture_dir, f'scale-{scale:g}'), scale, seed)
+    logger.info(f'Fixtures ready in {time.perf_counter() - started:.2f}s')
+    
+    workdir = tempfile.mkdtemp(prefix='bgp-tools-bench-')
+    try:
+        benchmarks = build_benchmarks(paths, workdir)
+        if only:
+            benchmarks = [b for b in benchmarks if any(pattern in b.name for pattern in only)]
+        
+        results = {}
+        for benchmark in benchmarks:
+            results[benchmark.name] = _measure(benchmark, repeat)
+            logger.info(
+                f'{benchmark.name:<32} min {results[benchmark.name]["min"] * 1000:9.1f} ms  '
+                f'peak {results[benchmark.name]["peak_kib"]:10.1f} KiB'
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    return {
+        'format': RESULT_FORMAT,
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'scale': scale,
+            'seed': seed,
+            'repeat': repeat,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Regression]:
+    """
+    与基线比较，找出超过阈值的退化
+    
+    计时比较最小值，内存比较峰值；两者都忽略绝对差值很小的变化。
+    
+    Args:
+        current: 本次结果
+        baseline: 基线结果
+        threshold: 允许的退化比例，如 0.25 表示慢 25% 以内不算退化
+        
+    Returns:
+        退化列表
+    """
+    if current['meta'].get('scale') != baseline['meta'].get('scale'):
+        logger.warning('Baseline was recorded with a different scale, comparison may be meaningless')
+    
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric, min_delta in (('min', MIN_TIME_DELTA), ('peak_kib', MIN_MEMORY_DELTA)):
+            if result[metric] > base[metric] * (1 + threshold) and result[metric] - base[metric] > min_delta:
+                regressions.append(Regression(name, metric, base[metric], result[metric]))
+    return regressions
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data: Dict[str, Any] = json.load(f)
+    if data.get('format') != RESULT_FORMAT:
+        raise ValueError(f'Unsupported benchmark result format in {path}')
+    return data
+
+
+def _save_json(data: Dict[str, Any], path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口
+    
+    Returns:
+        退出码：0 正常，1 存在超过阈值的退化
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmark',
+        description='BGP Tools 性能基准测试',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+示例:
+  python -m benchmark                          # 运行全部基准，与 benchmark/baseline.json 比较
+  python -m benchmark --scale 0.1 --repeat 3   # 小规模快速运行
+  python -m benchmark -k parse -k generate     # 只运行名称包含 parse 或 generate 的项
+  python -m benchmark -o result.json           # 保存本次结果
+  python -m benchmark --save-baseline          # 将本次结果保存为基线
+        '''
+    )
+    parser.add_argument('--scale', type=float, default=1.0, help='数据规模系数 (默认: 1)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'每项重复次数 (默认: {DEFAULT_REPEAT})')
+    parser.add_argument('-k', dest='only', action='append', help='只运行名称包含该子串的项，可多次指定')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='数据随机种子')
+    parser.add_argument(
+        '--fixture-dir', default=DEFAULT_FIXTURE_DIR, help=f'测试数据目录 (默认: {DEFAULT_FIXTURE_DIR})'
+    )
+    parser.add_argument('-o', '--output', help='结果输出文件路径')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线结果文件路径 (默认: benchmark/baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help=f'允许的退化比例 (默认: {DEFAULT_THRESHOLD})'
+    )
+    args = parser.parse_args(argv)
+    
+    logger.remove()
+    logger.add(sys.stderr, level='INFO', format='<level>{message}</level>', filter=__name__)
+    logger.add(sys.stderr, level='WARNING', filter=lambda record: record['name'] != __name__)
+    
+    current = run_benchmarks(args.fixture_dir, args.scale, args.repeat, args.only, args.seed)
+    if args.output:
+        _save_json(current, args.output)
+        logger.info(f'Results written to {args.output}')
+    if args.save_baseline:
+        _save_json(current, args.baseline)
+        logger.info(f'Baseline written to {args.baseline}')
+        return 0
+    
+    if not os.path.exists(args.baseline):
+        logger.info(f'No baseline at {args.baseline}, skipping comparison')
+        return 0
+    
+    regressions = compare_results(current, _load_json(args.baseline), args.threshold)
+    if not regressions:
+        logger.info(f'No regressions over {args.threshold:.0%} against {args.baseline}')
+        return 0
+    for r in regressions:
+        logger.error(f'Regression in {r.name} ({r.metric}): {r.baseline:g} -> {r.current:g} ({r.ratio:.2f}x)')
+    return 1
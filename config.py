@@ -3,11 +3,36 @@ BGP Tools 配置文件
 
 集中管理项目的所有配置项
 """
-from typing import List
+import os
+from typing import Dict, List
 
 # ==================== 网络请求配置 ====================
 HTTP_TIMEOUT: int = 30  # HTTP 请求超时时间（秒）
 HTTP_USER_AGENT: str = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+SOURCE_FETCH_TIMEOUT: int = 120  # 并发获取时单个数据源的总超时时间（秒）
+HTTP_RETRIES: int = 3            # 连接失败、超时和 5xx 响应的重试次数（指数退避加随机抖动）
+
+# ==================== HTTP 缓存配置 ====================
+HTTP_CACHE_DIR: str = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'http')
+HTTP_CACHE_TTL: int = 0                        # 缓存新鲜期（秒），0 表示每次条件请求校验
+HTTP_CACHE_MAX_SIZE: int = 256 * 1024 * 1024   # 缓存目录最大字节数
+
+# ==================== 数据集快照配置 ====================
+# compile 命令输出目录，lookup/serve 的 --snapshot-dir 默认从此目录映射
+SNAPSHOT_DIR: str = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'snapshots')
+
+# ==================== 分类服务配置 ====================
+SERVER_HOST: str = '127.0.0.1'          # serve 命令监听地址
+SERVER_PORT: int = 8853                 # serve 命令监听端口
+SERVER_REFRESH_INTERVAL: int = 3600     # 后台重建索引间隔（秒）
+
+# ==================== 监视模式配置 ====================
+# watch 命令各数据源的轮询间隔（秒），可用 --interval SOURCE=SECONDS 覆盖
+WATCH_INTERVALS: Dict[str, int] = {
+    'cn': 600,
+    'google': 600,
+    'xshell': 60,
+}
 
 # ==================== 数据源 URL ====================
 # Google
@@ -20,6 +45,15 @@ AWS_IP_RANGES_URL: str = 'https://ip-ranges.amazonaws.com/ip-ranges.json'
 # APNIC
 APNIC_DELEGATED_URL: str = 'http://ftp.apnic.net/stats/apnic/delegated-apnic-latest'
 
+# 五大 RIR delegated-extended 文件（source.rir 的默认数据源），也可替换为本地文件路径
+RIR_DELEGATED_URLS: Dict[str, str] = {
+    'afrinic': 'https://ftp.afrinic.net/stats/afrinic/delegated-afrinic-extended-latest',
+    'apnic': 'https://ftp.apnic.net/stats/apnic/delegated-apnic-extended-latest',
+    'arin': 'https://ftp.arin.net/pub/stats/arin/delegated-arin-extended-latest',
+    'lacnic': 'https://ftp.lacnic.net/pub/stats/lacnic/delegated-lacnic-extended-latest',
+    'ripencc': 'https://ftp.ripe.net/pub/stats/ripencc/delegated-ripencc-extended-latest',
+}
+
 # Clang (中国 IP 数据源)
 CLANG_CN_IPV4_URL: str = 'http://ispip.clang.cn/all_cn_cidr.txt'
 CLANG_CN_IPV6_URL: str = 'https://ispip.clang.cn/all_cn_ipv6.txt'
@@ -36,6 +70,9 @@ CUSTOMER_EXCLUDE_IPS: List[str] = [
     '103.177.162.23',
 ]
 
+# 需要排除（直连）的 IPv6 地址
+CUSTOMER_EXCLUDE_IPV6S: List[str] = []
+
 # Google DNS（可选排除）
 GOOGLE_DNS_IPS: List[str] = [
     '8.8.8.8',
@@ -45,6 +82,8 @@ GOOGLE_DNS_IPS: List[str] = [
 # ==================== 路径配置 ====================
 # Xshell 配置目录（用于 direct 模式读取服务器 IP）
 XSHELL_CONFIG_DIR: str = r'D:\Files Sync\SynologyDrive\配置文件\服务器安全\Xshell配置'
+# 会话文件解析结果缓存，按文件修改时间和大小判断是否需要重新读取
+XSHELL_CACHE_PATH: str = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'xshell.json')
 
 # ==================== 日志配置 ====================
 LOG_LEVEL: str = 'INFO'
@@ -3,13 +3,30 @@
 
 为不同路由器/设备生成配置文件
 """
-from .bird import generate_bird_route
-from .ikuai import generate_list
-from .ros import generate_ros_script, generate_ros_ipv6_script
+from utils.lazy import lazy_exports
+
+# 子模块在首次访问其导出名称时才导入
+__getattr__, __dir__ = lazy_exports(__name__, {
+    '.bird': (
+        'generate_bird_prefix_set', 'generate_bird_route', 'generate_bird_static', 'split_by_next_hop',
+    ),
+    '.ikuai': ('generate_list', 'generate_sharded_list'),
+    '.ros': (
+        'generate_ros_delta_script', 'generate_ros_script', 'generate_ros_ipv6_script',
+        'generate_ros_sharded_script', 'commit_ros_state',
+    ),
+})
 
 __all__ = [
     'generate_bird_route',
+    'generate_bird_prefix_set',
+    'generate_bird_static',
+    'split_by_next_hop',
     'generate_list',
+    'generate_sharded_list',
     'generate_ros_script',
     'generate_ros_ipv6_script',
+    'generate_ros_sharded_script',
+    'generate_ros_delta_script',
+    'commit_ros_state',
 ]
@@ -1,6 +1,13 @@
-from typing import Iterable
+import zlib
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Union
 from loguru import logger
 
+from utils.output import write_lines
+
+IpVersionType = Literal['ipv4', 'ipv6']
+
+BIRD_INDENT = '    '
+
 
 def generate_bird_route(
     cidr: Iterable[str],
@@ -15,13 +22,138 @@ def generate_bird_route(
         next_hop: 下一跳地址
         conf_path: 配置文件输出路径
     """
-    routes = []
+    result = write_lines((f'route {c} via {next_hop};' for c in cidr), conf_path)
+    
+    logger.info(f'Generated BIRD route config with {result.lines} routes: {conf_path}')
+
+
+def _iter_prefix_set(cidr: Iterable[str], set_name: str) -> Iterator[str]:
+    """逐行生成 define 前缀集合，最后一项之后不加逗号"""
+    yield f'define {set_name} = ['
+    previous = None
     for c in cidr:
-        logger.debug(f'Adding bird route: route {c} via {next_hop};')
-        routes.append(f'route {c} via {next_hop};')
+        if previous is not None:
+            yield f'{BIRD_INDENT}{previous},'
+        previous = c
+    if previous is None:
+        raise ValueError(f'Prefix set {set_name} is empty')
+    yield f'{BIRD_INDENT}{previous}'
+    yield '];'
+
+
+def generate_bird_prefix_set(
+    cidr: Iterable[str],
+    conf_path: str,
+    set_name: str = 'PROXY_NETS',
+    filter_name: Optional[str] = None,
+    write_filter: bool = True
+) -> None:
+    """
+    生成 BIRD 前缀集合及对应的过滤器
+    
+    前缀集合由 BIRD 编译为一个查找结构，过滤器只需一次 net ~ SET 匹配，
+    可用于导出/导入过滤，不必为每个前缀生成一条路由。
+    
+    Args:
+        cidr: IP CIDR 列表（IPv4 和 IPv6 均可，但不能混用）
+        conf_path: 配置文件输出路径
+        set_name: 前缀集合常量名称
+        filter_name: 过滤器名称（默认为集合名称小写）
+        write_filter: 是否同时生成只接受集合内前缀的过滤器
+        
+    Raises:
+        ValueError: CIDR 列表为空时抛出（BIRD 不接受空的前缀集合）
+    """
+    def iter_lines() -> Iterator[str]:
+        yield from _iter_prefix_set(cidr, set_name)
+        if write_filter:
+            yield ''
+            yield f'filter {filter_name or set_name.lower()} {{'
+            yield f'{BIRD_INDENT}if net ~ {set_name} then accept;'
+            yield f'{BIRD_INDENT}reject;'
+            yield '}'
+    
+    result = write_lines(iter_lines(), conf_path)
+    
+    logger.info(f'Generated BIRD prefix set {set_name} ({result.lines} config lines): {conf_path}')
+
+
+def split_by_next_hop(cidr: Iterable[str], next_hops: Sequence[str]) -> Dict[str, List[str]]:
+    """
+    将前缀分配到多个下一跳
+    
+    按前缀文本的 CRC32 取模分配，分配结果只取决于前缀本身，
+    列表增删条目时其余前缀的下一跳保持不变。
+    
+    Args:
+        cidr: IP CIDR 列表
+        next_hops: 下一跳地址列表
+        
+    Returns:
+        下一跳到前缀列表的映射，按 next_hops 的顺序排列
+        
+    Raises:
+        ValueError: 下一跳列表为空时抛出
+    """
+    if not next_hops:
+        raise ValueError('At least one next hop is required')
+    groups: Dict[str, List[str]] = {hop: [] for hop in next_hops}
+    if len(next_hops) == 1:
+        groups[next_hops[0]].extend(cidr)
+        return groups
+    
+    buckets = [groups[hop] for hop in next_hops]
+    count = len(buckets)
+    for c in cidr:
+        buckets[zlib.crc32(c.encode('ascii')) % count].append(c)
+    return groups
+
+
+def generate_bird_static(
+    cidr: Iterable[str],
+    next_hops: Union[str, Sequence[str]],
+    conf_path: str,
+    protocol_name: str = 'static_routes',
+    ip_version: IpVersionType = 'ipv4'
+) -> Dict[str, int]:
+    """
+    生成按下一跳分组的 BIRD protocol static 配置
+    
+    指定多个下一跳时，前缀按 split_by_next_hop 分散到各下一跳。
+    
+    Args:
+        cidr: IP CIDR 列表
+        next_hops: 下一跳地址或地址列表
+        conf_path: 配置文件输出路径
+        protocol_name: static 协议名称
+        ip_version: 通道的 IP 版本
+        
+    Returns:
+        各下一跳分配到的路由数
+        
+    Raises:
+        ValueError: 下一跳列表为空时抛出
+    """
+    if isinstance(next_hops, str):
+        next_hops = [next_hops]
+    groups = split_by_next_hop(cidr, next_hops)
+    
+    def iter_lines() -> Iterator[str]:
+        yield f'protocol static {protocol_name} {{'
+        yield f'{BIRD_INDENT}{ip_version};'
+        for hop, routes in groups.items():
+            yield ''
+            yield f'{BIRD_INDENT}# via {hop}: {len(routes)} routes'
+            suffix = f' via {hop};'
+            for c in routes:
+                yield f'{BIRD_INDENT}route {c}{suffix}'
+        yield '}'
     
-    content = '\n'.join(routes)
-    with open(conf_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    write_lines(iter_lines(), conf_path)
     
-    logger.info(f'Generated BIRD route config with {len(routes)} routes: {conf_path}')
+    counts = {hop: len(routes) for hop, routes in groups.items()}
+    logger.info(
+        f'Generated BIRD static protocol {protocol_name} with {sum(counts.values())} routes '
+        f'via {len(counts)} next hops: {conf_path}'
+    )
+    return counts
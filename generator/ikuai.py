@@ -1,6 +1,8 @@
-from typing import Iterable
+from typing import Iterable, List, Optional
 from loguru import logger
 
+from utils.output import write_lines, write_shards
+
 
 def generate_list(ip_cidr: Iterable[str], output_path: str) -> None:
     """
@@ -10,10 +12,32 @@ def generate_list(ip_cidr: Iterable[str], output_path: str) -> None:
         ip_cidr: IP CIDR 列表
         output_path: 输出文件路径
     """
-    cidr_list = list(ip_cidr)
-    content = '\n'.join(cidr_list)
+    result = write_lines(ip_cidr, output_path)
+    
+    logger.info(f'Generated iKuai list with {result.lines} entries: {output_path}')
+
+
+def generate_sharded_list(
+    ip_cidr: Iterable[str],
+    output_path: str,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None
+) -> List[str]:
+    """
+    生成分片的 iKuai IP 列表文件，每个分片不超过单个列表可上传的条目数或大小
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    分片路径见 utils.output.shard_path，如 list.txt -> list-001.txt，output_path 本身不写入。
+    
+    Args:
+        ip_cidr: IP CIDR 列表
+        output_path: 基础输出路径
+        max_entries: 每个分片最多的条目数
+        max_bytes: 每个分片最大的字节数
+        
+    Returns:
+        按顺序排列的分片文件路径
+    """
+    shards = write_shards(ip_cidr, output_path, max_lines=max_entries, max_bytes=max_bytes)
     
-    logger.info(f'Generated iKuai list with {len(cidr_list)} entries: {output_path}')
\ No newline at end of file
+    logger.info(f'Generated iKuai list in {len(shards)} parts: {", ".join(shards)}')
+    return shards
\ No newline at end of file
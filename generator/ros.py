@@ -1,41 +1,60 @@
-from typing import Iterable, Literal
+import os
+from typing import Iterable, Iterator, List, Literal, Optional, Tuple
 from loguru import logger
 
+from utils.interval import parse_cidr
+from utils.output import write_lines, write_shards
+
 IpVersionType = Literal['ipv4', 'ipv6']
 
 
-def _generate_ros_address_list_script(
+def _iter_ros_add_lines(ip_cidr: Iterable[str], addr_list: str, compact: bool = False) -> Iterator[str]:
+    """
+    逐行生成添加条目的命令
+    
+    compact 模式不带 :do {} on-error={} 包装，只应在列表刚被清空后使用：
+    此时不会出现重复条目，逐条捕获错误只会拖慢导入。
+    """
+    if compact:
+        for cidr in ip_cidr:
+            yield f'add address={cidr} list={addr_list}'
+    else:
+        for cidr in ip_cidr:
+            yield f':do {{ add address={cidr} list={addr_list} }} on-error={{}}'
+
+
+def _iter_ros_address_list_script(
     ip_cidr: Iterable[str],
     addr_list: str,
-    ip_version: IpVersionType = 'ipv4'
-) -> str:
+    ip_version: IpVersionType = 'ipv4',
+    compact: bool = False
+) -> Iterator[str]:
     """
-    生成 RouterOS 地址列表脚本内容
+    逐行生成 RouterOS 地址列表脚本
     
     Args:
         ip_cidr: IP CIDR 列表
         addr_list: 地址列表名称
         ip_version: IP 版本
+        compact: 是否省略每个条目的错误处理包装
         
-    Returns:
-        脚本内容字符串
+    Yields:
+        脚本行
     """
     ip_cmd = 'ip' if ip_version == 'ipv4' else 'ipv6'
     
-    script = f'/log info "Loading {addr_list} {ip_version} address list"\n'
-    script += f'/{ip_cmd} firewall address-list remove [/{ip_cmd} firewall address-list find list={addr_list}]\n'
-    script += f'/{ip_cmd} firewall address-list'
-    
-    for cidr in ip_cidr:
-        script += f'\n:do {{ add address={cidr} list={addr_list} }} on-error={{}}'
+    yield f'/log info "Loading {addr_list} {ip_version} address list"'
+    yield f'/{ip_cmd} firewall address-list remove [/{ip_cmd} firewall address-list find list={addr_list}]'
+    yield f'/{ip_cmd} firewall address-list'
     
-    return script
+    yield from _iter_ros_add_lines(ip_cidr, addr_list, compact)
 
 
 def generate_ros_script(
     ip_cidr: Iterable[str],
     addr_list: str,
-    output_path: str
+    output_path: str,
+    compact: bool = False
 ) -> None:
     """
     生成 RouterOS IPv4 地址列表脚本并保存到文件
@@ -44,17 +63,20 @@ def generate_ros_script(
         ip_cidr: IP CIDR 列表
         addr_list: 地址列表名称
         output_path: 输出文件路径
+        compact: 是否省略每个条目的错误处理包装
     """
-    script = _generate_ros_address_list_script(ip_cidr, addr_list, 'ipv4')
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(script)
-    logger.info(f'Generated RouterOS IPv4 script: {output_path}')
+    result = write_lines(_iter_ros_address_list_script(ip_cidr, addr_list, 'ipv4', compact), output_path)
+    if result.changed:
+        logger.info(f'Generated RouterOS IPv4 script: {output_path}')
+    else:
+        logger.info(f'RouterOS IPv4 script unchanged: {output_path}')
 
 
 def generate_ros_ipv6_script(
     ip_cidr: Iterable[str],
     addr_list: str,
-    output_path: str
+    output_path: str,
+    compact: bool = False
 ) -> None:
     """
     生成 RouterOS IPv6 地址列表脚本并保存到文件
@@ -63,8 +85,208 @@ def generate_ros_ipv6_script(
         ip_cidr: IP CIDR 列表
         addr_list: 地址列表名称
         output_path: 输出文件路径
+        compact: 是否省略每个条目的错误处理包装
+    """
+    result = write_lines(_iter_ros_address_list_script(ip_cidr, addr_list, 'ipv6', compact), output_path)
+    if result.changed:
+        logger.info(f'Generated RouterOS IPv6 script: {output_path}')
+    else:
+        logger.info(f'RouterOS IPv6 script unchanged: {output_path}')
+
+
+def generate_ros_sharded_script(
+    ip_cidr: Iterable[str],
+    addr_list: str,
+    output_path: str,
+    ip_version: IpVersionType = 'ipv4',
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    compact: bool = False
+) -> List[str]:
+    """
+    生成分片的 RouterOS 地址列表脚本
+    
+    条目按数量或字节数上限拆分到 out-001.rsc、out-002.rsc ... 分片文件中（见 shard_path），
+    output_path 为入口脚本：先清空地址列表，再按顺序 /import 各分片。
+    分片与入口脚本需上传到路由器的同一目录（按文件名导入）。
+    
+    Args:
+        ip_cidr: IP CIDR 列表
+        addr_list: 地址列表名称
+        output_path: 入口脚本路径
+        ip_version: IP 版本
+        max_entries: 每个分片最多的条目数
+        max_bytes: 每个分片最大的字节数
+        compact: 是否省略每个条目的错误处理包装
+        
+    Returns:
+        按导入顺序排列的分片文件路径
+    """
+    ip_cmd = 'ip' if ip_version == 'ipv4' else 'ipv6'
+    shards = write_shards(
+        _iter_ros_add_lines(ip_cidr, addr_list, compact), output_path,
+        max_lines=max_entries, max_bytes=max_bytes, header=[f'/{ip_cmd} firewall address-list']
+    )
+    
+    manifest = [
+        f'/log info "Loading {addr_list} {ip_version} address list ({len(shards)} parts)"',
+        f'/{ip_cmd} firewall address-list remove [/{ip_cmd} firewall address-list find list={addr_list}]',
+    ]
+    manifest.extend(f'/import file-name={os.path.basename(shard)}' for shard in shards)
+    write_lines(manifest, output_path)
+    logger.info(f'Generated RouterOS {ip_version} script in {len(shards)} parts: {output_path}')
+    return shards
+
+
+def _diff_address_lists(
+    old_cidr: Iterable[str],
+    new_cidr: Iterable[str],
+    ip_version: IpVersionType = 'ipv4'
+) -> Tuple[List[str], List[str]]:
+    """
+    对比新旧地址列表条目
+    
+    两个列表按 (起始地址, 结束地址) 排序后归并一次完成对比。
+    
+    Args:
+        old_cidr: 上次生成的 CIDR 列表
+        new_cidr: 本次生成的 CIDR 列表
+        ip_version: IP 版本
+        
+    Returns:
+        (需要删除的条目, 需要添加的条目)
     """
-    script = _generate_ros_address_list_script(ip_cidr, addr_list, 'ipv6')
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(script)
-    logger.info(f'Generated RouterOS IPv6 script: {output_path}')
+    old_keys = sorted((parse_cidr(c, ip_version), c) for c in old_cidr)
+    new_keys = sorted((parse_cidr(c, ip_version), c) for c in new_cidr)
+    
+    removed, added = [], []
+    i = j = 0
+    while i < len(old_keys) and j < len(new_keys):
+        if old_keys[i][0] == new_keys[j][0]:
+            i += 1
+            j += 1
+        elif old_keys[i][0] < new_keys[j][0]:
+            removed.append(old_keys[i][1])
+            i += 1
+        else:
+            added.append(new_keys[j][1])
+            j += 1
+    removed.extend(c for _, c in old_keys[i:])
+    added.extend(c for _, c in new_keys[j:])
+    return removed, added
+
+
+def _iter_ros_delta_script(
+    removed: Iterable[str],
+    added: Iterable[str],
+    addr_list: str,
+    ip_version: IpVersionType = 'ipv4'
+) -> Iterator[str]:
+    """
+    逐行生成 RouterOS 地址列表增量脚本
+    
+    Args:
+        removed: 需要删除的条目
+        added: 需要添加的条目
+        addr_list: 地址列表名称
+        ip_version: IP 版本
+        
+    Yields:
+        脚本行
+    """
+    ip_cmd = 'ip' if ip_version == 'ipv4' else 'ipv6'
+    
+    yield f'/log info "Updating {addr_list} {ip_version} address list"'
+    yield f'/{ip_cmd} firewall address-list'
+    for cidr in removed:
+        # RouterOS 将 IPv4 /32 条目显示为不带掩码的地址
+        address = cidr[:-3] if ip_version == 'ipv4' and cidr.endswith('/32') else cidr
+        yield f':do {{ remove [find list={addr_list} address={address}] }} on-error={{}}'
+    for cidr in added:
+        yield f':do {{ add address={cidr} list={addr_list} }} on-error={{}}'
+
+
+def _load_state(state_path: str) -> List[str]:
+    """读取路由器当前的地址列表"""
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def ros_state_path(output_path: str, state_path: Optional[str] = None) -> str:
+    """增量状态文件路径，默认为 output_path + '.state'"""
+    return state_path or f'{output_path}.state'
+
+
+def pending_state_path(state_path: str) -> str:
+    """待确认的状态文件路径，脚本导入路由器并确认后才替换状态文件"""
+    return f'{state_path}.pending'
+
+
+def write_ros_pending_state(ip_cidr: Iterable[str], state_path: str) -> None:
+    """
+    记录脚本导入后路由器将拥有的地址列表，等待 commit_ros_state 确认
+    
+    Args:
+        ip_cidr: 脚本生成的 CIDR 列表
+        state_path: 状态文件路径
+    """
+    pending = pending_state_path(state_path)
+    write_lines(ip_cidr, pending)
+    logger.info(f'Pending state written to {pending}, commit it after the router imported the script')
+
+
+def commit_ros_state(state_path: str) -> bool:
+    """
+    确认路由器已导入最近生成的脚本，用待确认的状态替换状态文件
+    
+    Args:
+        state_path: 状态文件路径
+        
+    Returns:
+        是否存在待确认的状态
+    """
+    pending = pending_state_path(state_path)
+    if not os.path.exists(pending):
+        logger.warning(f'No pending state at {pending}')
+        return False
+    os.replace(pending, state_path)
+    logger.info(f'Committed state {state_path}')
+    return True
+
+
+def generate_ros_delta_script(
+    ip_cidr: Iterable[str],
+    addr_list: str,
+    output_path: str,
+    state_path: Optional[str] = None,
+    ip_version: IpVersionType = 'ipv4'
+) -> None:
+    """
+    生成 RouterOS 地址列表增量脚本并保存到文件
+    
+    与状态文件（路由器已确认导入的列表）对比，只输出需要删除和添加的条目，
+    路由器无需清空整个列表；没有状态文件时输出完整脚本。新列表写入待确认的
+    状态文件，路由器导入脚本后由 commit_ros_state 确认。未确认前再次生成时
+    仍与已确认的状态对比，增量脚本中的删除和添加均可重复执行。
+    
+    Args:
+        ip_cidr: IP CIDR 列表
+        addr_list: 地址列表名称
+        output_path: 输出文件路径
+        state_path: 状态文件路径，默认为 output_path + '.state'
+        ip_version: IP 版本
+    """
+    ip_cidr = list(ip_cidr)
+    state_path = ros_state_path(output_path, state_path)
+    
+    if os.path.exists(state_path):
+        removed, added = _diff_address_lists(_load_state(state_path), ip_cidr, ip_version)
+        lines = _iter_ros_delta_script(removed, added, addr_list, ip_version)
+        logger.info(f'RouterOS {ip_version} delta: -{len(removed)} +{len(added)} entries')
+    else:
+        logger.info(f'No previous state at {state_path}, generating full script')
+        lines = _iter_ros_address_list_script(ip_cidr, addr_list, ip_version)
+    
+    write_lines(lines, output_path)
+    write_ros_pending_state(ip_cidr, state_path)
+    logger.info(f'Generated RouterOS {ip_version} delta script: {output_path}')
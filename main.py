@@ -6,103 +6,855 @@ BGP/IP 路由工具集主程序
 - google: 生成 Google 服务 IP 的 RouterOS 脚本
 - global: 生成非中国 IP 的 RouterOS 脚本
 - direct: 生成包含直连规则的 RouterOS 脚本
+- lookup: 批量查询 IP 地址属于哪些集合
+- serve: 常驻内存的 IP 分类服务
+- compile: 将数据源编译为可直接映射的二进制快照
+- watch: 持续监视数据源，只重新生成受影响的脚本
 """
 
 import argparse
 import sys
+from collections import Counter
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, TextIO, Tuple
 
-from loguru import logger
+from config import (
+    CUSTOMER_EXCLUDE_IPS,
+    CUSTOMER_EXCLUDE_IPV6S,
+    GOOGLE_DNS_IPS,
+    HTTP_CACHE_DIR,
+    HTTP_CACHE_MAX_SIZE,
+    HTTP_CACHE_TTL,
+    HTTP_RETRIES,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_REFRESH_INTERVAL,
+    SNAPSHOT_DIR,
+    SOURCE_FETCH_TIMEOUT,
+    WATCH_INTERVALS,
+    XSHELL_CACHE_PATH,
+    XSHELL_CONFIG_DIR,
+)
+from source.sets import COMPILE_SOURCES, IP_VERSIONS, SET_NAMES
 
-from config import CUSTOMER_EXCLUDE_IPS, GOOGLE_DNS_IPS, XSHELL_CONFIG_DIR
-from generator.ros import generate_ros_script
-from source.clang import get_cn_cidr, get_non_cn_cidr
-from source.google import get_google_service_cidr
-from source.xshell import read_xshell_dir_ips
-from utils.ip import get_opposite_cidr
+# 各子命令的依赖（requests、loguru、asyncio 等）在函数内按需导入，
+# --help 和参数错误时不加载，见 benchmark/importtime.py
+if TYPE_CHECKING:
+    from utils.interval import IntervalSet, IpVersion
+    from utils.labelled import LabelledIntervalMap
+    from utils.lookup import LookupIndex
 
 
 # ==================== 功能函数 ======================================
 
-def cmd_google(output: str, addr_list: str) -> int:
+def _finalize_cidr(
+    cidr: Iterable[str],
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    exclude: Optional[List[str]] = None,
+    ip_version: 'IpVersion' = 'ipv4'
+) -> List[str]:
+    """
+    规范化 CIDR 列表，指定预算时再做有损聚合
+    
+    Args:
+        cidr: CIDR 列表
+        max_entries: 最大条目数
+        max_overclaim: 允许误包含的地址数或 '/N'
+        exclude: 聚合时不得覆盖的 CIDR 列表（默认保留地址段）
+        ip_version: IP 版本
+    """
+    from utils.aggregate import aggregate_cidr
+    from utils.ip import GLOBAL_UNICAST_IPV6_SET, RESERVED_IPV4_CIDRS, canonicalize_cidr
+    from utils.profiling import stage
+    
+    with stage('set_ops.canonicalize'):
+        cidr = canonicalize_cidr(cidr, ip_version)
+    if max_entries is not None or max_overclaim is not None:
+        if ip_version == 'ipv4':
+            reserved = RESERVED_IPV4_CIDRS
+        else:
+            # IPv6 聚合结果不得超出全球单播地址段
+            reserved = (~GLOBAL_UNICAST_IPV6_SET).to_cidrs()
+        exclude = reserved + (exclude or [])
+        with stage('set_ops.aggregate'):
+            cidr = aggregate_cidr(cidr, max_entries, max_overclaim, exclude, ip_version)
+    return cidr
+
+
+class ShardOptions(NamedTuple):
+    """RouterOS 脚本分片与精简输出选项"""
+    max_entries: Optional[int] = None    # 每个分片最多的条目数
+    max_bytes: Optional[int] = None      # 每个分片最大的字节数
+    compact: bool = False                # 省略每个条目的 on-error 包装
+
+
+def _write_ros_script(
+    ip_cidr: List[str],
+    addr_list: str,
+    output: str,
+    delta: bool = False,
+    state: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    shard: Optional[ShardOptions] = None
+) -> None:
+    """
+    输出 RouterOS 脚本，delta 模式下只输出与路由器已确认状态相比的变更
+    
+    完整脚本导入后路由器上的列表同样会改变，因此已有状态文件（或指定了 state）时
+    完整输出也会写入待确认的状态，与 delta 模式一样由 --commit-state 确认。
+    
+    Args:
+        ip_cidr: CIDR 列表
+        addr_list: 地址列表名称
+        output: 输出文件路径
+        delta: 是否生成增量脚本
+        state: 增量状态文件路径（默认 output + '.state'）
+        ip_version: IP 版本
+        shard: 分片与精简输出选项
+    """
+    import os
+    
+    from generator.ros import (
+        generate_ros_delta_script, generate_ros_ipv6_script, generate_ros_script, generate_ros_sharded_script,
+        ros_state_path, write_ros_pending_state
+    )
+    from utils.profiling import stage
+    
+    shard = shard or ShardOptions()
+    # 脚本逐行生成并流式写入，渲染与写入在同一阶段
+    with stage('render', output=output, delta=delta):
+        if delta:
+            generate_ros_delta_script(ip_cidr, addr_list, output, state, ip_version)
+        elif shard.max_entries or shard.max_bytes:
+            generate_ros_sharded_script(
+                ip_cidr, addr_list, output, ip_version, shard.max_entries, shard.max_bytes, shard.compact
+            )
+        elif ip_version == 'ipv6':
+            generate_ros_ipv6_script(ip_cidr, addr_list, output, shard.compact)
+        else:
+            generate_ros_script(ip_cidr, addr_list, output, shard.compact)
+    
+    state_path = ros_state_path(output, state)
+    if not delta and (state or os.path.exists(state_path)):
+        write_ros_pending_state(ip_cidr, state_path)
+
+
+def cmd_google(
+    output: str,
+    addr_list: str,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    delta: bool = False,
+    state: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    shard: Optional[ShardOptions] = None
+) -> int:
     """
     生成 Google 服务 IP 的 RouterOS 脚本
     
     Args:
         output: 输出文件路径
         addr_list: 地址列表名称
+        max_entries: 最大条目数（有损聚合）
+        max_overclaim: 允许误包含的地址数或 '/N'
+        delta: 是否生成增量脚本
+        state: 增量状态文件路径
+        ip_version: IP 版本
+        shard: 分片与精简输出选项
     """
+    from loguru import logger
+    
+    from source.google import get_google_service_cidr
+    from utils.profiling import stage
+    
     logger.info('Generating Google service IP RouterOS script...')
     
-    proxy_ip = list(get_google_service_cidr('ipv4'))
-    logger.info(f'Got {len(proxy_ip)} Google service IPv4 CIDR entries')
+    with stage('fetch.google'):
+        proxy_ip = list(get_google_service_cidr(ip_version))
+    logger.info(f'Got {len(proxy_ip)} Google service {ip_version} CIDR entries')
     
-    generate_ros_script(proxy_ip, addr_list, output)
+    proxy_ip = _finalize_cidr(proxy_ip, max_entries, max_overclaim, ip_version=ip_version)
+    _write_ros_script(proxy_ip, addr_list, output, delta, state, ip_version, shard)
     logger.success(f'Script generated: {output}')
     return 0
 
 
-def cmd_global(output: str, addr_list: str) -> int:
+def cmd_global(
+    output: str,
+    addr_list: str,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    delta: bool = False,
+    state: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    shard: Optional[ShardOptions] = None
+) -> int:
     """
     生成非中国 IP 的 RouterOS 脚本
     
     Args:
         output: 输出文件路径
         addr_list: 地址列表名称
+        max_entries: 最大条目数（有损聚合）
+        max_overclaim: 允许误包含的地址数或 '/N'
+        delta: 是否生成增量脚本
+        state: 增量状态文件路径
+        ip_version: IP 版本
+        shard: 分片与精简输出选项
     """
+    from loguru import logger
+    
+    from source.clang import get_non_cn_cidr, get_non_cn_ipv6_cidr
+    from utils.profiling import stage
+    
     logger.info('Generating non-China IP RouterOS script...')
     
-    proxy_ip = get_non_cn_cidr()
-    logger.info(f'Got {len(proxy_ip)} non-CN IPv4 CIDR entries')
+    with stage('fetch.non_cn'):
+        if ip_version == 'ipv6':
+            proxy_ip = get_non_cn_ipv6_cidr()
+        else:
+            proxy_ip = get_non_cn_cidr()
+    logger.info(f'Got {len(proxy_ip)} non-CN {ip_version} CIDR entries')
     
-    generate_ros_script(proxy_ip, addr_list, output)
+    proxy_ip = _finalize_cidr(proxy_ip, max_entries, max_overclaim, ip_version=ip_version)
+    _write_ros_script(proxy_ip, addr_list, output, delta, state, ip_version, shard)
     logger.success(f'Script generated: {output}')
     return 0
 
 
-def cmd_direct(output: str, addr_list: str, xshell_dir: str = None) -> int:
+def _write_source_lists(direct_map: 'LabelledIntervalMap', directory: str) -> None:
+    """
+    输出各来源的 CIDR 列表 <来源>.txt 以及来源组合统计 overlap.tsv
+    
+    Args:
+        direct_map: 直连来源区间映射
+        directory: 输出目录
+    """
+    import os
+    
+    from loguru import logger
+    
+    from utils.output import write_lines
+    from utils.profiling import stage
+    
+    os.makedirs(directory, exist_ok=True)
+    with stage('write.sources', directory=directory):
+        for label in direct_map.labels:
+            write_lines(direct_map.source_set(label).iter_cidrs(), os.path.join(directory, f'{label}.txt'))
+        rows = (
+            f'{"+".join(stats.labels)}\t{stats.ranges}\t{stats.addresses}'
+            for stats in direct_map.overlap_stats()
+        )
+        write_lines(['sources\tranges\taddresses', *rows], os.path.join(directory, 'overlap.tsv'))
+    logger.info(f'Wrote per-source lists for {", ".join(direct_map.labels)} to {directory}')
+
+
+def cmd_direct(
+    output: str,
+    addr_list: str,
+    xshell_dir: Optional[List[str]] = None,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    delta: bool = False,
+    state: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    source_lists: Optional[str] = None,
+    shard: Optional[ShardOptions] = None
+) -> int:
     """
     生成包含直连规则的 RouterOS 脚本
     
     Args:
         output: 输出文件路径
         addr_list: 地址列表名称
-        xshell_dir: Xshell 配置目录路径
+        xshell_dir: Xshell/SecureCRT 会话目录或 OpenSSH 配置文件路径
+        max_entries: 最大条目数（有损聚合）
+        max_overclaim: 允许误包含的地址数或 '/N'
+        delta: 是否生成增量脚本
+        state: 增量状态文件路径
+        ip_version: IP 版本
+        source_lists: 输出各直连来源 CIDR 列表和重叠统计的目录
+        shard: 分片与精简输出选项
     """
+    from loguru import logger
+    
+    from source.clang import get_cn_cidr, get_cn_ipv6_cidr
+    from source.google import get_google_service_cidr
+    from source.xshell import read_server_ips
+    from utils.concurrency import FetchTask, fetch_concurrently
+    from utils.profiling import stage
+    
     logger.info('Generating direct connection rules RouterOS script...')
     
-    # 获取中国 IP
-    cn_cidr = get_cn_cidr()
-    logger.info(f'Got {len(cn_cidr)} CN IPv4 CIDR entries')
+    ipv6 = ip_version == 'ipv6'
     
-    # 获取服务器 IP（如果指定了 Xshell 配置目录）
-    server_ip = []
-    if xshell_dir:
-        try:
-            server_ip = read_xshell_dir_ips(dir_path=xshell_dir)
-            logger.info(f'Got {len(server_ip)} server IPs from Xshell config')
-        except Exception as e:
-            logger.warning(f'Failed to read Xshell config: {e}')
+    # 并发获取中国 IP、服务器 IP（如果指定了 Xshell 配置目录）和 Google 服务 IP
+    tasks = [
+        FetchTask('cn', get_cn_ipv6_cidr if ipv6 else get_cn_cidr, timeout=SOURCE_FETCH_TIMEOUT),
+        FetchTask(
+            'google', get_google_service_cidr, (ip_version,),
+            timeout=SOURCE_FETCH_TIMEOUT, materialize=True
+        ),
+    ]
+    # 服务器配置中只读取 IPv4 服务器地址
+    if xshell_dir and not ipv6:
+        tasks.append(FetchTask(
+            'xshell', read_server_ips, (xshell_dir, XSHELL_CACHE_PATH),
+            timeout=SOURCE_FETCH_TIMEOUT, required=False, default=[]
+        ))
+    with stage('fetch'):
+        results = fetch_concurrently(tasks)
+    
+    cn_cidr = results['cn']
+    logger.info(f'Got {len(cn_cidr)} CN {ip_version} CIDR entries')
+    
+    server_ip = results.get('xshell', [])
+    if 'xshell' in results:
+        logger.info(f'Got {len(server_ip)} server IPs from server configs')
+    
+    # 过滤 Google 服务 IP 空值
+    google_ip = [ip for ip in results['google'] if ip]
+    logger.info(f'Got {len(google_ip)} Google service {ip_version} entries')
+    
+    _write_direct_script(
+        cn_cidr, server_ip, google_ip, output, addr_list, max_entries, max_overclaim,
+        delta, state, ip_version, source_lists, shard
+    )
+    logger.success(f'Script generated: {output}')
+    return 0
+
+
+def _write_direct_script(
+    cn_cidr: List[str],
+    server_ip: List[str],
+    google_ip: List[str],
+    output: str,
+    addr_list: str,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    delta: bool = False,
+    state: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    source_lists: Optional[str] = None,
+    shard: Optional[ShardOptions] = None
+) -> None:
+    """
+    由已获取的直连来源生成代理地址列表脚本，参数同 cmd_direct
     
-    # 获取 Google 服务 IP（过滤空值）
-    google_ip = [ip for ip in get_google_service_cidr('ipv4') if ip]
-    logger.info(f'Got {len(google_ip)} Google service IPv4 entries')
+    Args:
+        cn_cidr: 中国 IP CIDR 列表
+        server_ip: 服务器 IP 列表
+        google_ip: Google 服务 IP 列表
+    """
+    from loguru import logger
+    
+    from utils.interval import IntervalSet
+    from utils.ip import GLOBAL_UNICAST_IPV6_SET, RESERVED_IPV4_SET
+    from utils.labelled import LabelledIntervalMap
+    from utils.profiling import stage
     
-    # 合并所有直连 IP
-    direct_ip = cn_cidr + server_ip + CUSTOMER_EXCLUDE_IPS + google_ip
-    logger.info(f'Total direct IPs: {len(direct_ip)} entries')
+    ipv6 = ip_version == 'ipv6'
+    
+    # 合并所有直连 IP，保留每个区间来自哪些来源
+    customer_ip = CUSTOMER_EXCLUDE_IPV6S if ipv6 else CUSTOMER_EXCLUDE_IPS
+    direct_sources = {'cn': cn_cidr, 'server': server_ip, 'customer': customer_ip, 'google': google_ip}
+    logger.info(f'Total direct IPs: {sum(map(len, direct_sources.values()))} entries')
+    with stage('set_ops.label'):
+        direct_map = LabelledIntervalMap.from_cidrs(direct_sources, ip_version)
+    for stats in direct_map.overlap_stats():
+        logger.debug(
+            f'Direct sources {"+".join(stats.labels)}: {stats.ranges} ranges, {stats.addresses} addresses'
+        )
+    if source_lists:
+        _write_source_lists(direct_map, source_lists)
     
     # 生成代理 IP（补集）
-    proxy_ip = get_opposite_cidr(direct_ip)
+    with stage('set_ops.opposite'):
+        universe = GLOBAL_UNICAST_IPV6_SET if ipv6 else IntervalSet.full('ipv4') - RESERVED_IPV4_SET
+        proxy_ip = direct_map.complement(universe).to_cidrs()
     logger.info(f'Generated {len(proxy_ip)} proxy CIDR entries')
     
-    # 生成 RouterOS 脚本
-    generate_ros_script(proxy_ip, addr_list, output)
-    logger.success(f'Script generated: {output}')
+    # 生成 RouterOS 脚本（聚合时不得覆盖服务器和自定义直连 IP）
+    proxy_ip = _finalize_cidr(
+        proxy_ip, max_entries, max_overclaim,
+        exclude=server_ip + customer_ip, ip_version=ip_version
+    )
+    _write_ros_script(proxy_ip, addr_list, output, delta, state, ip_version, shard)
+
+
+LOOKUP_BATCH_SIZE = 65536
+
+
+def _lookup_stream(
+    index: 'LookupIndex',
+    lines: Iterable[str],
+    out: TextIO,
+    summary: bool = False,
+    show_prefix: bool = False
+) -> None:
+    """
+    分批查询输入中的 IP 地址并输出结果
+    
+    Args:
+        index: 查找索引
+        lines: 输入行，每行一个 IP 地址
+        out: 输出流
+        summary: 只输出每个集合的命中数
+        show_prefix: 输出命中的 CIDR 条目
+    """
+    from loguru import logger
+    
+    labels: Dict[Optional[int], str] = {None: 'invalid'}
+    mask_counts: Counter = Counter()
+    line_no = 0
+    
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, LOOKUP_BATCH_SIZE))
+        if not batch:
+            break
+        ips = list(map(str.strip, batch))
+        line_numbers = None
+        if '' in ips:
+            # 跳过空行，保留原始行号用于报错
+            line_numbers = [line_no + i + 1 for i, ip in enumerate(ips) if ip]
+            ips = [ip for ip in ips if ip]
+        masks = index.classify(ips)
+        
+        if None in masks:
+            for pos, mask in enumerate(masks):
+                if mask is None:
+                    number = line_numbers[pos] if line_numbers else line_no + pos + 1
+                    logger.warning(f'Invalid IP address at line {number}: {ips[pos]!r}')
+        line_no += len(batch)
+        
+        if summary:
+            mask_counts.update(masks)
+            continue
+        
+        for mask in set(masks):
+            if mask is not None and mask not in labels:
+                labels[mask] = ','.join(index.names_of(mask)) or '-'
+        
+        rows: Iterable[str]
+        if show_prefix:
+            rows = (
+                f'{ip}\t' + (','.join(
+                    f'{name}={index.match_prefix(name, ip)}' for name in index.names_of(mask)
+                ) or '-')
+                if mask is not None else f'{ip}\tinvalid'
+                for ip, mask in zip(ips, masks)
+            )
+        else:
+            rows = map('{}\t{}'.format, ips, map(labels.__getitem__, masks))
+        out.write('\n'.join(rows))
+        out.write('\n')
+    
+    if summary:
+        out.write(f'total\t{sum(mask_counts.values())}\n')
+        for bit, name in enumerate(index.names):
+            count = sum(n for mask, n in mask_counts.items() if mask is not None and mask >> bit & 1)
+            out.write(f'{name}\t{count}\n')
+        out.write(f'invalid\t{mask_counts[None]}\n')
+
+
+def _build_named_sets(
+    set_names: List[str],
+    ipv6: bool = False,
+    snapshot_dir: Optional[str] = None,
+    datasets: Optional[List[str]] = None,
+    refresh: bool = False
+) -> Dict[str, 'IntervalSet']:
+    """
+    构建查询用的命名集合，IPv6 集合名称加后缀 6
+    
+    Args:
+        set_names: 集合名称列表
+        ipv6: 是否同时构建 IPv6 集合
+        snapshot_dir: 快照目录，已编译的数据源直接映射
+        datasets: 额外从快照目录加载的数据集名称，如 apnic-JP、aws-us-east-1，
+            没有 IPv6 快照的数据集不加载 IPv6 集合
+        refresh: 是否重新下载进程内已获取过的云服务商文档
+        
+    Raises:
+        ValueError: 指定了 datasets 但没有快照目录时抛出
+    """
+    from source.sets import build_sets
+    from utils.snapshot import list_snapshots, load_snapshots
+    
+    if datasets and not snapshot_dir:
+        raise ValueError('Loading datasets requires a snapshot directory')
+    available = set(list_snapshots(snapshot_dir)) if datasets and snapshot_dir else set()
+    sets: Dict[str, 'IntervalSet'] = {}
+    for ip_version in IP_VERSIONS if ipv6 else IP_VERSIONS[:1]:
+        version_sets = build_sets(
+            set_names, ip_version,
+            direct_extra=CUSTOMER_EXCLUDE_IPV6S if ip_version == 'ipv6' else CUSTOMER_EXCLUDE_IPS,
+            timeout=SOURCE_FETCH_TIMEOUT,
+            snapshot_dir=snapshot_dir,
+            # IPv6 集合复用构建 IPv4 集合时刚下载的文档
+            refresh=refresh and ip_version == 'ipv4'
+        )
+        if datasets and snapshot_dir:
+            keys = [
+                (name, ip_version) for name in datasets
+                if ip_version == 'ipv4' or (name, ip_version) in available
+            ]
+            snapshots = load_snapshots(snapshot_dir, keys)
+            version_sets.update((name, ip_set) for (name, _), ip_set in snapshots.items())
+        suffix = '6' if ip_version == 'ipv6' else ''
+        sets.update((f'{name}{suffix}', ip_set) for name, ip_set in version_sets.items())
+    return sets
+
+
+def cmd_lookup(
+    set_names: List[str],
+    input_path: Optional[str] = None,
+    output: Optional[str] = None,
+    ipv6: bool = False,
+    summary: bool = False,
+    show_prefix: bool = False,
+    snapshot_dir: Optional[str] = None,
+    datasets: Optional[List[str]] = None
+) -> int:
+    """
+    批量查询 IP 地址属于哪些集合
+    
+    Args:
+        set_names: 集合名称列表
+        input_path: 输入文件路径，None 或 '-' 表示标准输入
+        output: 输出文件路径，None 或 '-' 表示标准输出
+        ipv6: 是否同时加载 IPv6 集合
+        summary: 只输出每个集合的命中数
+        show_prefix: 输出命中的 CIDR 条目
+        snapshot_dir: 快照目录，已编译的数据源直接映射
+        datasets: 额外从快照目录加载的数据集名称
+    """
+    from utils.lookup import LookupIndex
+    
+    index = LookupIndex(_build_named_sets(set_names, ipv6, snapshot_dir, datasets))
+    
+    in_file = sys.stdin if input_path in (None, '-') else open(input_path, 'r', encoding='utf-8')
+    out_file = sys.stdout if output in (None, '-') else open(output, 'w', encoding='utf-8')
+    try:
+        _lookup_stream(index, in_file, out_file, summary, show_prefix)
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+    return 0
+
+
+def cmd_serve(
+    set_names: List[str],
+    host: str = SERVER_HOST,
+    port: int = SERVER_PORT,
+    unix_path: Optional[str] = None,
+    ipv6: bool = False,
+    refresh_interval: int = SERVER_REFRESH_INTERVAL,
+    snapshot_dir: Optional[str] = None,
+    datasets: Optional[List[str]] = None
+) -> int:
+    """
+    启动常驻内存的 IP 分类服务
+    
+    Args:
+        set_names: 集合名称列表
+        host: 监听地址
+        port: 监听端口
+        unix_path: Unix 套接字路径，指定时不监听 TCP
+        ipv6: 是否同时加载 IPv6 集合
+        refresh_interval: 后台重建索引间隔（秒），0 表示不自动重建
+        snapshot_dir: 快照目录，已编译的数据源直接映射，重建时重新映射
+        datasets: 额外从快照目录加载的数据集名称
+    """
+    import asyncio
+    
+    from utils.server import ClassifyServer
+    
+    server = ClassifyServer(
+        lambda: _build_named_sets(set_names, ipv6, snapshot_dir, datasets, refresh=True), refresh_interval
+    )
+    try:
+        asyncio.run(server.serve(host, port, unix_path))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_compile(
+    snapshot_dir: str = SNAPSHOT_DIR,
+    sources: Optional[List[str]] = None
+) -> int:
+    """
+    将数据源编译为二进制快照
+    
+    Args:
+        snapshot_dir: 快照输出目录
+        sources: 数据源列表，None 表示全部
+    """
+    from loguru import logger
+    
+    from source.sets import build_datasets
+    from utils.snapshot import write_snapshots
+    
+    datasets = build_datasets(sources or COMPILE_SOURCES, timeout=SOURCE_FETCH_TIMEOUT)
+    write_snapshots(datasets, snapshot_dir)
+    logger.success(f'Compiled {len(datasets)} datasets into {snapshot_dir}')
+    return 0
+
+
+# watch 命令的输出：名称 -> (默认输出文件, 默认地址列表)
+WATCH_TARGETS: Dict[str, Tuple[str, str]] = {
+    'google': ('lst0-google', 'GOOGLE'),
+    'global': ('lst0-global', 'GLOBAL-R1'),
+    'direct': ('lst0-direct', 'GLOBAL-R1'),
+}
+
+
+def cmd_watch(
+    targets: List[str],
+    outputs: Dict[str, str],
+    addr_lists: Dict[str, str],
+    intervals: Dict[str, float],
+    xshell_dir: Optional[List[str]] = None,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[str] = None,
+    ip_version: 'IpVersion' = 'ipv4',
+    shard: Optional[ShardOptions] = None,
+    hook: Optional[str] = None,
+    once: bool = False
+) -> int:
+    """
+    持续监视数据源，只重新生成依赖已变化数据源的脚本
+    
+    Args:
+        targets: 要生成的输出（google、global、direct）
+        outputs: 输出名称到输出文件路径的映射
+        addr_lists: 输出名称到地址列表名称的映射
+        intervals: 数据源名称到轮询间隔（秒）的映射
+        xshell_dir: Xshell/SecureCRT 会话目录或 OpenSSH 配置文件路径（direct 使用）
+        max_entries: 最大条目数（有损聚合）
+        max_overclaim: 允许误包含的地址数或 '/N'
+        ip_version: IP 版本
+        shard: 分片与精简输出选项
+        hook: 输出文件内容变化后执行的 shell 命令
+        once: 只轮询一次后退出
+    """
+    import glob
+    import os
+    import signal
+    import threading
+    
+    from loguru import logger
+    
+    from source.clang import get_cn_cidr, get_cn_ipv6_cidr
+    from source.google import get_google_service_cidr
+    from source.xshell import read_server_ips
+    from utils.ip import get_opposite_cidr, get_opposite_ipv6_cidr
+    from utils.watch import Watcher, WatchSource, WatchTarget
+    
+    ipv6 = ip_version == 'ipv6'
+    
+    def write(name: str, proxy_ip: List[str]) -> None:
+        proxy_ip = _finalize_cidr(proxy_ip, max_entries, max_overclaim, ip_version=ip_version)
+        _write_ros_script(proxy_ip, addr_lists[name], outputs[name], ip_version=ip_version, shard=shard)
+    
+    def write_direct(data: Dict[str, List[str]]) -> None:
+        _write_direct_script(
+            data['cn'], data.get('xshell', []), [ip for ip in data['google'] if ip],
+            outputs['direct'], addr_lists['direct'], max_entries, max_overclaim,
+            ip_version=ip_version, shard=shard
+        )
+    
+    fetchers = {
+        'cn': get_cn_ipv6_cidr if ipv6 else get_cn_cidr,
+        'google': lambda: list(get_google_service_cidr(ip_version, refresh=True)),
+        'xshell': lambda: read_server_ips(xshell_dir or [], XSHELL_CACHE_PATH),
+    }
+    dependencies = {
+        'google': ('google',),
+        'global': ('cn',),
+        # 服务器配置中只读取 IPv4 服务器地址
+        'direct': ('cn', 'google', 'xshell') if xshell_dir and not ipv6 else ('cn', 'google'),
+    }
+    generators = {
+        'google': lambda data: write('google', data['google']),
+        'global': lambda data: write(
+            'global', get_opposite_ipv6_cidr(data['cn']) if ipv6 else get_opposite_cidr(data['cn'])
+        ),
+        'direct': write_direct,
+    }
+    
+    def output_files(name: str) -> Tuple[str, ...]:
+        if not shard or not (shard.max_entries or shard.max_bytes):
+            return (outputs[name],)
+        # 分片文件名见 utils.output.shard_path
+        root, ext = os.path.splitext(outputs[name])
+        return (outputs[name], f'{glob.escape(root)}-[0-9][0-9][0-9]{glob.escape(ext)}')
+    
+    needed = sorted({source for name in targets for source in dependencies[name]})
+    watcher = Watcher(
+        [
+            WatchSource(name, fetchers[name], intervals[name], timeout=SOURCE_FETCH_TIMEOUT)
+            for name in needed
+        ],
+        [
+            WatchTarget(name, dependencies[name], generators[name], output_files(name))
+            for name in targets
+        ],
+        hook
+    )
+    
+    if once:
+        watcher.run_once()
+        # 获取失败的数据源也计入退出码，否则 cron 中什么都没生成也会报告成功
+        return 1 if watcher.failed or watcher.fetch_failed else 0
+    
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    watcher.run(stop)
+    logger.info('Watch stopped')
     return 0
 
 
 # ==================== 主程序 ====================
 
+def _add_aggregate_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加有损聚合相关选项"""
+    parser.add_argument(
+        '--max-entries',
+        dest='max_entries',
+        type=int,
+        default=None,
+        help='最大地址列表条目数，超出时合并相邻网段为超网 (默认: 不聚合)'
+    )
+    parser.add_argument(
+        '--max-overclaim',
+        dest='max_overclaim',
+        default=None,
+        help='聚合允许误包含的地址数，可写作 /N 表示一个 /N 网段 (默认: 不限制)'
+    )
+
+
+def _add_ip_version_argument(parser: argparse.ArgumentParser) -> None:
+    """添加 IP 版本选项"""
+    parser.add_argument(
+        '-6', '--ipv6',
+        dest='ip_version',
+        action='store_const',
+        const='ipv6',
+        default='ipv4',
+        help='生成 IPv6 地址列表脚本 (默认: IPv4)'
+    )
+
+
+def _add_delta_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加增量脚本相关选项"""
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        help='只输出与上次生成结果相比需要删除和添加的条目'
+    )
+    parser.add_argument(
+        '--state',
+        default=None,
+        help='增量模式的状态文件路径，记录路由器已导入的列表 (默认: <输出文件>.state)'
+    )
+    parser.add_argument(
+        '--commit-state',
+        dest='commit_state',
+        action='store_true',
+        help='路由器导入最近生成的脚本后执行：将待确认的 <状态文件>.pending 设为状态文件，不生成脚本'
+    )
+
+
+def _parse_assignment(value: str) -> Tuple[str, str]:
+    """解析 NAME=VALUE 形式的参数"""
+    name, sep, text = value.partition('=')
+    if not sep or not name or not text:
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE: {value!r}')
+    return name, text
+
+
+SIZE_SUFFIXES = {'k': 1024, 'm': 1024 ** 2}
+
+
+def _parse_size(value: str) -> int:
+    """解析字节数，支持 K、M 后缀（1024 进制）"""
+    text = value.strip().lower().rstrip('b')
+    multiplier = SIZE_SUFFIXES.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    try:
+        size = int(text) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid size: {value!r}') from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f'size must be positive: {value!r}')
+    return size
+
+
+def _positive_int(value: str) -> int:
+    """解析正整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid integer: {value!r}') from None
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'must be positive: {value!r}')
+    return number
+
+
+def _add_shard_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加脚本分片与精简输出选项"""
+    parser.add_argument(
+        '--shard-entries',
+        dest='shard_entries',
+        type=_positive_int,
+        default=None,
+        metavar='N',
+        help='按每个文件最多 N 条拆分为 <输出>-001、<输出>-002 ... (序号插在扩展名前)，输出文件本身为依次 /import 各分片的入口脚本'
+    )
+    parser.add_argument(
+        '--shard-bytes',
+        dest='shard_bytes',
+        type=_parse_size,
+        default=None,
+        metavar='SIZE',
+        help='按每个文件最大字节数拆分，支持 K、M 后缀，如 64K (可与 --shard-entries 同时使用)'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='省略每个条目的 :do {} on-error={} 包装，脚本更小、导入更快'
+    )
+
+
+def _add_snapshot_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加数据集快照相关选项"""
+    parser.add_argument(
+        '--snapshot-dir',
+        dest='snapshot_dir',
+        nargs='?',
+        const=SNAPSHOT_DIR,
+        default=None,
+        metavar='DIR',
+        help=f'从 compile 生成的快照目录映射已编译的数据源，不指定 DIR 时为 {SNAPSHOT_DIR}'
+    )
+    parser.add_argument(
+        '-d', '--dataset',
+        dest='datasets',
+        action='append',
+        default=None,
+        metavar='NAME',
+        help='额外加载快照目录中的数据集，如 apnic-JP、aws-us-east-1，可多次指定 (需要 --snapshot-dir)'
+    )
+
+
 def create_parser() -> argparse.ArgumentParser:
     """创建命令行参数解析器"""
     parser = argparse.ArgumentParser(
@@ -116,6 +868,13 @@ def create_parser() -> argparse.ArgumentParser:
   %(prog)s direct                      # 生成直连规则脚本
   %(prog)s google -o my-google.rsc     # 指定输出文件
   %(prog)s global -l MY-LIST           # 指定地址列表名称
+  %(prog)s global --max-entries 8000   # 聚合到 8000 条以内
+  %(prog)s global --delta              # 只输出与上次相比的变更
+  %(prog)s global --shard-bytes 64K    # 拆分为不超过 64 KiB 的脚本
+  %(prog)s global --ipv6               # 生成非中国 IPv6 脚本
+  %(prog)s lookup -i ips.txt           # 批量查询 IP 所属集合
+  %(prog)s serve --unix /tmp/bgp.sock  # 启动常驻分类服务
+  %(prog)s watch google global         # 数据源变化时重新生成脚本
         '''
     )
     
@@ -129,15 +888,20 @@ def create_parser() -> argparse.ArgumentParser:
     )
     google_parser.add_argument(
         '-o', '--output',
-        default='lst0-google',
-        help='输出文件路径 (默认: lst0-google)'
+        default=None,
+        help='输出文件路径 (默认: lst0-google，IPv6 为 lst0-google-ipv6)'
     )
+    google_parser.set_defaults(default_output='lst0-google')
     google_parser.add_argument(
         '-l', '--list',
         dest='addr_list',
         default='GOOGLE',
         help='地址列表名称 (默认: GOOGLE)'
     )
+    _add_aggregate_arguments(google_parser)
+    _add_delta_arguments(google_parser)
+    _add_shard_arguments(google_parser)
+    _add_ip_version_argument(google_parser)
     
     # global 子命令
     global_parser = subparsers.add_parser(
@@ -146,15 +910,20 @@ def create_parser() -> argparse.ArgumentParser:
     )
     global_parser.add_argument(
         '-o', '--output',
-        default='lst0-global',
-        help='输出文件路径 (默认: lst0-global)'
+        default=None,
+        help='输出文件路径 (默认: lst0-global，IPv6 为 lst0-global-ipv6)'
     )
+    global_parser.set_defaults(default_output='lst0-global')
     global_parser.add_argument(
         '-l', '--list',
         dest='addr_list',
         default='GLOBAL-R1',
         help='地址列表名称 (默认: GLOBAL-R1)'
     )
+    _add_aggregate_arguments(global_parser)
+    _add_delta_arguments(global_parser)
+    _add_shard_arguments(global_parser)
+    _add_ip_version_argument(global_parser)
     
     # direct 子命令
     direct_parser = subparsers.add_parser(
@@ -163,9 +932,10 @@ def create_parser() -> argparse.ArgumentParser:
     )
     direct_parser.add_argument(
         '-o', '--output',
-        default='lst0-global',
-        help='输出文件路径 (默认: lst0-global)'
+        default=None,
+        help='输出文件路径 (默认: lst0-global，IPv6 为 lst0-global-ipv6)'
     )
+    direct_parser.set_defaults(default_output='lst0-global')
     direct_parser.add_argument(
         '-l', '--list',
         dest='addr_list',
@@ -175,9 +945,192 @@ def create_parser() -> argparse.ArgumentParser:
     direct_parser.add_argument(
         '-x', '--xshell-dir',
         dest='xshell_dir',
+        action='append',
+        default=None,
+        help='Xshell/SecureCRT 会话目录或 OpenSSH 配置文件路径，可多次指定 (可选)'
+    )
+    direct_parser.add_argument(
+        '--source-lists',
+        dest='source_lists',
+        metavar='DIR',
+        default=None,
+        help='另将各直连来源 (cn、server、customer、google) 的 CIDR 列表和重叠统计 overlap.tsv 写入 DIR'
+    )
+    _add_aggregate_arguments(direct_parser)
+    _add_delta_arguments(direct_parser)
+    _add_shard_arguments(direct_parser)
+    _add_ip_version_argument(direct_parser)
+    
+    # lookup 子命令
+    lookup_parser = subparsers.add_parser(
+        'lookup',
+        help='批量查询 IP 地址属于哪些集合'
+    )
+    lookup_parser.add_argument(
+        '-s', '--set',
+        dest='sets',
+        action='append',
+        choices=SET_NAMES,
+        default=None,
+        help='要查询的集合，可多次指定 (默认: cn, google, proxy)'
+    )
+    lookup_parser.add_argument(
+        '-i', '--input',
+        default=None,
+        help='输入文件，每行一个 IP 地址 (默认: 标准输入)'
+    )
+    lookup_parser.add_argument(
+        '-o', '--output',
+        default=None,
+        help='输出文件 (默认: 标准输出)'
+    )
+    lookup_parser.add_argument(
+        '-6', '--ipv6',
+        action='store_true',
+        help='同时加载 IPv6 集合，集合名称加后缀 6，如 cn6'
+    )
+    lookup_parser.add_argument(
+        '--summary',
+        action='store_true',
+        help='只输出每个集合的命中数'
+    )
+    lookup_parser.add_argument(
+        '--prefix',
+        dest='show_prefix',
+        action='store_true',
+        help='输出每个集合中命中的 CIDR 条目'
+    )
+    _add_snapshot_arguments(lookup_parser)
+    
+    # serve 子命令
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='启动常驻内存的 IP 分类服务 (JSON Lines 协议)'
+    )
+    serve_parser.add_argument(
+        '-s', '--set',
+        dest='sets',
+        action='append',
+        choices=SET_NAMES,
+        default=None,
+        help='加载的集合，可多次指定 (默认: cn, google, aws, proxy)'
+    )
+    serve_parser.add_argument(
+        '--host',
+        default=SERVER_HOST,
+        help=f'监听地址 (默认: {SERVER_HOST})'
+    )
+    serve_parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVER_PORT,
+        help=f'监听端口 (默认: {SERVER_PORT})'
+    )
+    serve_parser.add_argument(
+        '--unix',
+        dest='unix_path',
+        default=None,
+        help='监听 Unix 套接字而不是 TCP'
+    )
+    serve_parser.add_argument(
+        '-6', '--ipv6',
+        action='store_true',
+        help='同时加载 IPv6 集合，集合名称加后缀 6，如 cn6'
+    )
+    serve_parser.add_argument(
+        '--refresh',
+        dest='refresh_interval',
+        type=int,
+        default=SERVER_REFRESH_INTERVAL,
+        help=f'后台重建索引间隔（秒），0 表示不自动重建，也可发送 SIGHUP 触发 (默认: {SERVER_REFRESH_INTERVAL})'
+    )
+    _add_snapshot_arguments(serve_parser)
+    
+    # compile 子命令
+    compile_parser = subparsers.add_parser(
+        'compile',
+        help='将数据源编译为可直接映射的二进制快照'
+    )
+    compile_parser.add_argument(
+        '-o', '--output',
+        dest='snapshot_dir',
+        default=SNAPSHOT_DIR,
+        metavar='DIR',
+        help=f'快照输出目录 (默认: {SNAPSHOT_DIR})'
+    )
+    compile_parser.add_argument(
+        '--source',
+        dest='sources',
+        action='append',
+        choices=COMPILE_SOURCES,
+        default=None,
+        help='要编译的数据源，可多次指定 (默认: 全部)'
+    )
+    
+    # watch 子命令
+    watch_parser = subparsers.add_parser(
+        'watch',
+        help='持续监视数据源，只重新生成受影响的脚本'
+    )
+    watch_parser.add_argument(
+        'targets',
+        nargs='+',
+        choices=list(WATCH_TARGETS),
+        metavar='TARGET',
+        help=f'要生成的输出: {", ".join(WATCH_TARGETS)}'
+    )
+    watch_parser.add_argument(
+        '-o', '--output',
+        dest='outputs',
+        action='append',
+        type=_parse_assignment,
+        default=[],
+        metavar='TARGET=PATH',
+        help='指定输出文件，可多次指定 (默认: '
+             + ', '.join(f'{name}={path}' for name, (path, _) in WATCH_TARGETS.items())
+             + '，IPv6 加 -ipv6 后缀)'
+    )
+    watch_parser.add_argument(
+        '-l', '--list',
+        dest='addr_lists',
+        action='append',
+        type=_parse_assignment,
+        default=[],
+        metavar='TARGET=NAME',
+        help='指定地址列表名称，可多次指定 (默认: '
+             + ', '.join(f'{name}={addr_list}' for name, (_, addr_list) in WATCH_TARGETS.items()) + ')'
+    )
+    watch_parser.add_argument(
+        '-x', '--xshell-dir',
+        dest='xshell_dir',
+        action='append',
         default=None,
-        help='Xshell 配置目录路径 (可选)'
+        help='Xshell/SecureCRT 会话目录或 OpenSSH 配置文件路径，可多次指定 (direct 使用，可选)'
+    )
+    watch_parser.add_argument(
+        '--interval',
+        dest='intervals',
+        action='append',
+        type=_parse_assignment,
+        default=[],
+        metavar='SOURCE=SECONDS',
+        help='数据源轮询间隔，可多次指定 (默认: '
+             + ', '.join(f'{name}={seconds}' for name, seconds in WATCH_INTERVALS.items()) + ')'
     )
+    watch_parser.add_argument(
+        '--hook',
+        default=None,
+        metavar='CMD',
+        help='输出文件内容变化后执行的 shell 命令，环境变量 BGP_TOOLS_TARGET 为输出名称，BGP_TOOLS_OUTPUTS 为变化的文件'
+    )
+    watch_parser.add_argument(
+        '--once',
+        action='store_true',
+        help='只轮询一次，生成受影响的输出后退出；有数据源获取失败或输出生成失败时退出码为 1'
+    )
+    _add_aggregate_arguments(watch_parser)
+    _add_shard_arguments(watch_parser)
+    _add_ip_version_argument(watch_parser)
     
     # 全局选项
     parser.add_argument(
@@ -190,6 +1143,66 @@ def create_parser() -> argparse.ArgumentParser:
         action='store_true',
         help='静默模式，只显示错误'
     )
+    parser.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        default=HTTP_CACHE_DIR,
+        help=f'HTTP 下载缓存目录 (默认: {HTTP_CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        dest='cache_ttl',
+        type=int,
+        default=HTTP_CACHE_TTL,
+        help=f'缓存新鲜期（秒），期内不发起请求，过期后用 ETag/Last-Modified 校验 (默认: {HTTP_CACHE_TTL})'
+    )
+    parser.add_argument(
+        '--cache-only',
+        dest='cache_only',
+        action='store_true',
+        help='离线模式，只使用本地缓存'
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='no_cache',
+        action='store_true',
+        help='禁用 HTTP 缓存'
+    )
+    parser.add_argument(
+        '--retries',
+        dest='retries',
+        type=int,
+        default=HTTP_RETRIES,
+        metavar='N',
+        help=f'连接失败、超时和 5xx 响应的重试次数，0 表示不重试 (默认: {HTTP_RETRIES})'
+    )
+    parser.add_argument(
+        '--profile',
+        dest='profile',
+        metavar='PATH',
+        default=None,
+        help='记录各阶段耗时、CPU 时间、下载字节数和内存峰值并写入 PATH'
+    )
+    parser.add_argument(
+        '--profile-format',
+        dest='profile_format',
+        choices=['json', 'chrome'],
+        default='json',
+        help='跟踪文件格式，chrome 可在 chrome://tracing 或 Perfetto 中打开 (默认: json)'
+    )
+    parser.add_argument(
+        '--profile-stage',
+        dest='profile_stage',
+        metavar='STAGE',
+        default=None,
+        help='对指定阶段（如 fetch.cn、render）运行 cProfile，结果保存为 PATH.STAGE.prof'
+    )
+    parser.add_argument(
+        '--profile-no-memory',
+        dest='profile_memory',
+        action='store_false',
+        help='不使用 tracemalloc 记录内存峰值，降低跟踪开销'
+    )
     parser.add_argument(
         '--version',
         action='version',
@@ -199,11 +1212,122 @@ def create_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def _run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    """执行解析后的子命令"""
+    if args.command in ('lookup', 'serve') and args.datasets:
+        if not args.snapshot_dir:
+            parser.error('--dataset requires --snapshot-dir')
+        from utils.snapshot import list_snapshots
+        
+        compiled = {name for name, ip_version in list_snapshots(args.snapshot_dir) if ip_version == 'ipv4'}
+        missing = [name for name in args.datasets if name not in compiled]
+        if missing:
+            parser.error(f'dataset(s) not compiled in {args.snapshot_dir}: {", ".join(missing)}')
+    if args.command == 'lookup':
+        # 只指定 --dataset 时不加载默认集合
+        default_sets = [] if args.datasets else ['cn', 'google', 'proxy']
+        return cmd_lookup(
+            args.sets or default_sets, args.input, args.output,
+            args.ipv6, args.summary, args.show_prefix, args.snapshot_dir, args.datasets
+        )
+    if args.command == 'serve':
+        default_sets = [] if args.datasets else ['cn', 'google', 'aws', 'proxy']
+        return cmd_serve(
+            args.sets or default_sets, args.host, args.port,
+            args.unix_path, args.ipv6, args.refresh_interval, args.snapshot_dir, args.datasets
+        )
+    if args.command == 'compile':
+        return cmd_compile(args.snapshot_dir, args.sources)
+    if args.command == 'watch':
+        return _run_watch(parser, args)
+    
+    # IPv6 默认输出到单独的文件，避免覆盖 IPv4 脚本
+    output = args.output
+    if output is None:
+        output = args.default_output
+        if args.ip_version == 'ipv6':
+            output += '-ipv6'
+    
+    if args.commit_state:
+        from generator.ros import commit_ros_state, ros_state_path
+        
+        return 0 if commit_ros_state(ros_state_path(output, args.state)) else 1
+    
+    shard = ShardOptions(args.shard_entries, args.shard_bytes, args.compact)
+    if args.delta and shard != ShardOptions():
+        parser.error('--delta cannot be combined with --shard-entries, --shard-bytes or --compact')
+    
+    # 执行对应命令
+    if args.command == 'google':
+        return cmd_google(
+            output, args.addr_list, args.max_entries, args.max_overclaim,
+            args.delta, args.state, args.ip_version, shard
+        )
+    elif args.command == 'global':
+        return cmd_global(
+            output, args.addr_list, args.max_entries, args.max_overclaim,
+            args.delta, args.state, args.ip_version, shard
+        )
+    elif args.command == 'direct':
+        return cmd_direct(
+            output, args.addr_list, args.xshell_dir, args.max_entries, args.max_overclaim,
+            args.delta, args.state, args.ip_version, args.source_lists, shard
+        )
+    else:
+        parser.print_help()
+        return 1
+
+
+def _run_watch(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    """校验 watch 子命令的参数并执行"""
+    targets = list(dict.fromkeys(args.targets))
+    suffix = '-ipv6' if args.ip_version == 'ipv6' else ''
+    outputs = {name: path + suffix for name, (path, _) in WATCH_TARGETS.items()}
+    addr_lists = {name: addr_list for name, (_, addr_list) in WATCH_TARGETS.items()}
+    intervals: Dict[str, float] = dict(WATCH_INTERVALS)
+    
+    for option, values, known in (
+        ('--output', args.outputs, outputs), ('--list', args.addr_lists, addr_lists)
+    ):
+        for name, value in values:
+            if name not in known:
+                parser.error(f'{option}: unknown target {name!r} (choose from {", ".join(WATCH_TARGETS)})')
+            known[name] = value
+    for name, value in args.intervals:
+        if name not in intervals:
+            parser.error(f'--interval: unknown source {name!r} (choose from {", ".join(WATCH_INTERVALS)})')
+        try:
+            intervals[name] = float(value)
+        except ValueError:
+            parser.error(f'--interval: invalid seconds for {name}: {value!r}')
+        if intervals[name] <= 0:
+            parser.error(f'--interval: seconds must be positive for {name}: {value!r}')
+    
+    paths = Counter(outputs[name] for name in targets)
+    shared = [path for path, count in paths.items() if count > 1]
+    if shared:
+        parser.error(f'targets share output file(s): {", ".join(shared)} (use --output TARGET=PATH)')
+    
+    return cmd_watch(
+        targets, outputs, addr_lists, intervals, args.xshell_dir, args.max_entries, args.max_overclaim,
+        args.ip_version, ShardOptions(args.shard_entries, args.shard_bytes, args.compact), args.hook, args.once
+    )
+
+
 def main() -> int:
     """主入口函数"""
     parser = create_parser()
     args = parser.parse_args()
     
+    if args.no_cache and args.cache_only:
+        parser.error('--cache-only cannot be combined with --no-cache')
+    
+    # 参数解析之后再导入，--help 和参数错误时不加载日志、网络等模块
+    from loguru import logger
+    
+    from utils.http import configure_cache, configure_session
+    from utils.profiling import disable_profiling, enable_profiling
+    
     # 配置日志级别
     logger.remove()
     if args.quiet:
@@ -213,16 +1337,34 @@ def main() -> int:
     else:
         logger.add(sys.stderr, level="INFO")
     
-    # 执行对应命令
-    if args.command == 'google':
-        return cmd_google(args.output, args.addr_list)
-    elif args.command == 'global':
-        return cmd_global(args.output, args.addr_list)
-    elif args.command == 'direct':
-        return cmd_direct(args.output, args.addr_list, args.xshell_dir)
-    else:
+    # 配置 HTTP 缓存
+    configure_cache(
+        cache_dir=None if args.no_cache else args.cache_dir,
+        ttl=args.cache_ttl,
+        max_size=HTTP_CACHE_MAX_SIZE,
+        cache_only=args.cache_only
+    )
+    configure_session(retries=args.retries)
+    
+    if args.command is None:
         parser.print_help()
         return 1
+    
+    if not args.profile:
+        return _run_command(parser, args)
+    
+    enable_profiling(args.profile_memory, args.profile_stage)
+    try:
+        return _run_command(parser, args)
+    finally:
+        profiler = disable_profiling()
+        if profiler is not None:
+            logger.info(f'Stage profile:\n{profiler.summary()}')
+            try:
+                profiler.save(args.profile, args.profile_format)
+            except OSError as e:
+                # 不掩盖命令本身的返回值或异常
+                logger.error(f'Failed to write profile to {args.profile}: {e}')
 
 
 if __name__ == '__main__':
@@ -3,27 +3,64 @@ IP 数据源模块
 
 提供从各种数据源获取 IP CIDR 的功能
 """
-from .apnic import get_ip_range_by_country, get_non_ip_range_by_country
-from .aws import get_aws_cidr
-from .clang import get_cn_cidr, get_non_cn_cidr, get_cn_ipv6_cidr, get_non_cn_ipv6_cidr
-from .google import get_google_service_cidr, get_google_cloud_cidr
-from .xshell import read_xshell_config_ip, read_xshell_dir_ips
+from utils.lazy import lazy_exports
+
+# 子模块在首次访问其导出名称时才导入
+__getattr__, __dir__ = lazy_exports(__name__, {
+    '.apnic': (
+        'ApnicIndex', 'get_apnic_index', 'get_ip_range_by_country', 'get_non_ip_range_by_country',
+    ),
+    '.aws': ('get_aws_catalog', 'get_aws_cidr', 'get_aws_region_cidrs', 'parse_aws_catalog'),
+    '.clang': ('get_cn_cidr', 'get_non_cn_cidr', 'get_cn_ipv6_cidr', 'get_non_cn_ipv6_cidr'),
+    '.cloud': ('CloudCatalog', 'load_json'),
+    '.rir': ('build_rir_index', 'get_rir_index', 'get_rir_range_by_country', 'iter_rir_records'),
+    '.google': (
+        'get_google_catalog', 'get_google_service_cidr', 'get_google_cloud_cidr', 'parse_google_catalog',
+    ),
+    '.sets': ('COMPILE_SOURCES', 'SET_NAMES', 'build_datasets', 'build_sets', 'get_opposite_set'),
+    '.xshell': (
+        'parse_server_config', 'read_server_ips', 'read_xshell_config_ip', 'read_xshell_dir_ips',
+    ),
+})
 
 __all__ = [
     # APNIC
+    'ApnicIndex',
+    'get_apnic_index',
     'get_ip_range_by_country',
     'get_non_ip_range_by_country',
     # AWS
+    'get_aws_catalog',
     'get_aws_cidr',
+    'get_aws_region_cidrs',
+    'parse_aws_catalog',
     # Clang
     'get_cn_cidr',
     'get_non_cn_cidr',
     'get_cn_ipv6_cidr',
     'get_non_cn_ipv6_cidr',
+    # Cloud
+    'CloudCatalog',
+    'load_json',
     # Google
+    'get_google_catalog',
     'get_google_service_cidr',
     'get_google_cloud_cidr',
+    'parse_google_catalog',
+    # RIR
+    'build_rir_index',
+    'get_rir_index',
+    'get_rir_range_by_country',
+    'iter_rir_records',
+    # Sets
+    'COMPILE_SOURCES',
+    'SET_NAMES',
+    'build_datasets',
+    'build_sets',
+    'get_opposite_set',
     # Xshell
+    'parse_server_config',
+    'read_server_ips',
     'read_xshell_config_ip',
     'read_xshell_dir_ips',
 ]
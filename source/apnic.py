@@ -1,9 +1,11 @@
-import math
-from typing import List, Literal
+import socket
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Literal, NamedTuple, Optional, Tuple
 
-import requests
-
-from utils.number import is_int
+from utils.http import iter_url_lines
+from utils.interval import IntervalSet, format_ip, range_to_prefixes
+from utils.profiling import stage
 from loguru import logger
 
 IpVersion = Literal['ipv4', 'ipv6']
@@ -11,30 +13,305 @@ IpVersion = Literal['ipv4', 'ipv6']
 APNIC_DELEGATED_URL = 'http://ftp.apnic.net/stats/apnic/delegated-apnic-latest'
 DEFAULT_TIMEOUT = 60
 
+_IP_BITS = {'ipv4': 32, 'ipv6': 128}
+_ADDRESS_FAMILY = {'ipv4': socket.AF_INET, 'ipv6': socket.AF_INET6}
+
+# 索引快照格式：魔数、格式版本、条目数；每个条目为
+# 国家、IP 版本、状态、区间数及 IntervalSet.to_bytes() 数据
+_SNAPSHOT_MAGIC = b'APNICIDX'
+_SNAPSHOT_FORMAT = 1
+_SNAPSHOT_HEADER = struct.Struct('<8sHI')
+_SNAPSHOT_ENTRY = struct.Struct('<2sB16sI')
+
+IndexKey = Tuple[str, IpVersion, str]
 
-def _dump_allocated() -> str:
+
+class ApnicRecord(NamedTuple):
+    """delegated 文件中的一条 IP 分配记录"""
+    registry: str       # 注册机构，如 'apnic'
+    country: str        # 国家代码
+    ip_version: IpVersion   # 'ipv4' 或 'ipv6'
+    start: int          # 起始地址
+    size: int           # 地址数量
+    date: str           # 分配日期
+    status: str         # 'allocated' / 'assigned' 等
+    
+    @property
+    def end(self) -> int:
+        """结束地址（包含）"""
+        return self.start + self.size - 1
+    
+    def iter_cidrs(self) -> Iterator[str]:
+        """将 (start, size) 区间拆分为精确的 CIDR"""
+        start, size = self.start, self.size
+        if size & (size - 1) == 0 and start & (size - 1) == 0:
+            # 绝大多数记录本身就是一个对齐的 CIDR 块
+            bits = _IP_BITS[self.ip_version]
+            yield f'{format_ip(start, self.ip_version)}/{bits + 1 - size.bit_length()}'
+            return
+        for net, prefix_len in range_to_prefixes(self.start, self.end, _IP_BITS[self.ip_version]):
+            yield f'{format_ip(net, self.ip_version)}/{prefix_len}'
+
+
+def iter_delegated_records(
+    lines: Iterable[str],
+    ip_version: Optional[IpVersion] = None,
+    country: Optional[str] = None
+) -> Iterator[ApnicRecord]:
     """
-    下载 APNIC 分配数据
+    流式解析 RIR delegated 格式数据
     
-    Returns:
-        原始文本数据
+    跳过注释、版本行、汇总行以及 ASN 记录。IPv4 记录的 value 字段为地址数量，
+    IPv6 记录的 value 字段为前缀长度。
+    
+    Args:
+        lines: 文本行（文件对象或行迭代器）
+        ip_version: 只返回指定 IP 版本的记录
+        country: 只返回指定国家的记录
+        
+    Yields:
+        IP 分配记录
+    """
+    inet_pton = socket.inet_pton
+    from_bytes = int.from_bytes
+    new_record = tuple.__new__  # 绕过 NamedTuple 的 Python 层 __new__，构造快一倍
+    
+    # 先做子串匹配再拆分字段，跳过无关行的开销最小
+    needle = '|'
+    if country is not None:
+        needle = f'|{country}|' + (f'{ip_version}|' if ip_version else '')
+    elif ip_version is not None:
+        needle = f'|{ip_version}|'
+    
+    for line in lines:
+        if needle not in line:
+            continue
+        parts = line.rstrip('\r\n').split('|')
+        if len(parts) < 7:
+            continue
+        
+        registry, cc, version, ip, value, date, status = parts[:7]
+        if version != 'ipv4' and version != 'ipv6':
+            continue
+        if cc == '*' or not value.isdigit():
+            continue
+        if (ip_version is not None and version != ip_version) or (
+            country is not None and cc != country
+        ):
+            continue
+        
+        try:
+            start = from_bytes(inet_pton(_ADDRESS_FAMILY[version], ip), 'big')
+        except OSError:
+            logger.warning(f'Skipping invalid delegated record: {line.strip()}')
+            continue
+        
+        if version == 'ipv4':
+            size = int(value)
+        else:
+            size = 1 << (128 - int(value))
+        yield new_record(ApnicRecord, (registry, cc, version, start, size, date, status))
+
+
+def _iter_allocated_records(
+    ip_version: Optional[IpVersion] = None,
+    country: Optional[str] = None
+) -> Iterator[ApnicRecord]:
+    """
+    流式下载并解析 APNIC 分配数据
+    
+    Args:
+        ip_version: 只返回指定 IP 版本的记录
+        country: 只返回指定国家的记录
+        
+    Yields:
+        IP 分配记录
         
     Raises:
-        ValueError: 下载失败时抛出
+        requests.RequestException: 下载失败时抛出
+    """
+    logger.info(f'Loading APNIC allocated data from {APNIC_DELEGATED_URL}')
+    lines = iter_url_lines(APNIC_DELEGATED_URL, timeout=DEFAULT_TIMEOUT)
+    yield from iter_delegated_records(lines, ip_version, country)
+
+
+class ApnicIndex:
+    """
+    APNIC 分配数据索引
+    
+    一次解析 delegated 文件，按 (国家, IP 版本, 状态) 保存合并后的区间集合，
+    多个国家、多个版本的查询及其补集都无需重新下载和解析。
     """
-    res = requests.get(APNIC_DELEGATED_URL, timeout=DEFAULT_TIMEOUT)
-    if res.status_code != 200:
-        raise ValueError(f'Failed to download delegated-apnic-latest, status: {res.status_code}')
-    logger.info(f'Downloaded APNIC allocated data from {APNIC_DELEGATED_URL}')
-    return res.text
+    
+    def __init__(self, sets: Optional[Dict[IndexKey, IntervalSet]] = None) -> None:
+        """
+        Args:
+            sets: (国家, IP 版本, 状态) 到区间集合的映射
+        """
+        self.sets: Dict[IndexKey, IntervalSet] = sets or {}
+    
+    @classmethod
+    def from_records(cls, records: Iterable[ApnicRecord]) -> 'ApnicIndex':
+        """
+        由分配记录一次性构建索引
+        
+        Args:
+            records: 分配记录
+            
+        Returns:
+            索引
+        """
+        ranges: Dict[IndexKey, List[List[int]]] = {}
+        for record in records:
+            key = (record.country, record.ip_version, record.status)
+            bucket = ranges.get(key)
+            if bucket is None:
+                bucket = ranges[key] = []
+            # 记录基本按地址递增，相邻记录就地合并以控制内存
+            if bucket and bucket[-1][1] + 1 == record.start:
+                bucket[-1][1] = record.start + record.size - 1
+            else:
+                bucket.append([record.start, record.start + record.size - 1])
+        
+        sets = {
+            key: IntervalSet.from_ranges(((start, end) for start, end in bucket), key[1])
+            for key, bucket in ranges.items()
+        }
+        return cls(sets)
+    
+    def countries(self, ip_version: Optional[IpVersion] = None) -> List[str]:
+        """返回索引中的国家代码"""
+        return sorted({
+            country for country, version, _ in self.sets
+            if ip_version is None or version == ip_version
+        })
+    
+    def get_set(
+        self,
+        country: str,
+        ip_version: IpVersion = 'ipv4',
+        status: Optional[str] = None
+    ) -> IntervalSet:
+        """
+        获取指定国家的区间集合
+        
+        Args:
+            country: 国家代码
+            ip_version: IP 版本
+            status: 分配状态，None 表示全部
+            
+        Returns:
+            区间集合
+        """
+        return IntervalSet.union_all((
+            ip_set for (cc, version, st), ip_set in self.sets.items()
+            if cc == country and version == ip_version and (status is None or st == status)
+        ), ip_version)
+    
+    def get_non_set(
+        self,
+        country: str,
+        ip_version: IpVersion = 'ipv4',
+        status: Optional[str] = None
+    ) -> IntervalSet:
+        """
+        获取除指定国家外其他国家的区间集合
+        
+        Args:
+            country: 要排除的国家代码
+            ip_version: IP 版本
+            status: 分配状态，None 表示全部
+            
+        Returns:
+            区间集合
+        """
+        return IntervalSet.union_all((
+            ip_set for (cc, version, st), ip_set in self.sets.items()
+            if cc != country and version == ip_version and (status is None or st == status)
+        ), ip_version)
+    
+    def save(self, path: str) -> None:
+        """
+        保存为二进制快照
+        
+        Args:
+            path: 快照文件路径
+            
+        Raises:
+            ValueError: 国家代码超过 2 字节或状态超过 16 字节（ASCII）时抛出，不写入文件
+        """
+        entries = []
+        for (country, version, status), ip_set in sorted(self.sets.items()):
+            country_bytes = country.encode('ascii')
+            status_bytes = status.encode('ascii')
+            # struct 会静默截断过长的字段，加载时得到错误的键
+            if len(country_bytes) > 2 or len(status_bytes) > 16:
+                raise ValueError(f'Cannot save index entry ({country!r}, {status!r}): field too long')
+            entries.append((country_bytes, 4 if version == 'ipv4' else 6, status_bytes, ip_set))
+        
+        with open(path, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_FORMAT, len(entries)))
+            for country_bytes, version_number, status_bytes, ip_set in entries:
+                f.write(_SNAPSHOT_ENTRY.pack(country_bytes, version_number, status_bytes, len(ip_set)))
+                f.write(ip_set.to_bytes())
+        logger.info(f'Saved APNIC index with {len(self.sets)} entries to {path}')
+    
+    @classmethod
+    def load(cls, path: str) -> 'ApnicIndex':
+        """
+        从二进制快照加载索引
+        
+        Args:
+            path: 快照文件路径
+            
+        Returns:
+            索引
+            
+        Raises:
+            ValueError: 快照格式无效时抛出
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        magic, fmt, count = _SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != _SNAPSHOT_MAGIC or fmt != _SNAPSHOT_FORMAT:
+            raise ValueError(f'Invalid APNIC index snapshot: {path}')
+        
+        sets: Dict[IndexKey, IntervalSet] = {}
+        offset = _SNAPSHOT_HEADER.size
+        for _ in range(count):
+            country, version, status, length = _SNAPSHOT_ENTRY.unpack_from(data, offset)
+            offset += _SNAPSHOT_ENTRY.size
+            ip_version: IpVersion = 'ipv4' if version == 4 else 'ipv6'
+            size = length * 2 * _IP_BITS[ip_version] // 8
+            key = (country.rstrip(b'\0').decode('ascii'), ip_version, status.rstrip(b'\0').decode('ascii'))
+            sets[key] = IntervalSet.from_bytes(data[offset:offset + size], ip_version)
+            offset += size
+        
+        logger.info(f'Loaded APNIC index with {len(sets)} entries from {path}')
+        return cls(sets)
+
+
+_index: Optional[ApnicIndex] = None
 
 
-def _parse_apnic_line(line: str) -> tuple:
-    """解析 APNIC 数据行"""
-    parts = line.split('|')
-    if len(parts) < 7:
-        return None, None, None, None
-    return parts[1], parts[2], parts[3], parts[4]
+def get_apnic_index(refresh: bool = False) -> ApnicIndex:
+    """
+    获取 APNIC 索引，进程内只下载和解析一次
+    
+    Args:
+        refresh: 是否强制重新构建
+        
+    Returns:
+        APNIC 索引
+    """
+    global _index
+    if _index is None or refresh:
+        started = time.perf_counter()
+        with stage('parse.apnic'):
+            _index = ApnicIndex.from_records(_iter_allocated_records())
+        logger.info(f'Built APNIC index in {time.perf_counter() - started:.2f}s')
+    return _index
 
 
 def get_ip_range_by_country(
@@ -51,18 +328,7 @@ def get_ip_range_by_country(
     Returns:
         IP CIDR 列表
     """
-    ip_cidr = []
-    for line in _dump_allocated().split('\n'):
-        if not line.startswith('apnic'):
-            continue
-        
-        allocated_country, version, ip, length = _parse_apnic_line(line)
-        if version != ip_version or allocated_country != country:
-            continue
-        
-        if is_int(length):
-            prefix_len = int(32 - math.log2(int(length)))
-            ip_cidr.append(f"{ip}/{prefix_len}")
+    ip_cidr = get_apnic_index().get_set(country, ip_version).to_cidrs()
     
     logger.info(f'Got {len(ip_cidr)} {country} {ip_version} CIDR records')
     return ip_cidr
@@ -82,18 +348,7 @@ def get_non_ip_range_by_country(
     Returns:
         IP CIDR 列表
     """
-    ip_cidr = []
-    for line in _dump_allocated().split('\n'):
-        if not line.startswith('apnic'):
-            continue
-        
-        allocated_country, version, ip, length = _parse_apnic_line(line)
-        if version != ip_version or allocated_country == country:
-            continue
-        
-        if is_int(length):
-            prefix_len = int(32 - math.log2(int(length)))
-            ip_cidr.append(f"{ip}/{prefix_len}")
+    ip_cidr = get_apnic_index().get_non_set(country, ip_version).to_cidrs()
     
     logger.info(f'Got {len(ip_cidr)} non-{country} {ip_version} CIDR records')
     return ip_cidr
@@ -1,43 +1,101 @@
-import json
-from typing import Generator, Literal, Optional
+from typing import Dict, Generator, Iterator, List, Literal, Tuple, Union
 
-from utils.http import get_url_content
+from utils.profiling import stage
 from loguru import logger
 
+from .cloud import CatalogKey, CloudCatalog, Filter, get_catalog, load_json
+
 IpVersion = Literal['ipv4', 'ipv6']
 
 AWS_IP_RANGES_URL = 'https://ip-ranges.amazonaws.com/ip-ranges.json'
 
+# (列表键, 前缀键, IP 版本)
+_AWS_PREFIX_LISTS: Tuple[Tuple[str, str, IpVersion], ...] = (
+    ('prefixes', 'ip_prefix', 'ipv4'),
+    ('ipv6_prefixes', 'ipv6_prefix', 'ipv6'),
+)
+
+
+def _iter_aws_entries(document: dict) -> Iterator[Tuple[CatalogKey, str]]:
+    """ip-ranges.json 中的 (索引键, CIDR) 条目，没有区域的条目归入 GLOBAL"""
+    for list_key, prefix_key, ip_version in _AWS_PREFIX_LISTS:
+        for item in document.get(list_key, []):
+            prefix = item.get(prefix_key)
+            if prefix:
+                key = (
+                    ip_version, item.get('region') or 'GLOBAL',
+                    item.get('service') or '', item.get('network_border_group') or ''
+                )
+                yield key, prefix
+
+
+def parse_aws_catalog(content: Union[str, bytes]) -> CloudCatalog:
+    """
+    解析 AWS ip-ranges.json 并按区域、服务、网络边界组建立索引
+    
+    Args:
+        content: 文档内容
+        
+    Returns:
+        AWS IP 段目录
+    """
+    with stage('parse.aws'):
+        return CloudCatalog.from_entries('aws', _iter_aws_entries(load_json(content)))
+
+
+def get_aws_catalog(refresh: bool = False) -> CloudCatalog:
+    """
+    获取 AWS IP 段目录，进程内只下载一次，重新下载后文档内容未变化时复用已构建的目录
+    
+    Args:
+        refresh: 是否重新下载
+        
+    Returns:
+        AWS IP 段目录
+        
+    Raises:
+        requests.RequestException: 下载失败时抛出
+    """
+    return get_catalog(AWS_IP_RANGES_URL, parse_aws_catalog, refresh)
+
 
 def get_aws_cidr(
     ip_version: IpVersion = 'ipv4',
-    region: Optional[str] = None
+    region: Filter = None,
+    service: Filter = None,
+    border_group: Filter = None,
+    refresh: bool = False
 ) -> Generator[str, None, None]:
     """
     获取 AWS 的 IP CIDR 列表
     
     Args:
         ip_version: IP 版本，'ipv4' 或 'ipv6'
-        region: AWS 区域过滤，如 'us-east-1'
+        region: AWS 区域过滤，如 'us-east-1'，可为多个
+        service: 服务过滤，如 'EC2'、'CLOUDFRONT'，可为多个
+        border_group: 网络边界组过滤，如 'us-east-1-bos-1'，可为多个
+        refresh: 是否重新下载 ip-ranges.json
         
     Yields:
-        IP CIDR 字符串
+        规范化（排序、合并）后的 IP CIDR 字符串
     """
-    res = json.loads(get_url_content(AWS_IP_RANGES_URL))
+    yield from get_aws_catalog(refresh).get_cidrs(ip_version, region, service, border_group)
     
-    # IPv4 和 IPv6 使用不同的键
-    if ip_version == 'ipv4':
-        prefixes = res.get('prefixes', [])
-        prefix_key = 'ip_prefix'
-    else:
-        prefixes = res.get('ipv6_prefixes', [])
-        prefix_key = 'ipv6_prefix'
+    logger.info(f'Fetched AWS {ip_version} CIDR list (region={region}, service={service})')
+
+
+def get_aws_region_cidrs(ip_version: IpVersion = 'ipv4') -> Dict[str, List[str]]:
+    """
+    按区域分组获取 AWS 的 IP CIDR 列表
     
-    for item in prefixes:
-        if region is not None and item.get('region') != region:
-            continue
-        prefix = item.get(prefix_key)
-        if prefix:
-            yield prefix
+    Args:
+        ip_version: IP 版本，'ipv4' 或 'ipv6'
+        
+    Returns:
+        区域名称到规范化 CIDR 列表的映射
+    """
+    catalog = get_aws_catalog()
+    regions = {region: catalog.get_cidrs(ip_version, region) for region in catalog.values('region', ip_version)}
     
-    logger.info(f'Fetched AWS {ip_version} CIDR list (region={region})')
+    logger.info(f'Fetched AWS {ip_version} CIDR list for {len(regions)} regions')
+    return regions
@@ -1,38 +1,46 @@
-from typing import List
+from typing import List, Literal
 
-import requests
-
-from utils.ip import get_opposite_cidr, get_opposite_ipv6_cidr
+from utils.http import get_url_content
+from utils.ip import get_opposite_cidr, get_opposite_ipv6_cidr, normalize_cidr_text
+from utils.profiling import stage
 from loguru import logger
 
 CLANG_CN_IPV4_URL = 'http://ispip.clang.cn/all_cn_cidr.txt'
 CLANG_CN_IPV6_URL = 'https://ispip.clang.cn/all_cn_ipv6.txt'
 DEFAULT_TIMEOUT = 30
+MAX_REPORTED_ERRORS = 5  # 日志中列出的错误行数上限
+
+IpVersion = Literal['ipv4', 'ipv6']
 
 
-def _fetch_cidr_from_url(url: str) -> List[str]:
+def _fetch_cidr_from_url(url: str, ip_version: IpVersion) -> List[str]:
     """
-    从 URL 获取 CIDR 列表
+    从 URL 获取并校验 CIDR 列表
+    
+    无效行、版本不符或主机位不为零的行会被丢弃并记录行号。
     
     Args:
         url: 数据源 URL
+        ip_version: IP 版本
         
     Returns:
         CIDR 列表
         
     Raises:
-        ValueError: 请求失败时抛出
+        requests.RequestException: 请求失败时抛出
     """
-    res = requests.get(url, timeout=DEFAULT_TIMEOUT)
-    if res.status_code != 200:
-        raise ValueError(f'Failed to fetch CIDR from {url}, status: {res.status_code}')
+    text = get_url_content(url, timeout=DEFAULT_TIMEOUT)
+    with stage('parse.clang', ip_version=ip_version):
+        result = normalize_cidr_text(text, ip_version)
+    if result.errors:
+        logger.warning(f'Skipped {len(result.errors)} invalid lines from {url}')
+        for error in result.errors[:MAX_REPORTED_ERRORS]:
+            logger.warning(f'  line {error.line}: {error.text!r} ({error.reason})')
     
-    ip_cidr = []
-    for line in res.text.split():
-        line = line.strip()
-        if line and not line.startswith('#'):
-            ip_cidr.append(line)
-    return ip_cidr
+    non_public = sum(1 for entry in result.entries if not entry.public)
+    if non_public:
+        logger.warning(f'{non_public} non-public {ip_version} CIDRs in {url}')
+    return result.to_cidrs()
 
 
 def get_cn_cidr() -> List[str]:
@@ -42,7 +50,7 @@ def get_cn_cidr() -> List[str]:
     Returns:
         IPv4 CIDR 列表
     """
-    ip_cidr = _fetch_cidr_from_url(CLANG_CN_IPV4_URL)
+    ip_cidr = _fetch_cidr_from_url(CLANG_CN_IPV4_URL, 'ipv4')
     logger.info(f'Got {len(ip_cidr)} CN IPv4 CIDR records')
     return ip_cidr
 
@@ -65,7 +73,7 @@ def get_cn_ipv6_cidr() -> List[str]:
     Returns:
         IPv6 CIDR 列表
     """
-    ip_cidr = _fetch_cidr_from_url(CLANG_CN_IPV6_URL)
+    ip_cidr = _fetch_cidr_from_url(CLANG_CN_IPV6_URL, 'ipv6')
     logger.info(f'Got {len(ip_cidr)} CN IPv6 CIDR records')
     return ip_cidr
 
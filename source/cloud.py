@@ -0,0 +1,297 @@
+"""
+云服务商 IP 段目录
+
+AWS ip-ranges.json、Google goog.json / cloud.json 这类文档一次解析后按
+(IP 版本, 区域, 服务, 网络边界组) 建立索引，任意过滤组合都在内存中回答，
+结果为规范化（排序、合并）后的区间集合或 CIDR 列表，查询结果会被缓存。
+
+安装了 orjson 时用它解析 JSON，否则使用标准库 json。
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Literal, Optional, Tuple, Union
+
+from loguru import logger
+
+from utils.http import get_url_content
+from utils.interval import IntervalSet, parse_cidr
+
+IpVersion = Literal['ipv4', 'ipv6']
+
+# 索引字段，缺省的字段为空字符串
+CATALOG_FIELDS = ('region', 'service', 'border_group')
+
+CatalogKey = Tuple[IpVersion, str, str, str]  # (IP 版本, 区域, 服务, 网络边界组)
+
+# 过滤条件：None 表示不过滤，字符串或字符串集合表示取值之一
+Filter = Union[None, str, Iterable[str]]
+
+_QueryKey = Tuple[IpVersion, Optional[FrozenSet[str]], Optional[FrozenSet[str]], Optional[FrozenSet[str]]]
+
+_json_loads: Optional[Callable[[Union[str, bytes]], Any]] = None
+
+
+def load_json(content: Union[str, bytes]) -> Any:
+    """
+    解析 JSON 文档，安装了 orjson 时使用 orjson
+    
+    Args:
+        content: JSON 文本
+        
+    Returns:
+        解析结果
+        
+    Raises:
+        ValueError: JSON 格式无效时抛出（orjson.JSONDecodeError 同为其子类）
+    """
+    global _json_loads
+    if _json_loads is None:
+        try:
+            import orjson
+            _json_loads = orjson.loads
+        except ImportError:
+            _json_loads = json.loads
+    return _json_loads(content)
+
+
+def _normalize_filter(value: Filter) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return frozenset((value,))
+    return frozenset(value)
+
+
+def _query_key(ip_version: IpVersion, region: Filter, service: Filter, border_group: Filter) -> _QueryKey:
+    return (
+        ip_version, _normalize_filter(region), _normalize_filter(service), _normalize_filter(border_group)
+    )
+
+
+class CloudCatalog:
+    """
+    云服务商 IP 段索引
+    
+    每个 (IP 版本, 区域, 服务, 网络边界组) 组合保存一个区间集合，
+    查询时合并满足条件的组合，同一查询只计算一次。
+    """
+    
+    def __init__(self, provider: str, sets: Optional[Dict[CatalogKey, IntervalSet]] = None) -> None:
+        """
+        Args:
+            provider: 服务商名称，如 'aws'
+            sets: (IP 版本, 区域, 服务, 网络边界组) 到区间集合的映射
+        """
+        self.provider = provider
+        self.sets: Dict[CatalogKey, IntervalSet] = sets or {}
+        self._sets_cache: Dict[_QueryKey, IntervalSet] = {}
+        self._cidrs_cache: Dict[_QueryKey, List[str]] = {}
+    
+    @classmethod
+    def from_entries(cls, provider: str, entries: Iterable[Tuple[CatalogKey, str]]) -> 'CloudCatalog':
+        """
+        由 (索引键, CIDR) 条目构建目录
+        
+        Args:
+            provider: 服务商名称
+            entries: 索引键及对应的 CIDR，同一 CIDR 可以出现在多个键下
+            
+        Returns:
+            目录
+        """
+        ranges: Dict[CatalogKey, List[Tuple[int, int]]] = {}
+        for key, cidr in entries:
+            try:
+                interval = parse_cidr(cidr, key[0])
+            except ValueError:
+                logger.warning(f'Skipping invalid {provider} prefix: {cidr}')
+                continue
+            bucket = ranges.get(key)
+            if bucket is None:
+                bucket = ranges[key] = []
+            bucket.append(interval)
+        
+        return cls(provider, {key: IntervalSet.from_ranges(bucket, key[0]) for key, bucket in ranges.items()})
+    
+    def __len__(self) -> int:
+        """索引键数量"""
+        return len(self.sets)
+    
+    def __repr__(self) -> str:
+        return f'CloudCatalog({self.provider}, keys={len(self)})'
+    
+    def values(self, field: str, ip_version: Optional[IpVersion] = None) -> List[str]:
+        """
+        某个索引字段的全部取值
+        
+        Args:
+            field: 字段名，见 CATALOG_FIELDS
+            ip_version: 只统计指定 IP 版本
+            
+        Returns:
+            排序后的非空取值
+            
+        Raises:
+            ValueError: 字段名无效时抛出
+        """
+        position = self._field_position(field)
+        return sorted({
+            key[position] for key in self.sets
+            if key[position] and (ip_version is None or key[0] == ip_version)
+        })
+    
+    @staticmethod
+    def _field_position(field: str) -> int:
+        try:
+            return CATALOG_FIELDS.index(field) + 1
+        except ValueError:
+            raise ValueError(f'Unknown catalog field: {field}') from None
+    
+    def _select(self, query: _QueryKey) -> IntervalSet:
+        cached = self._sets_cache.get(query)
+        if cached is not None:
+            return cached
+        
+        ip_version = query[0]
+        filters = query[1:]
+        ip_set = IntervalSet.union_all((
+            ip_set for key, ip_set in self.sets.items()
+            if key[0] == ip_version and all(
+                wanted is None or value in wanted for value, wanted in zip(key[1:], filters)
+            )
+        ), ip_version)
+        self._sets_cache[query] = ip_set
+        return ip_set
+    
+    def get_set(
+        self,
+        ip_version: IpVersion = 'ipv4',
+        region: Filter = None,
+        service: Filter = None,
+        border_group: Filter = None
+    ) -> IntervalSet:
+        """
+        查询满足过滤条件的地址集合
+        
+        Args:
+            ip_version: IP 版本
+            region: 区域（Google 为 scope）
+            service: 服务，如 'EC2'、'CLOUDFRONT'
+            border_group: 网络边界组（AWS network_border_group）
+            
+        Returns:
+            区间集合
+        """
+        return self._select(_query_key(ip_version, region, service, border_group))
+    
+    def get_cidrs(
+        self,
+        ip_version: IpVersion = 'ipv4',
+        region: Filter = None,
+        service: Filter = None,
+        border_group: Filter = None
+    ) -> List[str]:
+        """
+        查询满足过滤条件的规范化 CIDR 列表，参数同 get_set
+        
+        Returns:
+            排序、合并后的 CIDR 列表
+        """
+        query = _query_key(ip_version, region, service, border_group)
+        cidrs = self._cidrs_cache.get(query)
+        if cidrs is None:
+            cidrs = self._cidrs_cache[query] = self._select(query).to_cidrs()
+        return list(cidrs)
+    
+    def group_by(
+        self,
+        field: str,
+        ip_version: IpVersion = 'ipv4',
+        region: Filter = None,
+        service: Filter = None,
+        border_group: Filter = None
+    ) -> Dict[str, IntervalSet]:
+        """
+        按某个索引字段分组查询
+        
+        Args:
+            field: 分组字段，见 CATALOG_FIELDS
+            ip_version: IP 版本
+            region: 区域过滤
+            service: 服务过滤
+            border_group: 网络边界组过滤
+            
+        Returns:
+            字段取值到区间集合的映射，不含空集
+            
+        Raises:
+            ValueError: 字段名无效时抛出
+        """
+        filters = {'region': region, 'service': service, 'border_group': border_group}
+        groups = {}
+        for value in self.values(field, ip_version):
+            filters[field] = value
+            ip_set = self.get_set(ip_version, **filters)
+            if ip_set:
+                groups[value] = ip_set
+        return groups
+
+
+_catalogs: Dict[str, Tuple[bytes, CloudCatalog]] = {}
+_catalogs_lock = threading.Lock()
+
+
+def cached_catalog(
+    url: str,
+    content: Union[str, bytes],
+    parse: Callable[[Union[str, bytes]], CloudCatalog]
+) -> CloudCatalog:
+    """
+    按文档内容缓存目录，内容未变化时直接返回已构建的目录
+    
+    Args:
+        url: 文档地址，作为缓存键
+        content: 文档内容
+        parse: 由文档内容构建目录的函数
+        
+    Returns:
+        目录
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    digest = hashlib.sha1(data).digest()
+    with _catalogs_lock:
+        cached = _catalogs.get(url)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        catalog = parse(content)
+        _catalogs[url] = (digest, catalog)
+    logger.debug(f'Built {catalog!r} from {url}')
+    return catalog
+
+
+def get_catalog(
+    url: str,
+    parse: Callable[[Union[str, bytes]], CloudCatalog],
+    refresh: bool = False
+) -> CloudCatalog:
+    """
+    获取文档对应的目录，进程内只下载一次
+    
+    Args:
+        url: 文档地址
+        parse: 由文档内容构建目录的函数
+        refresh: 是否重新下载，文档内容未变化时仍复用已构建的目录
+        
+    Returns:
+        目录
+        
+    Raises:
+        requests.RequestException: 下载失败时抛出
+    """
+    if not refresh:
+        with _catalogs_lock:
+            cached = _catalogs.get(url)
+        if cached is not None:
+            return cached[1]
+    return cached_catalog(url, get_url_content(url), parse)
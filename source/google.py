@@ -1,58 +1,94 @@
-import json
-from typing import Generator, Literal, Optional
+from typing import Generator, Iterator, Literal, Tuple, Union
 
-from utils.http import get_url_content
+from utils.profiling import stage
 from loguru import logger
 
+from .cloud import CatalogKey, CloudCatalog, Filter, get_catalog, load_json
+
 IpVersion = Literal['ipv4', 'ipv6']
 
 GOOGLE_SERVICE_URL = 'https://www.gstatic.com/ipranges/goog.json'
 GOOGLE_CLOUD_URL = 'https://www.gstatic.com/ipranges/cloud.json'
 
 
-def get_google_service_cidr(ip_version: IpVersion = 'ipv4') -> Generator[str, None, None]:
+def _iter_google_entries(document: dict) -> Iterator[Tuple[CatalogKey, str]]:
+    """goog.json / cloud.json 中的 (索引键, CIDR) 条目，scope 作为区域"""
+    for item in document.get('prefixes', []):
+        scope = item.get('scope') or ''
+        service = item.get('service') or ''
+        for ip_version in ('ipv4', 'ipv6'):
+            prefix = item.get(f'{ip_version}Prefix')
+            if prefix:
+                yield (ip_version, scope, service, ''), prefix
+
+
+def parse_google_catalog(content: Union[str, bytes]) -> CloudCatalog:
+    """
+    解析 Google goog.json 或 cloud.json 并按 scope、服务建立索引
+    
+    Args:
+        content: 文档内容
+        
+    Returns:
+        Google IP 段目录
+    """
+    with stage('parse.google'):
+        return CloudCatalog.from_entries('google', _iter_google_entries(load_json(content)))
+
+
+def get_google_catalog(cloud: bool = False, refresh: bool = False) -> CloudCatalog:
+    """
+    获取 Google IP 段目录，进程内只下载一次，重新下载后文档内容未变化时复用已构建的目录
+    
+    Args:
+        cloud: True 为 Google Cloud (cloud.json)，False 为 Google 服务 (goog.json)
+        refresh: 是否重新下载
+        
+    Returns:
+        Google IP 段目录
+        
+    Raises:
+        requests.RequestException: 下载失败时抛出
+    """
+    url = GOOGLE_CLOUD_URL if cloud else GOOGLE_SERVICE_URL
+    return get_catalog(url, parse_google_catalog, refresh)
+
+
+def get_google_service_cidr(
+    ip_version: IpVersion = 'ipv4',
+    refresh: bool = False
+) -> Generator[str, None, None]:
     """
     获取 Google 服务的 IP CIDR 列表
     
     Args:
         ip_version: IP 版本，'ipv4' 或 'ipv6'
+        refresh: 是否重新下载 goog.json
         
     Yields:
-        IP CIDR 字符串
+        规范化（排序、合并）后的 IP CIDR 字符串
     """
-    res = json.loads(get_url_content(GOOGLE_SERVICE_URL))
-    prefix_key = f'{ip_version}Prefix'
-    
-    for item in res['prefixes']:
-        prefix = item.get(prefix_key)
-        if prefix:
-            yield prefix
+    yield from get_google_catalog(refresh=refresh).get_cidrs(ip_version)
     
     logger.info(f'Fetched Google service {ip_version} CIDR list')
 
 
 def get_google_cloud_cidr(
     ip_version: IpVersion = 'ipv4',
-    scope: Optional[str] = None
+    scope: Filter = None,
+    service: Filter = None
 ) -> Generator[str, None, None]:
     """
     获取 Google Cloud 的 IP CIDR 列表
     
     Args:
         ip_version: IP 版本，'ipv4' 或 'ipv6'
-        scope: 范围过滤，如 'asia-east1'
+        scope: 范围过滤，如 'asia-east1'，可为多个
+        service: 服务过滤，如 'Google Cloud'，可为多个
         
     Yields:
-        IP CIDR 字符串
+        规范化（排序、合并）后的 IP CIDR 字符串
     """
-    res = json.loads(get_url_content(GOOGLE_CLOUD_URL))
-    prefix_key = f'{ip_version}Prefix'
-    
-    for item in res['prefixes']:
-        if scope is not None and item.get('scope') != scope:
-            continue
-        prefix = item.get(prefix_key)
-        if prefix:
-            yield prefix
+    yield from get_google_catalog(cloud=True).get_cidrs(ip_version, scope, service)
     
     logger.info(f'Fetched Google Cloud {ip_version} CIDR list (scope={scope})')
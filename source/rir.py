@@ -0,0 +1,181 @@
+"""
+五大 RIR delegated 数据
+
+流式读取 AFRINIC、APNIC、ARIN、LACNIC、RIPE NCC 的 delegated-extended 文件，
+按与 APNIC 相同的记录格式解析（见 source.apnic.iter_delegated_records），
+再以 (IP 版本, 起始地址) 为键多路归并为一条全局有序的记录流。
+
+各 RIR 发布的文件均按 ASN、IPv4、IPv6 分段且段内按地址递增，归并后同一国家
+相邻的区间（包括来自不同 RIR 的区间）在构建索引时即可就地合并，内存占用取决于
+合并后的区间数而不是记录数；文件始终逐行读取，不会整体载入内存。
+"""
+import time
+from heapq import merge
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Literal, Mapping, Optional
+
+from loguru import logger
+
+from config import RIR_DELEGATED_URLS
+from utils.concurrency import FetchTask, fetch_concurrently
+from utils.http import iter_url_lines
+from utils.profiling import stage
+
+from .apnic import ApnicIndex, ApnicRecord, iter_delegated_records
+
+IpVersion = Literal['ipv4', 'ipv6']
+
+DEFAULT_TIMEOUT = 120
+
+# extended 文件还包含 available、reserved 记录（国家代码为空或 ZZ），默认只保留已分配的地址
+DEFAULT_STATUSES = ('allocated', 'assigned')
+
+# 归并键：(IP 版本, 起始地址)，'ipv4' < 'ipv6' 与文件中的分段顺序一致
+_merge_key = itemgetter(2, 3)
+
+
+def _iter_location_lines(location: str, timeout: int) -> Iterator[str]:
+    """逐行读取 URL 或本地文件"""
+    if '://' in location:
+        yield from iter_url_lines(location, timeout=timeout)
+        return
+    with open(location, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def _open_lines(location: str, timeout: int) -> Iterator[str]:
+    """
+    打开数据源并读取第一行，使下载（或条件请求）在获取线程中完成，其余行由调用方逐行读取
+    """
+    lines = _iter_location_lines(location, timeout)
+    first = next(lines, None)
+    return lines if first is None else chain((first,), lines)
+
+
+def _iter_counted(
+    records: Iterable[ApnicRecord],
+    counts: Dict[str, int],
+    name: str
+) -> Iterator[ApnicRecord]:
+    """统计每个数据源的记录数"""
+    count = 0
+    for record in records:
+        count += 1
+        yield record
+    counts[name] = count
+
+
+def iter_rir_records(
+    sources: Optional[Mapping[str, str]] = None,
+    ip_version: Optional[IpVersion] = None,
+    statuses: Optional[Iterable[str]] = DEFAULT_STATUSES,
+    timeout: int = DEFAULT_TIMEOUT,
+    counts: Optional[Dict[str, int]] = None
+) -> Iterator[ApnicRecord]:
+    """
+    多路归并各 RIR 的分配记录
+    
+    各数据源并发打开（下载到缓存或建立连接），之后逐行读取并按
+    (IP 版本, 起始地址) 归并，任意时刻每个数据源只缓冲一行。
+    
+    Args:
+        sources: RIR 名称到 URL 或本地文件路径的映射，默认为 RIR_DELEGATED_URLS
+        ip_version: 只返回指定 IP 版本的记录
+        statuses: 只返回这些分配状态的记录，None 表示全部
+        timeout: 单个数据源的超时时间（秒）
+        counts: 传入字典时，读取结束后写入每个数据源的记录数
+        
+    Yields:
+        按 (IP 版本, 起始地址) 递增的分配记录
+        
+    Raises:
+        requests.RequestException: 下载失败时抛出
+        OSError: 本地文件无法读取时抛出
+    """
+    sources = dict(RIR_DELEGATED_URLS if sources is None else sources)
+    with stage('download.rir', sources=len(sources)):
+        streams = fetch_concurrently(
+            FetchTask(name, _open_lines, (location, timeout), timeout=timeout)
+            for name, location in sources.items()
+        )
+    
+    wanted = None if statuses is None else frozenset(statuses)
+    counts = {} if counts is None else counts
+    parsed = []
+    for name in sources:
+        records = iter_delegated_records(streams[name], ip_version)
+        if wanted is not None:
+            records = (record for record in records if record.status in wanted)
+        parsed.append(_iter_counted(records, counts, name))
+    return merge(*parsed, key=_merge_key)
+
+
+def build_rir_index(
+    sources: Optional[Mapping[str, str]] = None,
+    statuses: Optional[Iterable[str]] = DEFAULT_STATUSES,
+    timeout: int = DEFAULT_TIMEOUT
+) -> ApnicIndex:
+    """
+    一次扫描构建全球 (国家, IP 版本, 状态) 索引
+    
+    Args:
+        sources: RIR 名称到 URL 或本地文件路径的映射，默认为 RIR_DELEGATED_URLS
+        statuses: 收录的分配状态，None 表示全部
+        timeout: 单个数据源的超时时间（秒）
+        
+    Returns:
+        索引，接口与 APNIC 索引相同
+    """
+    started = time.perf_counter()
+    counts: Dict[str, int] = {}
+    records = iter_rir_records(sources, statuses=statuses, timeout=timeout, counts=counts)
+    with stage('parse.rir'):
+        index = ApnicIndex.from_records(records)
+    
+    summary = ', '.join(f'{name} {count}' for name, count in counts.items())
+    logger.info(
+        f'Built RIR index from {sum(counts.values())} records ({summary}) '
+        f'into {len(index.sets)} sets in {time.perf_counter() - started:.2f}s'
+    )
+    return index
+
+
+_index: Optional[ApnicIndex] = None
+
+
+def get_rir_index(refresh: bool = False) -> ApnicIndex:
+    """
+    获取五大 RIR 的全球索引，进程内只下载和解析一次
+    
+    Args:
+        refresh: 是否强制重新构建
+        
+    Returns:
+        全球索引
+    """
+    global _index
+    if _index is None or refresh:
+        _index = build_rir_index()
+    return _index
+
+
+def get_rir_range_by_country(
+    country: str = 'CN',
+    ip_version: IpVersion = 'ipv4'
+) -> List[str]:
+    """
+    根据五大 RIR 的数据获取指定国家的 IP CIDR 列表
+    
+    Args:
+        country: 国家代码，如 'CN', 'US'
+        ip_version: IP 版本
+        
+    Returns:
+        IP CIDR 列表
+    """
+    ip_cidr = get_rir_index().get_set(country, ip_version).to_cidrs()
+    
+    logger.info(f'Got {len(ip_cidr)} {country} {ip_version} CIDR records from all RIRs')
+    return ip_cidr
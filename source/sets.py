@@ -0,0 +1,226 @@
+"""
+命名地址集合
+
+将各数据源构建为可复用的 IntervalSet，供查找、常驻服务等功能按名称选用；
+也可将各数据源编译为数据集快照（见 utils.snapshot），之后直接映射使用。
+"""
+import os
+from typing import TYPE_CHECKING, Dict, Iterable, List, Literal, Optional, Tuple
+
+# 数据源及其依赖在构建集合时才导入，命令行解析只需要 SET_NAMES
+if TYPE_CHECKING:
+    from utils.concurrency import FetchTask
+    from utils.interval import IntervalSet
+
+IpVersion = Literal['ipv4', 'ipv6']
+
+IP_VERSIONS: Tuple[IpVersion, ...] = ('ipv4', 'ipv6')
+
+# cn: 中国 IP；non-cn: 非中国 IP；google: Google 服务 IP；aws: AWS IP；
+# proxy: direct 模式的代理集合（中国 IP、Google 服务 IP 及自定义直连 IP 以外的地址）
+SET_NAMES = ('cn', 'non-cn', 'google', 'aws', 'proxy')
+
+# 各集合依赖的数据源
+_SET_SOURCES = {
+    'cn': ('cn',),
+    'non-cn': ('cn',),
+    'google': ('google',),
+    'aws': ('aws',),
+    'proxy': ('cn', 'google'),
+}
+
+# compile 命令支持的数据源，各自生成的数据集：
+# clang: cn；apnic: apnic-<国家代码>；rir: rir-<国家代码>（五大 RIR 合并）；
+# google: google；aws: aws 及 aws-<区域>
+COMPILE_SOURCES = ('clang', 'apnic', 'rir', 'google', 'aws')
+
+DatasetKey = Tuple[str, IpVersion]
+
+
+def _source_task(
+    source: str,
+    ip_version: IpVersion,
+    timeout: Optional[float],
+    refresh: bool = False
+) -> 'FetchTask':
+    """数据源对应的获取任务，refresh 时重新下载云服务商文档"""
+    from functools import partial
+    
+    from utils.concurrency import FetchTask
+    
+    from .aws import get_aws_cidr
+    from .clang import get_cn_cidr, get_cn_ipv6_cidr
+    from .google import get_google_service_cidr
+    
+    if source == 'cn':
+        func = get_cn_ipv6_cidr if ip_version == 'ipv6' else get_cn_cidr
+        return FetchTask(source, func, timeout=timeout)
+    if source == 'google':
+        return FetchTask(
+            source, get_google_service_cidr, (ip_version, refresh), timeout=timeout, materialize=True
+        )
+    return FetchTask(
+        source, partial(get_aws_cidr, refresh=refresh), (ip_version,), timeout=timeout, materialize=True
+    )
+
+
+def _compile_source(source: str) -> Dict[DatasetKey, 'IntervalSet']:
+    """获取单个数据源的 IPv4 和 IPv6 数据集"""
+    from utils.interval import IntervalSet
+    
+    from .apnic import get_apnic_index
+    from .aws import get_aws_catalog
+    from .clang import get_cn_cidr, get_cn_ipv6_cidr
+    from .google import get_google_catalog
+    from .rir import get_rir_index
+    
+    datasets: Dict[DatasetKey, IntervalSet] = {}
+    if source == 'clang':
+        datasets['cn', 'ipv4'] = IntervalSet.from_cidrs(get_cn_cidr(), 'ipv4')
+        datasets['cn', 'ipv6'] = IntervalSet.from_cidrs(get_cn_ipv6_cidr(), 'ipv6')
+    elif source == 'apnic':
+        index = get_apnic_index()
+        for ip_version in IP_VERSIONS:
+            for country in index.countries(ip_version):
+                datasets[f'apnic-{country}', ip_version] = index.get_set(country, ip_version)
+    elif source == 'rir':
+        index = get_rir_index()
+        for ip_version in IP_VERSIONS:
+            for country in index.countries(ip_version):
+                datasets[f'rir-{country}', ip_version] = index.get_set(country, ip_version)
+    elif source == 'google':
+        catalog = get_google_catalog()
+        for ip_version in IP_VERSIONS:
+            datasets['google', ip_version] = catalog.get_set(ip_version)
+    else:
+        # 一次下载和解析，各区域的集合直接从目录索引中取得
+        catalog = get_aws_catalog()
+        for ip_version in IP_VERSIONS:
+            datasets['aws', ip_version] = catalog.get_set(ip_version)
+            for region, ip_set in catalog.group_by('region', ip_version).items():
+                datasets[f'aws-{region}', ip_version] = ip_set
+    return datasets
+
+
+def build_datasets(
+    sources: Iterable[str] = COMPILE_SOURCES,
+    timeout: Optional[float] = None
+) -> Dict[DatasetKey, 'IntervalSet']:
+    """
+    并发获取数据源并构建 compile 命令使用的数据集
+    
+    Args:
+        sources: 数据源，见 COMPILE_SOURCES
+        timeout: 单个数据源的超时时间（秒）
+        
+    Returns:
+        (数据集名称, IP 版本) 到区间集合的映射
+        
+    Raises:
+        ValueError: 数据源名称无效时抛出
+    """
+    from utils.concurrency import FetchTask, fetch_concurrently
+    
+    sources = list(dict.fromkeys(sources))
+    unknown = [source for source in sources if source not in COMPILE_SOURCES]
+    if unknown:
+        raise ValueError(f'Unknown source(s): {", ".join(unknown)}')
+    
+    results = fetch_concurrently(
+        FetchTask(source, _compile_source, (source,), timeout=timeout) for source in sources
+    )
+    datasets: Dict[DatasetKey, IntervalSet] = {}
+    for source in sources:
+        datasets.update(results[source])
+    return datasets
+
+
+def get_opposite_set(ip_set: 'IntervalSet') -> 'IntervalSet':
+    """
+    获取集合在公网地址空间中的补集
+    
+    IPv4 排除保留地址段，IPv6 限定在全球单播地址段内。
+    
+    Args:
+        ip_set: 区间集合
+        
+    Returns:
+        补集
+    """
+    from utils.interval import IntervalSet
+    from utils.ip import GLOBAL_UNICAST_IPV6_SET, RESERVED_IPV4_SET
+    
+    if ip_set.version == 'ipv4':
+        return IntervalSet.full('ipv4') - ip_set - RESERVED_IPV4_SET
+    return GLOBAL_UNICAST_IPV6_SET - ip_set
+
+
+def build_sets(
+    names: Iterable[str],
+    ip_version: IpVersion = 'ipv4',
+    direct_extra: Optional[List[str]] = None,
+    timeout: Optional[float] = None,
+    snapshot_dir: Optional[str] = None,
+    refresh: bool = False
+) -> Dict[str, 'IntervalSet']:
+    """
+    按名称构建地址集合，所需数据源并发获取且只获取一次
+    
+    Args:
+        names: 集合名称，见 SET_NAMES
+        ip_version: IP 版本
+        direct_extra: proxy 集合额外排除的直连 IP
+        timeout: 单个数据源的超时时间（秒）
+        snapshot_dir: 快照目录，其中已编译的数据源直接映射，不再下载
+        refresh: 是否重新下载进程内已获取过的云服务商文档
+        
+    Returns:
+        集合名称到区间集合的映射
+        
+    Raises:
+        ValueError: 集合名称无效时抛出
+    """
+    from loguru import logger
+    
+    from utils.concurrency import fetch_concurrently
+    from utils.interval import IntervalSet
+    from utils.snapshot import load_snapshots, snapshot_path
+    
+    names = list(names)
+    unknown = [name for name in names if name not in _SET_SOURCES]
+    if unknown:
+        raise ValueError(f'Unknown set name(s): {", ".join(unknown)}')
+    
+    sources = sorted({source for name in names for source in _SET_SOURCES[name]})
+    source_sets: Dict[str, IntervalSet] = {}
+    if snapshot_dir:
+        # 集合依赖的数据源名称与对应数据集名称相同
+        compiled = [
+            source for source in sources
+            if os.path.exists(snapshot_path(snapshot_dir, source, ip_version))
+        ]
+        snapshots = load_snapshots(snapshot_dir, [(source, ip_version) for source in compiled])
+        source_sets.update((name, ip_set) for (name, _), ip_set in snapshots.items())
+        missing = [source for source in sources if source not in source_sets]
+        if missing:
+            logger.info(f'No {ip_version} snapshot for {", ".join(missing)} in {snapshot_dir}, fetching')
+        sources = missing
+    
+    results = fetch_concurrently(_source_task(source, ip_version, timeout, refresh) for source in sources)
+    source_sets.update(
+        (source, IntervalSet.from_cidrs(cidr, ip_version)) for source, cidr in results.items()
+    )
+    
+    sets: Dict[str, 'IntervalSet'] = {}
+    for name in names:
+        if name == 'non-cn':
+            sets[name] = get_opposite_set(source_sets['cn'])
+        elif name == 'proxy':
+            direct = source_sets['cn'] | source_sets['google']
+            if direct_extra:
+                direct = direct | IntervalSet.from_cidrs(direct_extra, ip_version)
+            sets[name] = get_opposite_set(direct)
+        else:
+            sets[name] = source_sets[name]
+        logger.info(f'Built {ip_version} set {name} with {len(sets[name])} ranges')
+    return sets
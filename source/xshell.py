@@ -1,57 +1,187 @@
-from typing import List
+"""
+服务器配置读取
 
-from utils.data import check_charset, file_walker
-from utils.ip import cidr_format, is_public_ipv4, is_ipv4
+从 Xshell (.xsh)、SecureCRT (.ini) 会话文件和 OpenSSH 配置文件中读取服务器公网 IPv4 地址。
+目录内文件在线程池中并发读取，每个文件的结果按 (mtime, size) 缓存，未变化的文件不会重新读取。
+"""
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.data import detect_encoding, file_walker
+from utils.ip import normalize_cidr_text
+from utils.output import write_lines
 from loguru import logger
 
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'xshell.json')
+MAX_FILE_SIZE = 1024 * 1024  # 超过此大小的文件不是会话配置，直接跳过
+DEFAULT_WORKERS = 32          # 读取线程数，网络共享目录的延迟远大于解析耗时
 
-def read_xshell_config_ip(path: str) -> List[str]:
+_CACHE_FORMAT = 1
+
+# 主机地址所在的行：
+#   Xshell:    Host=1.2.3.4
+#   SecureCRT: S:"Hostname"=1.2.3.4
+#   OpenSSH:   HostName 1.2.3.4 / Host 1.2.3.4 web-1
+_HOST_PATTERN = re.compile(
+    r'^[ \t]*(?:S:"Hostname"|HostName|Host)[ \t]*[ \t=][ \t]*(.+?)[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# 缓存条目：(mtime_ns, size, CIDR 列表)
+CacheEntry = Tuple[int, int, List[str]]
+
+
+def parse_server_config(text: str) -> List[str]:
     """
-    从 Xshell 配置文件中读取 IP 地址
+    从会话配置文本中提取公网 IPv4 地址
     
     Args:
-        path: Xshell 配置文件路径
+        text: Xshell、SecureCRT 或 OpenSSH 配置文本
         
     Returns:
         CIDR 格式的 IP 列表
     """
-    cidr_list = []
-    encoding = check_charset(path)
+    hosts = []
+    for value in _HOST_PATTERN.findall(text):
+        # OpenSSH 的 Host 行可以有多个模式
+        hosts.extend(value.strip('"').split())
+    # 主机名、通配符等非 IP 值在规范化时作为错误行丢弃
+    result = normalize_cidr_text(hosts, 'ipv4')
+    return result.to_cidrs(public_only=True)
+
+
+def read_xshell_config_ip(path: str) -> List[str]:
+    """
+    从 Xshell 配置文件中读取 IP 地址
     
-    with open(path, 'r', encoding=encoding) as f:
-        for line in f:
-            if not line.startswith('Host='):
-                continue
-            
-            ip = line.replace('Host=', '').strip()
-            if is_ipv4(ip) and is_public_ipv4(ip):
-                cidr = cidr_format(ip)
-                if cidr:
-                    cidr_list.append(cidr)
+    同样适用于 SecureCRT 会话文件和 OpenSSH 配置文件。
     
+    Args:
+        path: 配置文件路径
+        
+    Returns:
+        CIDR 格式的 IP 列表
+    """
+    cidr_list = _parse_file_data(_read_file(path))
     logger.debug(f'Got {len(cidr_list)} IPs from {path}')
     return cidr_list
 
 
-def read_xshell_dir_ips(dir_path: str) -> List[str]:
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _parse_file_data(data: bytes) -> List[str]:
+    return parse_server_config(data.decode(detect_encoding(data), errors='replace'))
+
+
+def _load_cache(path: str) -> Dict[str, CacheEntry]:
+    """加载文件结果缓存，不存在或格式不符时返回空缓存"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('format') != _CACHE_FORMAT:
+        return {}
+    return {name: tuple(entry) for name, entry in data.get('files', {}).items()}
+
+
+def _save_cache(path: str, cache: Dict[str, CacheEntry]) -> None:
+    """保存文件结果缓存，失败只记录警告"""
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write_lines([json.dumps({'format': _CACHE_FORMAT, 'files': cache})], path)
+    except OSError as e:
+        logger.warning(f'Failed to save server config cache {path}: {e}')
+
+
+def _list_files(paths: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """列出配置文件及其 (mtime_ns, size)，跳过过大的文件"""
+    files = []
+    seen = set()
+    for path in paths:
+        for file in file_walker(os.path.expanduser(path)):
+            file = os.path.abspath(file)
+            if file in seen:
+                continue
+            seen.add(file)
+            try:
+                stat = os.stat(file)
+            except OSError as e:
+                logger.warning(f'Failed to stat {file}: {e}')
+                continue
+            if stat.st_size > MAX_FILE_SIZE:
+                logger.debug(f'Skipping large file {file}')
+                continue
+            files.append((file, stat.st_mtime_ns, stat.st_size))
+    return files
+
+
+def read_server_ips(
+    paths: Union[str, Iterable[str]],
+    cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+    max_workers: int = DEFAULT_WORKERS
+) -> List[str]:
     """
-    从目录中读取所有 Xshell 配置文件的 IP 地址
+    从多个目录或文件中读取服务器 IP
     
     Args:
-        dir_path: Xshell 配置文件目录
+        paths: 配置目录或文件路径，如 Xshell 会话目录、~/.ssh/config
+        cache_path: 文件结果缓存路径，None 表示不使用缓存
+        max_workers: 读取文件的最大线程数
         
     Returns:
         去重后的 CIDR 列表
     """
-    file_list = file_walker(dir_path)
-    cidr_set = set()
+    if isinstance(paths, str):
+        paths = [paths]
+    files = _list_files(paths)
+    cache = _load_cache(cache_path) if cache_path else {}
+    
+    results: Dict[str, CacheEntry] = {}
+    pending = []
+    for file, mtime, size in files:
+        entry = cache.get(file)
+        if entry is not None and entry[0] == mtime and entry[1] == size:
+            results[file] = entry
+        else:
+            pending.append((file, mtime, size))
+    
+    if pending:
+        # 线程池只负责读取文件（网络共享目录上主要耗时在 I/O 等待），解析在当前线程进行
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_read_file, file) for file, _, _ in pending]
+            for (file, mtime, size), future in zip(pending, futures):
+                try:
+                    results[file] = (mtime, size, _parse_file_data(future.result()))
+                except Exception as e:
+                    logger.warning(f'Failed to read {file}: {e}')
+    logger.info(f'Read {len(pending)} of {len(files)} server config files, others cached')
     
-    for file in file_list:
-        try:
-            cidr_set.update(read_xshell_config_ip(file))
-        except Exception as e:
-            logger.warning(f'Failed to read {file}: {e}')
+    if cache_path and (pending or len(results) != len(cache)):
+        _save_cache(cache_path, results)
     
-    result = list(cidr_set)
-    logger.info(f'Got {len(result)} unique IPs from {dir_path}')
+    cidr_set = set()
+    for _, _, cidr_list in results.values():
+        cidr_set.update(cidr_list)
+    result = sorted(cidr_set)
+    logger.info(f'Got {len(result)} unique IPs from {len(files)} server config files')
     return result
+
+
+def read_xshell_dir_ips(dir_path: str) -> List[str]:
+    """
+    从目录中读取所有 Xshell 配置文件的 IP 地址
+    
+    Args:
+        dir_path: Xshell 配置目录
+        
+    Returns:
+        去重后的 CIDR 列表
+    """
+    return read_server_ips([dir_path])
@@ -0,0 +1,99 @@
+"""
+有损前缀聚合测试
+
+随机生成的 CIDR 列表聚合后逐一检查：结果仍覆盖全部输入网段、满足条目预算和
+误包含预算、不覆盖排除网段，且本身就是最小 CIDR 列表。
+"""
+import ipaddress
+import random
+
+import pytest
+
+from utils.aggregate import aggregate_cidr, parse_overclaim
+from utils.interval import IntervalSet
+
+SEEDS = range(20)
+
+
+def _random_cidrs(rng: random.Random, count: int):
+    """在 10.0.0.0/8 内随机生成 count 个 /16 ~ /28 网段"""
+    universe = ipaddress.IPv4Network('10.0.0.0/8')
+    cidrs = []
+    for _ in range(count):
+        address = universe.network_address + rng.randrange(universe.num_addresses)
+        cidrs.append(str(ipaddress.IPv4Network(f'{address}/{rng.randint(16, 28)}', strict=False)))
+    return cidrs
+
+
+def test_without_limits_is_lossless():
+    cidrs = ['10.0.1.0/24', '10.0.0.0/24', '10.0.0.128/25', '10.0.4.0/24']
+    
+    assert aggregate_cidr(cidrs) == ['10.0.0.0/23', '10.0.4.0/24']
+
+
+def test_max_entries_merges_into_supernet():
+    assert aggregate_cidr(['10.0.0.0/24', '10.0.2.0/24'], max_entries=1) == ['10.0.0.0/22']
+    # 超网会覆盖排除网段时不合并
+    assert aggregate_cidr(
+        ['10.0.0.0/24', '10.0.2.0/24'], max_entries=1, exclude=['10.0.1.128/25']
+    ) == ['10.0.0.0/24', '10.0.2.0/24']
+
+
+def test_overclaim_budget():
+    cidrs = ['10.0.0.0/24', '10.0.2.0/24', '10.0.3.0/24']
+    
+    assert aggregate_cidr(cidrs, max_entries=1, max_overclaim='/24') == ['10.0.0.0/22']
+    assert aggregate_cidr(cidrs, max_entries=1, max_overclaim=255) == ['10.0.0.0/24', '10.0.2.0/23']
+    # 只给误包含预算时尽量合并
+    assert aggregate_cidr(cidrs, max_overclaim=256) == ['10.0.0.0/22']
+
+
+def test_ipv6():
+    cidrs = ['2001:db8::/48', '2001:db8:2::/48']
+    
+    assert aggregate_cidr(cidrs, max_entries=1, ip_version='ipv6') == ['2001:db8::/46']
+    assert aggregate_cidr(cidrs, max_entries=1, max_overclaim='/49', ip_version='ipv6') == cidrs
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_random_aggregation_invariants(seed):
+    rng = random.Random(seed)
+    cidrs = _random_cidrs(rng, rng.randint(2, 60))
+    exclude = _random_cidrs(rng, rng.randint(0, 5))
+    max_entries = rng.randint(1, 20)
+    max_overclaim = rng.choice([None, 0, 1 << rng.randint(8, 20)])
+    
+    input_set = IntervalSet.from_cidrs(cidrs, 'ipv4')
+    exclude_set = IntervalSet.from_cidrs(exclude, 'ipv4') - input_set
+    result = aggregate_cidr(cidrs, max_entries, max_overclaim, exclude_set.to_cidrs())
+    result_set = IntervalSet.from_cidrs(result, 'ipv4')
+    
+    networks = [ipaddress.IPv4Network(cidr) for cidr in result]
+    for cidr in cidrs:
+        network = ipaddress.IPv4Network(cidr)
+        assert any(network.subnet_of(supernet) for supernet in networks), cidr
+    assert result == [str(network) for network in ipaddress.collapse_addresses(networks)]
+    assert not result_set & exclude_set
+    assert len(result) <= len(input_set.to_cidrs())
+    if max_overclaim is not None:
+        assert result_set.size - input_set.size <= max_overclaim
+    if max_overclaim is None and not exclude_set:
+        assert len(result) <= max_entries
+
+
+@pytest.mark.parametrize('value, ip_version, expected', [
+    ('/24', 'ipv4', 256),
+    ('/32', 'ipv4', 1),
+    ('/0', 'ipv4', 1 << 32),
+    ('/120', 'ipv6', 256),
+    ('1000', 'ipv4', 1000),
+    (0, 'ipv4', 0),
+])
+def test_parse_overclaim(value, ip_version, expected):
+    assert parse_overclaim(value, ip_version) == expected
+
+
+@pytest.mark.parametrize('value', ['/33', '-1', 'abc', '/'])
+def test_parse_overclaim_invalid(value):
+    with pytest.raises(ValueError):
+        parse_overclaim(value, 'ipv4')
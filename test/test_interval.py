@@ -0,0 +1,158 @@
+"""
+区间集合引擎测试
+
+随机生成的网段经 IntervalSet 运算后的结果与 ipaddress 模块的 collapse_addresses、
+address_exclude 等逐一比较，补集与 get_opposite_cidr 的结果也按同样方式校验。
+"""
+import ipaddress
+import random
+from typing import Iterable, List, Set
+
+import pytest
+
+from utils.interval import IntervalSet
+from utils.ip import (
+    GLOBAL_UNICAST_IPV6,
+    RESERVED_IPV4_CIDRS,
+    get_opposite_cidr,
+    get_opposite_ipv6_cidr,
+)
+
+# IPv4 随机网段限制在一个 /20 内，便于用地址集合逐个比较
+UNIVERSE_V4 = ipaddress.IPv4Network('10.0.0.0/20')
+UNIVERSE_V6 = ipaddress.IPv6Network('2001:db8::/32')
+
+SEEDS = range(20)
+
+
+def _random_networks(rng: random.Random, universe, count: int, min_prefix: int, max_prefix: int):
+    """在 universe 内随机生成 count 个网段（主机位已清零）"""
+    networks = []
+    for _ in range(count):
+        prefix_len = rng.randint(min_prefix, max_prefix)
+        address = universe.network_address + rng.randrange(universe.num_addresses)
+        networks.append(ipaddress.ip_network(f'{address}/{prefix_len}', strict=False))
+    return networks
+
+
+def _addresses(networks: Iterable) -> Set[int]:
+    """网段列表覆盖的全部地址"""
+    return {int(address) for network in networks for address in network}
+
+
+def _collapse_addresses(addresses: Set[int]) -> List[str]:
+    """由 ipaddress 计算覆盖给定 IPv4 地址的最小 CIDR 列表"""
+    hosts = (ipaddress.IPv4Network(value) for value in sorted(addresses))
+    return [str(network) for network in ipaddress.collapse_addresses(hosts)]
+
+
+def _exclude(networks: Iterable, removed: Iterable) -> List[str]:
+    """由 ipaddress 计算 networks 减去 removed 后的最小 CIDR 列表"""
+    remaining = list(ipaddress.collapse_addresses(networks))
+    for network in ipaddress.collapse_addresses(removed):
+        result = []
+        for candidate in remaining:
+            if not candidate.overlaps(network):
+                result.append(candidate)
+            elif candidate.supernet_of(network) and candidate != network:
+                result.extend(candidate.address_exclude(network))
+        remaining = result
+    return [str(network) for network in ipaddress.collapse_addresses(remaining)]
+
+
+def _cidrs(networks: Iterable) -> List[str]:
+    """网段对象列表转换为 CIDR 字符串列表"""
+    return [str(network) for network in networks]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_ipv4_set_operations_match_ipaddress(seed):
+    rng = random.Random(seed)
+    a = _random_networks(rng, UNIVERSE_V4, rng.randint(1, 12), 22, 32)
+    b = _random_networks(rng, UNIVERSE_V4, rng.randint(1, 12), 22, 32)
+    set_a = IntervalSet.from_cidrs(_cidrs(a), 'ipv4')
+    set_b = IntervalSet.from_cidrs(_cidrs(b), 'ipv4')
+    addresses_a, addresses_b = _addresses(a), _addresses(b)
+    
+    assert set_a.to_cidrs() == _cidrs(ipaddress.collapse_addresses(a))
+    assert (set_a | set_b).to_cidrs() == _cidrs(ipaddress.collapse_addresses(a + b))
+    assert (set_a & set_b).to_cidrs() == _collapse_addresses(addresses_a & addresses_b)
+    assert (set_a - set_b).to_cidrs() == _collapse_addresses(addresses_a - addresses_b)
+    assert (set_a - set_b).to_cidrs() == _exclude(a, b)
+    assert set_a.size == len(addresses_a)
+    
+    universe = IntervalSet.from_cidrs([str(UNIVERSE_V4)], 'ipv4')
+    assert set_a.complement(universe).to_cidrs() == _exclude([UNIVERSE_V4], a)
+    assert (~set_a).to_cidrs() == _exclude([ipaddress.IPv4Network('0.0.0.0/0')], a)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_ipv6_set_operations_match_ipaddress(seed):
+    rng = random.Random(seed)
+    a = _random_networks(rng, UNIVERSE_V6, rng.randint(1, 12), 36, 64)
+    b = _random_networks(rng, UNIVERSE_V6, rng.randint(1, 12), 36, 64)
+    set_a = IntervalSet.from_cidrs(_cidrs(a), 'ipv6')
+    set_b = IntervalSet.from_cidrs(_cidrs(b), 'ipv6')
+    
+    assert set_a.to_cidrs() == _cidrs(ipaddress.collapse_addresses(a))
+    assert (set_a | set_b).to_cidrs() == _cidrs(ipaddress.collapse_addresses(a + b))
+    assert (set_a - set_b).to_cidrs() == _exclude(a, b)
+    # A ∩ B = A - (A - B)
+    assert (set_a & set_b).to_cidrs() == _exclude(a, map(ipaddress.IPv6Network, _exclude(a, b)))
+    assert (~set_a).to_cidrs() == _exclude([ipaddress.IPv6Network('::/0')], a)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_ranges_produce_minimal_cidrs(seed):
+    rng = random.Random(seed)
+    for version, bits in (('ipv4', 32), ('ipv6', 128)):
+        ranges = []
+        for _ in range(rng.randint(1, 8)):
+            start = rng.randrange(1 << bits)
+            ranges.append((start, min(start + rng.randrange(1 << rng.randint(0, 24)), (1 << bits) - 1)))
+        ip_set = IntervalSet.from_ranges(ranges, version)
+        
+        address = ipaddress.IPv4Address if version == 'ipv4' else ipaddress.IPv6Address
+        networks = [
+            network
+            for start, end in ranges
+            for network in ipaddress.summarize_address_range(address(start), address(end))
+        ]
+        assert ip_set.to_cidrs() == _cidrs(ipaddress.collapse_addresses(networks))
+        assert list(ip_set.iter_cidrs()) == ip_set.to_cidrs()
+        assert IntervalSet.from_bytes(ip_set.to_bytes(), version) == ip_set
+
+
+def test_host_bits_and_plain_addresses():
+    ip_set = IntervalSet.from_cidrs(['10.0.0.1/24', '10.0.1.5', '10.0.1.6/31'], 'ipv4')
+    
+    assert ip_set.to_cidrs() == ['10.0.0.0/24', '10.0.1.5/32', '10.0.1.6/31']
+    with pytest.raises(ValueError):
+        IntervalSet.from_cidrs(['10.0.0.0/33'], 'ipv4')
+    with pytest.raises(ValueError):
+        IntervalSet.from_cidrs(['2001:db8::/32'], 'ipv4')
+
+
+def test_union_all_and_full():
+    sets = [IntervalSet.from_cidrs([f'10.0.{i}.0/24'], 'ipv4') for i in range(4)]
+    
+    assert IntervalSet.union_all(sets, 'ipv4').to_cidrs() == ['10.0.0.0/22']
+    assert IntervalSet.full('ipv4').to_cidrs() == ['0.0.0.0/0']
+    assert IntervalSet.full('ipv6').to_cidrs() == ['::/0']
+    assert not ~IntervalSet.full('ipv6')
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_opposite_cidr_matches_ipaddress(seed):
+    rng = random.Random(seed)
+    networks = _random_networks(rng, ipaddress.IPv4Network('0.0.0.0/0'), rng.randint(1, 10), 4, 24)
+    reserved = [ipaddress.IPv4Network(cidr) for cidr in RESERVED_IPV4_CIDRS]
+    
+    assert get_opposite_cidr(_cidrs(networks)) == _exclude(
+        [ipaddress.IPv4Network('0.0.0.0/0')], networks + reserved
+    )
+    
+    networks_v6 = _random_networks(rng, ipaddress.IPv6Network('::/0'), rng.randint(1, 10), 4, 48)
+    assert get_opposite_ipv6_cidr(_cidrs(networks_v6)) == _exclude(
+        [ipaddress.IPv6Network(GLOBAL_UNICAST_IPV6)], networks_v6
+    )
@@ -0,0 +1,112 @@
+"""
+批量 IP 查找测试
+
+随机生成的集合和地址经 LookupIndex 分类的结果与 ipaddress 的网段成员判断逐一比较，
+覆盖一级表中的整块、混合块以及 IPv6 和无效地址。
+"""
+import ipaddress
+import random
+
+import pytest
+
+from utils.interval import IntervalSet, IpVersion
+from utils.lookup import LookupIndex
+
+SEEDS = range(20)
+
+# 各 IP 版本的地址范围和随机前缀长度范围，
+# IPv4 限制在一个 /16 内，使 /24 块中既有整块也有混合块
+UNIVERSES = {
+    'ipv4': (ipaddress.ip_network('10.1.0.0/16'), (18, 30)),
+    'ipv6': (ipaddress.ip_network('2001:db8::/32'), (36, 64)),
+}
+
+
+def _random_sets(rng: random.Random):
+    """随机生成 IPv4 和 IPv6 集合，返回 (名称到网段列表, 名称到区间集合)"""
+    networks = {}
+    sets = {}
+    for i in range(rng.randint(1, 6)):
+        version: IpVersion = 'ipv4' if i % 3 else 'ipv6'
+        universe, prefixes = UNIVERSES[version]
+        chosen = []
+        for _ in range(rng.randint(1, 10)):
+            address = universe.network_address + rng.randrange(universe.num_addresses)
+            chosen.append(ipaddress.ip_network(f'{address}/{rng.randint(*prefixes)}', strict=False))
+        networks[f'set{i}'] = chosen
+        sets[f'set{i}'] = IntervalSet.from_cidrs([str(network) for network in chosen], version)
+    return networks, sets
+
+
+def _random_ips(rng: random.Random, networks, count: int):
+    """随机地址：一半取自集合内的网段，其余在整个地址范围内均匀分布"""
+    candidates = [network for chosen in networks.values() for network in chosen]
+    universes = [universe for universe, _ in UNIVERSES.values()]
+    ips = []
+    for _ in range(count):
+        network = rng.choice(candidates) if rng.random() < 0.5 else rng.choice(universes)
+        ips.append(str(network.network_address + rng.randrange(network.num_addresses)))
+    return ips
+
+
+def _expected(networks, ip: str):
+    """由 ipaddress 判断地址所属的集合名称"""
+    address = ipaddress.ip_address(ip)
+    return [
+        name for name, chosen in networks.items()
+        if any(address.version == network.version and address in network for network in chosen)
+    ]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_classify_matches_ipaddress(seed):
+    rng = random.Random(seed)
+    networks, sets = _random_sets(rng)
+    index = LookupIndex(sets)
+    
+    ips = _random_ips(rng, networks, 500)
+    masks = index.classify(ips)
+    assert [index.names_of(mask) for mask in masks] == [_expected(networks, ip) for ip in ips]
+    # 纯 IPv4 批次走快速路径
+    ipv4 = [ip for ip in ips if ':' not in ip]
+    assert list(index.classify(ipv4)) == [mask for ip, mask in zip(ips, masks) if ':' not in ip]
+    for ip in ips[:50]:
+        assert index.lookup(ip) == _expected(networks, ip)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_match_prefix_is_longest_containing_cidr(seed):
+    rng = random.Random(seed)
+    networks, sets = _random_sets(rng)
+    index = LookupIndex(sets)
+    
+    for ip in _random_ips(rng, networks, 200):
+        address = ipaddress.ip_address(ip)
+        for name in index.names:
+            containing = [
+                cidr for cidr in sets[name].to_cidrs()
+                if address.version == ipaddress.ip_network(cidr).version
+                and address in ipaddress.ip_network(cidr)
+            ]
+            assert index.match_prefix(name, ip) == (containing[0] if containing else None)
+
+
+def test_query_addresses_prefixes_and_invalid_items():
+    index = LookupIndex({
+        'a': IntervalSet.from_cidrs(['10.0.0.0/16'], 'ipv4'),
+        'b': IntervalSet.from_cidrs(['10.0.1.0/24', '10.0.2.0/25'], 'ipv4'),
+        'c': IntervalSet.from_cidrs(['2001:db8::/32'], 'ipv6'),
+    })
+    
+    assert index.query([
+        '10.0.1.1', ' 10.0.2.200 ', '10.1.0.0', '2001:db8::1', 'bad',
+        '10.0.1.0/24', '10.0.2.0/24', '2001:db8::/48', '10.0.0.0/33',
+    ]) == [
+        ['a', 'b'], ['a'], [], ['c'], None,
+        ['a', 'b'], ['a'], ['c'], None,
+    ]
+    assert index.classify(['10.0.1.1', 'bad']) == [3, None]
+    with pytest.raises(ValueError):
+        index.lookup('10.0.0.256')
+    with pytest.raises(ValueError):
+        index.match_prefix('a', 'bad')
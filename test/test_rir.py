@@ -0,0 +1,137 @@
+"""
+五大 RIR 数据多路归并测试
+
+test/data 中为五个 RIR 的小型 delegated-extended 文件，归并索引的结果与
+逐文件解析后简单求并集的结果逐一比较。
+"""
+import ipaddress
+import os
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from source.rir import DEFAULT_STATUSES, build_rir_index, iter_rir_records
+from utils.interval import IP_VERSIONS, IntervalSet
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+SOURCES = {
+    name: os.path.join(DATA_DIR, f'delegated-{name}-extended')
+    for name in ('afrinic', 'apnic', 'arin', 'ripencc', 'lacnic')
+}
+
+NaiveRecord = Tuple[str, str, str, int, int, str]  # (RIR, 国家, IP 版本, 起始地址, 结束地址, 状态)
+
+
+def _naive_records(statuses: Optional[Tuple[str, ...]] = DEFAULT_STATUSES) -> List[NaiveRecord]:
+    """用 ipaddress 逐文件解析全部 IP 记录，不经过流式解析和归并"""
+    records = []
+    for name, path in SOURCES.items():
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split('|')
+                if len(parts) < 7 or parts[1] == '*' or parts[2] not in IP_VERSIONS:
+                    continue
+                _, cc, version, ip, value, _, status = parts[:7]
+                if statuses is not None and status not in statuses:
+                    continue
+                if version == 'ipv4':
+                    start = int(ipaddress.IPv4Address(ip))
+                    end = start + int(value) - 1
+                else:
+                    network = ipaddress.IPv6Network(f'{ip}/{value}')
+                    start, end = int(network.network_address), int(network.broadcast_address)
+                records.append((name, cc, version, start, end, status))
+    return records
+
+
+def _naive_sets() -> Dict[Tuple[str, str], IntervalSet]:
+    """(国家, IP 版本) 到所有 RIR 记录并集的映射"""
+    ranges: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for _, cc, version, start, end, _ in _naive_records():
+        ranges.setdefault((cc, version), []).append((start, end))
+    return {
+        (cc, version): IntervalSet.from_ranges(bucket, 'ipv4' if version == 'ipv4' else 'ipv6')
+        for (cc, version), bucket in ranges.items()
+    }
+
+
+def test_records_are_merged_in_address_order():
+    records = list(iter_rir_records(SOURCES, statuses=None))
+    
+    keys = [(record.ip_version, record.start) for record in records]
+    assert keys == sorted(keys)
+    # 所有 IPv4 记录都在 IPv6 记录之前，且各 RIR 的记录交错出现
+    versions = [record.ip_version for record in records]
+    assert versions == sorted(versions)
+    registries = [record.registry for record in records if record.ip_version == 'ipv4']
+    assert registries[:3] == ['arin', 'apnic', 'apnic']
+    assert registries[-4:] == ['afrinic'] * 4
+    # AFRINIC 2.16.1.0 位于 RIPE NCC 2.16.0.0 与 ARIN 3.0.0.0 之间
+    mu = registries.index('afrinic')
+    assert registries[mu - 1:mu + 2] == ['ripencc', 'afrinic', 'arin']
+    
+    naive = sorted((version, start) for _, _, version, start, _, _ in _naive_records(None))
+    assert keys == naive
+
+
+def test_ip_version_filter():
+    records = list(iter_rir_records(SOURCES, ip_version='ipv6'))
+    
+    assert records
+    assert all(record.ip_version == 'ipv6' for record in records)
+    assert len(records) == sum(1 for record in _naive_records() if record[2] == 'ipv6')
+
+
+def test_default_statuses_skip_available_and_reserved():
+    records = list(iter_rir_records(SOURCES))
+    
+    assert {record.status for record in records} == set(DEFAULT_STATUSES)
+    assert all(record.country not in ('', 'ZZ') for record in records)
+    assert len(records) == len(_naive_records())
+
+
+@pytest.mark.parametrize('statuses', [None, ('assigned',), ('available', 'reserved')])
+def test_status_filter(statuses):
+    counts: Dict[str, int] = {}
+    records = list(iter_rir_records(SOURCES, statuses=statuses, counts=counts))
+    naive = _naive_records(statuses)
+    
+    if statuses is not None:
+        assert {record.status for record in records} <= set(statuses)
+    assert len(records) == len(naive)
+    # 每个数据源的记录数按过滤后的结果统计
+    assert counts == {name: sum(1 for record in naive if record[0] == name) for name in SOURCES}
+
+
+def test_adjacent_ranges_coalesce_across_registries():
+    index = build_rir_index(SOURCES)
+    
+    # APNIC 1.0.16.0/20 与 ARIN 1.0.32.0/24 状态相同，构建索引时即合并为一个区间
+    assigned = index.sets['CN', 'ipv4', 'assigned']
+    assert list(assigned) == [
+        (int(ipaddress.IPv4Address('1.0.16.0')), int(ipaddress.IPv4Address('1.0.32.255')))
+    ]
+    # ARIN 3.0.0.0/9 与 RIPE NCC 3.128.0.0/9
+    assert index.get_set('US', 'ipv4', 'allocated').to_cidrs() == ['1.0.0.0/24', '3.0.0.0/8']
+    # APNIC 2001:200::/35 (allocated) 与 RIPE NCC 2001:200:2000::/35 (assigned)
+    assert index.get_set('JP', 'ipv6').to_cidrs() == ['2001:200::/34']
+
+
+def test_country_sets_match_naive_union():
+    index = build_rir_index(SOURCES)
+    naive = _naive_sets()
+    
+    for ip_version in IP_VERSIONS:
+        countries = sorted(cc for cc, version in naive if version == ip_version)
+        assert index.countries(ip_version) == countries
+        for cc in countries:
+            assert index.get_set(cc, ip_version) == naive[cc, ip_version], (cc, ip_version)
+    
+    assert index.get_set('BR', 'ipv4').to_cidrs() == ['5.0.0.0/22']
+    # AFRINIC 相邻的两条 ZA 分配记录合并为一个 /11
+    assert index.get_set('ZA', 'ipv4').to_cidrs() == ['41.0.0.0/11']
+    assert index.get_set('EG', 'ipv6').to_cidrs() == ['2c0f:fb50::/32']
+    assert index.get_set('CN', 'ipv4').to_cidrs() == [
+        '1.0.1.0/24', '1.0.2.0/23', '1.0.16.0/20', '1.0.32.0/24'
+    ]
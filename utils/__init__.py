@@ -3,17 +3,27 @@
 
 提供 IP、数据、HTTP 等通用工具函数
 """
-from .data import file_walker, check_charset
-from .http import get_url_content
-from .ip import (
-    is_ipv4,
-    is_ipv4_cidr,
-    is_public_ipv4,
-    cidr_format,
-    get_opposite_cidr,
-    get_opposite_ipv6_cidr,
-)
-from .number import is_int
+from .lazy import lazy_exports
+
+# 子模块在首次访问其导出名称时才导入
+__getattr__, __dir__ = lazy_exports(__name__, {
+    '.data': ('file_walker', 'check_charset'),
+    '.http': (
+        'close_session', 'configure_session', 'get_session', 'get_url_content', 'iter_url_chunks', 'iter_url_lines',
+    ),
+    '.interval': ('IntervalSet',),
+    '.ip': (
+        'is_ipv4', 'is_ipv4_cidr', 'is_public_ipv4', 'cidr_format', 'canonicalize_cidr',
+        'get_opposite_cidr', 'get_opposite_ipv6_cidr', 'normalize_cidr_text', 'NormalizedCidrs',
+    ),
+    '.labelled': ('LabelledIntervalMap',),
+    '.lookup': ('LookupIndex',),
+    '.number': ('is_int',),
+    '.output': ('shard_path', 'write_bytes', 'write_lines', 'write_shards'),
+    '.profiling': ('disable_profiling', 'enable_profiling', 'stage'),
+    '.server': ('ClassifyServer',),
+    '.watch': ('Watcher', 'WatchSource', 'WatchTarget'),
+})
 
 __all__ = [
     # Data
@@ -21,13 +31,42 @@ __all__ = [
     'check_charset',
     # HTTP
     'get_url_content',
+    'iter_url_chunks',
+    'iter_url_lines',
+    'get_session',
+    'configure_session',
+    'close_session',
+    # Interval
+    'IntervalSet',
     # IP
     'is_ipv4',
     'is_ipv4_cidr',
     'is_public_ipv4',
     'cidr_format',
+    'canonicalize_cidr',
     'get_opposite_cidr',
     'get_opposite_ipv6_cidr',
+    'normalize_cidr_text',
+    'NormalizedCidrs',
+    # Labelled
+    'LabelledIntervalMap',
+    # Lookup
+    'LookupIndex',
     # Number
     'is_int',
+    # Output
+    'write_bytes',
+    'write_lines',
+    'write_shards',
+    'shard_path',
+    # Profiling
+    'enable_profiling',
+    'disable_profiling',
+    'stage',
+    # Server
+    'ClassifyServer',
+    # Watch
+    'Watcher',
+    'WatchSource',
+    'WatchTarget',
 ]
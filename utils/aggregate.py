@@ -0,0 +1,204 @@
+"""
+有损前缀聚合
+
+在路由器地址列表条目数受限时，将相邻前缀合并为超网。
+基于前缀树（由相邻前缀的最长公共前缀构成的二叉树）和优先队列，
+每一步选择新增误包含地址最少的合并，直到满足条目预算。
+"""
+import heapq
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple, Union
+
+from .interval import IP_BITS, IntervalSet, IpVersion
+from loguru import logger
+
+Prefix = Tuple[int, int]
+
+
+def parse_overclaim(value: Union[int, str], ip_version: IpVersion = 'ipv4') -> int:
+    """
+    解析误包含地址预算
+    
+    Args:
+        value: 地址数量，或 '/N' 形式表示一个 /N 网段的地址数
+        ip_version: IP 版本
+        
+    Returns:
+        允许误包含的地址数量
+        
+    Raises:
+        ValueError: 格式无效时抛出
+    """
+    bits = IP_BITS[ip_version]
+    text = str(value).strip()
+    try:
+        if text.startswith('/'):
+            prefix_len = int(text[1:])
+            if not 0 <= prefix_len <= bits:
+                raise ValueError
+            return 1 << (bits - prefix_len)
+        count = int(text)
+        if count < 0:
+            raise ValueError
+        return count
+    except ValueError:
+        raise ValueError(f'Invalid overclaim budget: {value!r}') from None
+
+
+def _overlaps(exclude: Optional[IntervalSet], start: int, end: int) -> bool:
+    """检查 [start, end] 是否与排除集合相交"""
+    if not exclude:
+        return False
+    idx = bisect_right(exclude.starts, end) - 1
+    return idx >= 0 and exclude.ends[idx] >= start
+
+
+def aggregate_prefixes(
+    prefixes: List[Prefix],
+    bits: int,
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[int] = None,
+    exclude: Optional[IntervalSet] = None
+) -> Tuple[List[Prefix], int]:
+    """
+    对有序、互不相交的前缀做有损聚合
+    
+    Args:
+        prefixes: 按地址排序且互不相交的 (网络地址, 前缀长度) 列表
+        bits: 地址位数
+        max_entries: 最大条目数
+        max_overclaim: 允许误包含的最大地址数
+        exclude: 聚合结果不得覆盖的地址集合（如保留地址段）
+        
+    Returns:
+        (聚合后的前缀列表, 误包含地址数)
+    """
+    n = len(prefixes)
+    if n < 2 or (max_entries is None and max_overclaim is None):
+        return list(prefixes), 0
+    if max_entries is not None and n <= max_entries:
+        return list(prefixes), 0
+    
+    # 相邻前缀的最长公共前缀长度，对应前缀树中二者的最近公共祖先
+    lcp = [
+        bits - (prefixes[k][0] ^ prefixes[k + 1][0]).bit_length()
+        for k in range(n - 1)
+    ]
+    
+    # 以 lcp 为键构造笛卡尔树即得到压缩前缀树：
+    # 叶子 i 编号为 i，内部节点 k 编号为 n + k
+    left = list(range(n - 1))
+    right = list(range(1, n))
+    parent = [-1] * (2 * n - 1)
+    stack: List[int] = []
+    for k in range(n - 1):
+        last = -1
+        while stack and lcp[stack[-1]] > lcp[k]:
+            last = stack.pop()
+        if last >= 0:
+            left[k] = n + last
+        if stack:
+            right[stack[-1]] = n + k
+        stack.append(k)
+    for k in range(n - 1):
+        parent[left[k]] = n + k
+        parent[right[k]] = n + k
+    
+    # 当前作为叶子的节点所覆盖的地址块大小
+    block = [1 << (bits - plen) for _, plen in prefixes] + [0] * (n - 1)
+    
+    heap: List[Tuple[int, int, int]] = []
+    
+    def node_range(k: int) -> Tuple[int, int]:
+        host_bits = bits - lcp[k]
+        start = (prefixes[k][0] >> host_bits) << host_bits
+        return start, start + (1 << host_bits) - 1
+    
+    def push_candidate(k: int) -> None:
+        if block[left[k]] and block[right[k]]:
+            start, end = node_range(k)
+            if not _overlaps(exclude, start, end):
+                extra = (end - start + 1) - block[left[k]] - block[right[k]]
+                heapq.heappush(heap, (extra, -lcp[k], k))
+    
+    for k in range(n - 1):
+        if left[k] < n and right[k] < n:
+            push_candidate(k)
+    
+    entries = n
+    overclaim = 0
+    while heap:
+        if max_entries is not None and entries <= max_entries:
+            break
+        extra, _, k = heap[0]
+        if max_overclaim is not None and overclaim + extra > max_overclaim:
+            break
+        heapq.heappop(heap)
+        block[n + k] = 1 << (bits - lcp[k])
+        entries -= 1
+        overclaim += extra
+        p = parent[n + k]
+        if p >= 0:
+            push_candidate(p - n)
+    
+    # 自根向下遍历，遇到已合并节点即输出其超网
+    result: List[Prefix] = []
+    todo = [stack[0] + n]
+    while todo:
+        node = todo.pop()
+        if node < n:
+            result.append(prefixes[node])
+        elif block[node]:
+            start, _ = node_range(node - n)
+            result.append((start, lcp[node - n]))
+        else:
+            todo.append(right[node - n])
+            todo.append(left[node - n])
+    
+    return result, overclaim
+
+
+def aggregate_cidr(
+    cidr: Iterable[str],
+    max_entries: Optional[int] = None,
+    max_overclaim: Optional[Union[int, str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    ip_version: IpVersion = 'ipv4'
+) -> List[str]:
+    """
+    将 CIDR 列表有损聚合到指定条目预算内
+    
+    Args:
+        cidr: IP 地址或 CIDR 列表
+        max_entries: 最大条目数
+        max_overclaim: 允许误包含的最大地址数，或 '/N' 形式
+        exclude: 聚合结果不得覆盖的 CIDR 列表
+        ip_version: IP 版本
+        
+    Returns:
+        聚合后的 CIDR 列表
+    """
+    input_set = IntervalSet.from_cidrs(cidr, ip_version)
+    exclude_set = IntervalSet.from_cidrs(exclude, ip_version) if exclude else None
+    budget = parse_overclaim(max_overclaim, ip_version) if max_overclaim is not None else None
+    
+    prefixes = list(input_set.iter_prefixes())
+    aggregated, overclaim = aggregate_prefixes(
+        prefixes, input_set.bits, max_entries, budget, exclude_set
+    )
+    
+    bits = input_set.bits
+    result = IntervalSet.from_ranges(
+        ((net, net + (1 << (bits - plen)) - 1) for net, plen in aggregated), ip_version
+    ).to_cidrs()
+    
+    logger.info(
+        f'Aggregated {len(prefixes)} {ip_version} CIDR entries to {len(result)}, '
+        f'overclaimed {overclaim} addresses'
+    )
+    if max_entries is not None and len(result) > max_entries:
+        logger.warning(
+            f'Could not reduce to {max_entries} entries within the overclaim budget '
+            f'and exclusions, got {len(result)}'
+        )
+    return result
@@ -0,0 +1,118 @@
+"""
+并发获取数据源
+
+在守护线程中并发执行各数据源的获取函数，每个数据源独立超时、独立处理错误，
+总耗时约等于最慢的单个数据源；超时的数据源不会拖住进程退出。
+超时从任务取得执行名额时开始计算，排队等待的时间不计入。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from .profiling import stage
+
+
+class FetchTask(NamedTuple):
+    """数据源获取任务"""
+    name: str                          # 任务名称，作为结果字典的键
+    func: Callable[..., Any]           # 获取函数
+    args: tuple = ()                   # 位置参数
+    timeout: Optional[float] = None    # 超时时间（秒），None 表示不限制
+    required: bool = True              # 失败时是否抛出异常
+    default: Any = None                # 非必需任务失败时的返回值
+    materialize: bool = False          # 是否在工作线程中将可迭代结果展开为列表
+
+
+def _run_task(task: FetchTask) -> Any:
+    """执行任务，materialize 时在工作线程中展开结果"""
+    start = time.perf_counter()
+    with stage(f'fetch.{task.name}'):
+        result = task.func(*task.args)
+        if task.materialize:
+            result = list(result)
+    logger.debug(f'Source {task.name} finished in {time.perf_counter() - start:.2f}s')
+    return result
+
+
+def fetch_concurrently(
+    tasks: Iterable[FetchTask],
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    并发执行数据源获取任务
+    
+    每个任务在单独的守护线程中执行，超时从取得执行名额时开始计算。超时的任务不再等待，
+    并立即让出名额，其线程继续在后台运行直至结束，但不会阻止进程退出。
+    
+    Args:
+        tasks: 获取任务列表
+        max_workers: 同时执行的最大任务数，默认不限制
+        
+    Returns:
+        任务名称到结果的映射
+        
+    Raises:
+        Exception: 必需任务失败或超时时，在所有任务结束后抛出第一个错误
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return {}
+    
+    slots = threading.BoundedSemaphore(max_workers) if max_workers else None
+    outcomes: Dict[str, Tuple[bool, Any]] = {}  # 任务名称 -> (是否成功, 结果或异常)
+    outcomes_lock = threading.Lock()
+    finished = {task.name: threading.Event() for task in tasks}
+    
+    def settle(task: FetchTask, ok: bool, value: Any) -> None:
+        """记录任务的第一个结果并让出名额，超时之后才返回的结果被丢弃"""
+        with outcomes_lock:
+            if task.name in outcomes:
+                return
+            outcomes[task.name] = (ok, value)
+        if slots is not None:
+            slots.release()
+        finished[task.name].set()
+    
+    def worker(task: FetchTask) -> None:
+        if slots is not None:
+            slots.acquire()
+        timer = None
+        if task.timeout is not None:
+            timeout_error = TimeoutError(f'Source {task.name} timed out after {task.timeout}s')
+            timer = threading.Timer(task.timeout, settle, (task, False, timeout_error))
+            timer.daemon = True
+            timer.start()
+        outcome: Tuple[bool, Any] = (False, RuntimeError(f'Source {task.name} aborted'))
+        try:
+            outcome = (True, _run_task(task))
+        except Exception as e:
+            outcome = (False, e)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            settle(task, *outcome)
+    
+    for task in tasks:
+        threading.Thread(target=worker, args=(task,), name=f'fetch-{task.name}', daemon=True).start()
+    
+    results: Dict[str, Any] = {}
+    first_error: Optional[BaseException] = None
+    for task in tasks:
+        finished[task.name].wait()
+        ok, value = outcomes[task.name]
+        if ok:
+            results[task.name] = value
+            continue
+        
+        if task.required:
+            logger.error(f'Failed to fetch source {task.name}: {value}')
+            first_error = first_error or value
+        else:
+            logger.warning(f'Failed to fetch source {task.name}: {value}')
+            results[task.name] = task.default
+    
+    if first_error is not None:
+        raise first_error
+    return results
@@ -1,7 +1,15 @@
+import codecs
 import os
 from typing import List
 
-import chardet
+# BOM 与对应编码，UTF-32 需在 UTF-16 之前判断
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
 
 
 def file_walker(path: str) -> List[str]:
@@ -24,6 +32,40 @@ def file_walker(path: str) -> List[str]:
     return all_files
 
 
+def detect_encoding(data: bytes) -> str:
+    """
+    检测字节数据的编码
+    
+    依次检查 BOM、无 BOM 的 UTF-16（ASCII 文本的高位字节为零）和 UTF-8，
+    都不符合时才调用 chardet。
+    
+    Args:
+        data: 文件内容或采样数据
+        
+    Returns:
+        编码名称
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+    
+    if b'\0' in data:
+        sample = data[:4096]
+        if sample[1::2].count(0) > len(sample) // 4:
+            return 'utf-16-le'
+        if sample[0::2].count(0) > len(sample) // 4:
+            return 'utf-16-be'
+    
+    try:
+        data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 采样数据可能在多字节字符中间截断
+        if e.start < len(data) - 3:
+            import chardet  # 只在无法快速判断时加载
+            return chardet.detect(data).get('encoding') or 'utf-8'
+    return 'utf-8'
+
+
 def check_charset(path: str, sample_size: int = 4096) -> str:
     """
     检测文件编码
@@ -37,5 +79,4 @@ def check_charset(path: str, sample_size: int = 4096) -> str:
     """
     with open(path, 'rb') as f:
         data = f.read(sample_size)
-        result = chardet.detect(data)
-    return result.get('encoding', 'utf-8')
+    return detect_encoding(data)
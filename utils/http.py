@@ -1,13 +1,324 @@
-from typing import Optional
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
 import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .profiling import add_fetched_bytes, stage
 
 
 DEFAULT_TIMEOUT = 30
 DEFAULT_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate',
 }
 
+DEFAULT_RETRIES = 3            # 连接失败、超时和 5xx 响应的重试次数
+DEFAULT_BACKOFF_FACTOR = 0.5   # 第 n 次重试前等待 factor * 2^(n-1) 秒
+DEFAULT_BACKOFF_JITTER = 0.5   # 每次退避额外等待的随机时间上限（秒），避免并发请求同时重试
+DEFAULT_POOL_SIZE = 10         # 每个主机保持的连接数
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'bgp-tools', 'http')
+DEFAULT_CACHE_TTL = 0                      # 缓存新鲜期（秒），0 表示每次都条件请求校验
+DEFAULT_CACHE_MAX_SIZE = 256 * 1024 * 1024  # 缓存目录最大字节数
+STALE_TEMP_AGE = 3600                      # 早于此时间（秒）的临时文件视为中断遗留，淘汰时删除
+_CHUNK_SIZE = 1024 * 1024
+
+
+class CacheMissError(requests.RequestException):
+    """离线模式下缓存未命中"""
+
+
+_session: Optional[requests.Session] = None
+_session_options = (DEFAULT_RETRIES, DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE)
+_session_lock = threading.Lock()
+
+
+def _create_session(retries: int, backoff_factor: float, pool_size: int) -> requests.Session:
+    """创建带连接池和重试策略的会话"""
+    retry_options: Dict[str, Any] = {
+        'total': retries,
+        'status_forcelist': RETRY_STATUS_CODES,
+        'allowed_methods': frozenset({'GET', 'HEAD'}),
+        'backoff_factor': backoff_factor,
+        'raise_on_status': False,  # 重试用尽后返回最后一个响应，由 raise_for_status 报告状态码
+    }
+    try:
+        retry = Retry(backoff_jitter=DEFAULT_BACKOFF_JITTER, **retry_options)
+    except TypeError:  # urllib3 < 2.0 不支持退避抖动
+        retry = Retry(**retry_options)
+    
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    获取进程内共享的 HTTP 会话
+    
+    所有数据源共用一个连接池，重复和并发请求复用 keep-alive 连接，不再重复 TLS 握手；
+    连接失败、超时和 5xx 响应按指数退避加随机抖动重试。
+    
+    Returns:
+        requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(*_session_options)
+        return _session
+
+
+def configure_session(
+    retries: int = DEFAULT_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    pool_size: int = DEFAULT_POOL_SIZE
+) -> None:
+    """
+    配置共享 HTTP 会话，已创建的会话会被关闭并在下次请求时按新配置重建
+    
+    Args:
+        retries: 重试次数，0 表示不重试
+        backoff_factor: 退避基数（秒）
+        pool_size: 每个主机保持的连接数
+    """
+    global _session_options
+    close_session()
+    _session_options = (retries, backoff_factor, pool_size)
+
+
+def close_session() -> None:
+    """关闭共享 HTTP 会话及其连接池"""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class HttpCache:
+    """
+    基于磁盘的 HTTP 响应缓存
+    
+    响应体以 URL 的 SHA-256 命名保存，元数据记录 ETag/Last-Modified，
+    过期后使用条件请求重新校验，未变化时服务器返回 304 不再传输内容。
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        ttl: int = DEFAULT_CACHE_TTL,
+        max_size: int = DEFAULT_CACHE_MAX_SIZE,
+        cache_only: bool = False
+    ) -> None:
+        """
+        Args:
+            cache_dir: 缓存目录
+            ttl: 新鲜期（秒），期内直接使用缓存不发请求
+            max_size: 缓存目录最大字节数，超出时按最近使用时间淘汰
+            cache_only: 离线模式，只使用缓存
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache_only = cache_only
+    
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f'{base}.body', f'{base}.json'
+    
+    def _load_meta(self, url: str) -> Optional[dict]:
+        body_path, meta_path = self._paths(url)
+        if not os.path.exists(body_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('url') == url else None
+    
+    def _write_meta(self, url: str, meta: dict) -> None:
+        _, meta_path = self._paths(url)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+    
+    def fetch(
+        self,
+        url: str,
+        timeout: int = DEFAULT_TIMEOUT,
+        headers: Optional[dict] = None
+    ) -> tuple:
+        """
+        获取 URL 内容并保存到缓存
+        
+        Args:
+            url: 请求的 URL
+            timeout: 超时时间(秒)
+            headers: 自定义请求头
+            
+        Returns:
+            (响应体文件路径, 文本编码)
+            
+        Raises:
+            requests.RequestException: 请求失败且无可用缓存时抛出
+        """
+        body_path, _ = self._paths(url)
+        meta = self._load_meta(url)
+        
+        if meta is not None:
+            age = time.time() - meta.get('fetched_at', 0)
+            if self.cache_only or age < self.ttl:
+                logger.debug(f'Using cached {url} (age {age:.0f}s)')
+                os.utime(body_path)
+                return body_path, meta.get('encoding')
+        elif self.cache_only:
+            raise CacheMissError(f'No cached response for {url} in cache-only mode')
+        
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            with get_session().get(url, timeout=timeout, headers=request_headers, stream=True) as response:
+                if response.status_code == 304 and meta is not None:
+                    logger.debug(f'Not modified: {url}')
+                    meta['fetched_at'] = time.time()
+                    self._write_meta(url, meta)
+                    os.utime(body_path)
+                    return body_path, meta.get('encoding')
+                
+                response.raise_for_status()
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                size = 0
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        for chunk in response.iter_content(_CHUNK_SIZE):
+                            f.write(chunk)
+                            size += len(chunk)
+                    os.replace(tmp_path, body_path)
+                except BaseException:
+                    # 下载中断（如 ChunkedEncodingError）时不留下不完整的临时文件
+                    _remove_quietly(tmp_path)
+                    raise
+                add_fetched_bytes(size)
+                
+                meta = {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'encoding': response.encoding,
+                    'fetched_at': time.time(),
+                    'size': size,
+                }
+                self._write_meta(url, meta)
+        except requests.RequestException as e:
+            if meta is None:
+                logger.error(f'HTTP request failed for {url}: {e}')
+                raise
+            logger.warning(f'HTTP request failed for {url}, using stale cache: {e}')
+            return body_path, meta.get('encoding')
+        
+        logger.debug(f'Cached {size} bytes from {url}')
+        self.evict(keep=body_path)
+        return body_path, meta['encoding']
+    
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        按最近使用时间淘汰缓存，直到总大小不超过上限
+        
+        同时删除进程被强制结束时遗留的临时文件；仍可能在写入中的较新临时文件保留。
+        
+        Args:
+            keep: 不参与淘汰的响应体文件（刚写入的条目），其大小仍计入总大小
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                try:
+                    if now - os.stat(path).st_mtime > STALE_TEMP_AGE:
+                        os.remove(path)
+                        logger.debug(f'Removed stale temporary file {path}')
+                except OSError:
+                    pass
+                continue
+            if not name.endswith('.body'):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            if path != keep:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            for stale in (path, path[:-len('.body')] + '.json'):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+            logger.debug(f'Evicted cache entry {path}')
+
+
+_cache: Optional[HttpCache] = HttpCache()
+
+
+def configure_cache(
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ttl: int = DEFAULT_CACHE_TTL,
+    max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    cache_only: bool = False
+) -> None:
+    """
+    配置全局 HTTP 缓存
+    
+    Args:
+        cache_dir: 缓存目录，None 表示禁用缓存
+        ttl: 新鲜期（秒）
+        max_size: 缓存目录最大字节数
+        cache_only: 离线模式，只使用缓存
+    """
+    global _cache
+    _cache = HttpCache(cache_dir, ttl, max_size, cache_only) if cache_dir else None
+
 
 def get_url_content(
     url: str,
@@ -28,12 +339,96 @@ def get_url_content(
     Raises:
         requests.RequestException: 请求失败时抛出
     """
-    request_headers = headers or DEFAULT_HEADERS
+    with stage('download', url=url):
+        if _cache is not None:
+            body_path, encoding = _cache.fetch(url, timeout, headers)
+            with open(body_path, 'rb') as f:
+                return f.read().decode(encoding or 'utf-8', errors='replace')
+        
+        try:
+            response = get_session().get(url, timeout=timeout, headers=headers)
+            response.raise_for_status()
+            add_fetched_bytes(len(response.content))
+            logger.debug(f'Successfully fetched {url}')
+            return response.text
+        except requests.RequestException as e:
+            logger.error(f'HTTP request failed for {url}: {e}')
+            raise
+
+
+def iter_url_chunks(
+    url: str,
+    timeout: int = DEFAULT_TIMEOUT,
+    headers: Optional[dict] = None,
+    chunk_size: int = _CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    分块读取 URL 内容（已解压），内存占用不超过一个块
+    
+    Args:
+        url: 请求的 URL
+        timeout: 超时时间(秒)
+        headers: 自定义请求头
+        chunk_size: 块大小（字节）
+        
+    Yields:
+        响应体数据块
+        
+    Raises:
+        requests.RequestException: 请求失败时抛出
+    """
+    if _cache is not None:
+        with stage('download', url=url):
+            body_path, _ = _cache.fetch(url, timeout, headers)
+        with open(body_path, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+        return
+    
+    try:
+        with get_session().get(url, timeout=timeout, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            logger.debug(f'Streaming {url}')
+            yield from response.iter_content(chunk_size)
+            add_fetched_bytes(response.raw.tell())
+    except requests.RequestException as e:
+        logger.error(f'HTTP request failed for {url}: {e}')
+        raise
+
+
+def iter_url_lines(
+    url: str,
+    timeout: int = DEFAULT_TIMEOUT,
+    headers: Optional[dict] = None
+) -> Iterator[str]:
+    """
+    逐行读取 URL 内容，不将整个响应体载入内存
+    
+    Args:
+        url: 请求的 URL
+        timeout: 超时时间(秒)
+        headers: 自定义请求头
+        
+    Yields:
+        去掉换行符的文本行
+        
+    Raises:
+        requests.RequestException: 请求失败时抛出
+    """
+    if _cache is not None:
+        with stage('download', url=url):
+            body_path, encoding = _cache.fetch(url, timeout, headers)
+        with open(body_path, 'r', encoding=encoding or 'utf-8', errors='replace') as f:
+            for line in f:
+                yield line.rstrip('\n')
+        return
+    
     try:
-        response = requests.get(url, timeout=timeout, headers=request_headers)
-        response.raise_for_status()
-        logger.debug(f'Successfully fetched {url}')
-        return response.text
+        with get_session().get(url, timeout=timeout, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or 'utf-8'
+            logger.debug(f'Streaming {url}')
+            yield from response.iter_lines(_CHUNK_SIZE, decode_unicode=True)
+            add_fetched_bytes(response.raw.tell())
     except requests.RequestException as e:
         logger.error(f'HTTP request failed for {url}: {e}')
         raise
@@ -0,0 +1,534 @@
+"""
+整数区间集合
+
+以有序、互不相交的 [start, end] 闭区间数组表示 IP 地址集合，
+提供并集、交集、差集、补集运算以及最小 CIDR 拆分。
+"""
+import socket
+import sys
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from heapq import merge
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple, Union, overload
+
+IpVersion = Literal['ipv4', 'ipv6']
+
+IP_VERSIONS: Tuple[IpVersion, ...] = ('ipv4', 'ipv6')
+
+IP_BITS = {'ipv4': 32, 'ipv6': 128}
+
+# IPv4 区间使用 uint32 数组存储，IPv6 超出机器字长，使用 int 列表存储
+_UINT32_TYPECODE: Literal['I', 'L'] = 'I' if array('I').itemsize == 4 else 'L'
+
+Range = Tuple[int, int]
+
+
+def new_storage(version: IpVersion, values: Iterable[int] = ()) -> Sequence[int]:
+    """创建区间端点存储容器"""
+    if version == 'ipv4':
+        return array(_UINT32_TYPECODE, values)
+    return list(values)
+
+
+def check_version(version: str) -> int:
+    """校验 IP 版本并返回地址位数"""
+    try:
+        return IP_BITS[version]
+    except KeyError:
+        raise ValueError(f'Unsupported IP version: {version}') from None
+
+
+def parse_cidr(cidr: str, version: IpVersion = 'ipv4') -> Range:
+    """
+    解析 IP 地址或 CIDR 为闭区间
+    
+    主机位会被清零，不带掩码的地址视为单个主机。
+    
+    Args:
+        cidr: IP 地址或 CIDR 字符串
+        version: IP 版本
+        
+    Returns:
+        (start, end) 闭区间
+        
+    Raises:
+        ValueError: 格式无效时抛出
+    """
+    bits = check_version(version)
+    family = socket.AF_INET if version == 'ipv4' else socket.AF_INET6
+    text = str(cidr).strip()
+    addr, sep, prefix = text.partition('/')
+    try:
+        value = int.from_bytes(socket.inet_pton(family, addr), 'big')
+        prefix_len = int(prefix) if sep else bits
+    except (OSError, ValueError):
+        raise ValueError(f'Invalid {version} CIDR: {cidr!r}') from None
+    if not 0 <= prefix_len <= bits:
+        raise ValueError(f'Invalid {version} CIDR: {cidr!r}')
+    
+    host_mask = (1 << (bits - prefix_len)) - 1
+    start = value & ~host_mask
+    return start, start | host_mask
+
+
+def format_ip(value: int, version: IpVersion = 'ipv4') -> str:
+    """将整数格式化为 IP 地址字符串"""
+    if version == 'ipv4':
+        return socket.inet_ntoa(value.to_bytes(4, 'big'))
+    return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, 'big'))
+
+
+def range_to_prefixes(start: int, end: int, bits: int) -> Iterator[Tuple[int, int]]:
+    """
+    将闭区间拆分为最小数量的 CIDR
+    
+    Args:
+        start: 区间起始地址
+        end: 区间结束地址（包含）
+        bits: 地址位数
+        
+    Yields:
+        (网络地址, 前缀长度)
+    """
+    while start <= end:
+        # 起始地址的对齐粒度与剩余长度共同决定本块大小
+        align_bits = (start & -start).bit_length() - 1 if start else bits
+        span_bits = (end - start + 1).bit_length() - 1
+        host_bits = min(align_bits, span_bits)
+        yield start, bits - host_bits
+        start += 1 << host_bits
+
+
+@lru_cache(maxsize=None)
+def host_masks(bits: int) -> Dict[str, int]:
+    """前缀长度字符串到主机位掩码的映射，避免逐条 int() 转换；结果被缓存共享，不应修改"""
+    return {str(prefix_len): (1 << (bits - prefix_len)) - 1 for prefix_len in range(bits + 1)}
+
+
+def coalesce(ranges: Iterable[Range]) -> Tuple[List[int], List[int]]:
+    """合并按起始地址排序的区间中重叠或相邻的部分"""
+    starts: List[int] = []
+    ends: List[int] = []
+    cur_start = cur_end = -2
+    for start, end in ranges:
+        if start <= cur_end + 1:
+            if end > cur_end:
+                cur_end = end
+            continue
+        if cur_end >= 0:
+            starts.append(cur_start)
+            ends.append(cur_end)
+        cur_start, cur_end = start, end
+    if cur_end >= 0:
+        starts.append(cur_start)
+        ends.append(cur_end)
+    return starts, ends
+
+
+class _Uint128View(Sequence[int]):
+    """
+    小端 128 位无符号整数数组的只读视图
+    
+    按下标或迭代访问时才把对应的 16 字节转换为 int，不复制底层缓冲区。
+    """
+    
+    __slots__ = ('_view',)
+    
+    def __init__(self, buffer: memoryview) -> None:
+        self._view = memoryview(buffer).cast('B')
+    
+    def __len__(self) -> int:
+        return len(self._view) // 16
+    
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+    
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[int]: ...
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, Sequence[int]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return _Uint128View(self._view[start * 16:max(start, stop) * 16])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('index out of range')
+        return int.from_bytes(self._view[index * 16:index * 16 + 16], 'little')
+    
+    def __iter__(self) -> Iterator[int]:
+        view = self._view
+        from_bytes = int.from_bytes
+        for offset in range(0, len(view), 16):
+            yield from_bytes(view[offset:offset + 16], 'little')
+
+
+class IntervalSet:
+    """
+    IP 地址区间集合
+    
+    内部以两个等长的有序数组保存互不相交、互不相邻的闭区间，
+    所有集合运算均为线性归并，结果仍保持规范形式。
+    """
+    
+    __slots__ = ('version', 'bits', 'starts', 'ends')
+    
+    def __init__(
+        self,
+        version: IpVersion = 'ipv4',
+        starts: Iterable[int] = (),
+        ends: Iterable[int] = ()
+    ) -> None:
+        """
+        直接由规范区间端点构造集合，调用方需保证区间有序且不相交
+        
+        Args:
+            version: IP 版本
+            starts: 区间起始地址
+            ends: 区间结束地址（包含）
+        """
+        self.version = version
+        self.bits = check_version(version)
+        self.starts = new_storage(version, starts)
+        self.ends = new_storage(version, ends)
+    
+    # ---------- 构造 ----------
+    
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Range], version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """
+        由任意顺序的闭区间构造集合
+        
+        Args:
+            ranges: (start, end) 区间
+            version: IP 版本
+            
+        Returns:
+            规范化后的区间集合
+        """
+        starts, ends = coalesce(sorted(ranges))
+        return cls(version, starts, ends)
+    
+    @classmethod
+    def from_cidrs(cls, cidrs: Iterable[str], version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """
+        由 IP 地址或 CIDR 字符串构造集合
+        
+        Args:
+            cidrs: IP 地址或 CIDR 列表
+            version: IP 版本
+            
+        Returns:
+            规范化后的区间集合
+            
+        Raises:
+            ValueError: 存在无效条目时抛出
+        """
+        bits = check_version(version)
+        family = socket.AF_INET if version == 'ipv4' else socket.AF_INET6
+        inet_pton = socket.inet_pton
+        from_bytes = int.from_bytes
+        masks = host_masks(bits)
+        
+        # 起止地址打包为单个整数 (start << bits | end) 排序，比排序元组快得多
+        keys: List[int] = []
+        append = keys.append
+        for cidr in cidrs:
+            addr, sep, prefix = cidr.partition('/')
+            try:
+                value = from_bytes(inet_pton(family, addr), 'big')
+                host_mask = masks[prefix] if sep else 0
+            except (OSError, KeyError):
+                # 带空白或前导零等非常规写法走慢速路径
+                start, end = parse_cidr(cidr, version)
+                append((start << bits) | end)
+                continue
+            append(((value & ~host_mask) << bits) | value | host_mask)
+        keys.sort()
+        
+        mask = (1 << bits) - 1
+        starts: List[int] = []
+        ends: List[int] = []
+        cur_start = cur_end = -2
+        for key in keys:
+            start = key >> bits
+            if start <= cur_end + 1:
+                end = key & mask
+                if end > cur_end:
+                    cur_end = end
+                continue
+            if cur_end >= 0:
+                starts.append(cur_start)
+                ends.append(cur_end)
+            cur_start, cur_end = start, key & mask
+        if cur_end >= 0:
+            starts.append(cur_start)
+            ends.append(cur_end)
+        return cls(version, starts, ends)
+    
+    @classmethod
+    def union_all(cls, sets: Iterable['IntervalSet'], version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """
+        多个集合的并集，一次多路归并完成
+        
+        Args:
+            sets: 区间集合
+            version: IP 版本
+            
+        Returns:
+            并集
+        """
+        sets = list(sets)
+        for ip_set in sets:
+            if ip_set.version != version:
+                raise ValueError(f'IP version mismatch: {ip_set.version} != {version}')
+        starts, ends = coalesce(merge(*sets))
+        return cls(version, starts, ends)
+    
+    @classmethod
+    def full(cls, version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """返回整个地址空间"""
+        bits = check_version(version)
+        return cls(version, [0], [(1 << bits) - 1])
+    
+    # ---------- 基础协议 ----------
+    
+    def __len__(self) -> int:
+        """区间数量"""
+        return len(self.starts)
+    
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+    
+    def __iter__(self) -> Iterator[Range]:
+        return zip(self.starts, self.ends)
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return (
+            self.version == other.version
+            and list(self.starts) == list(other.starts)
+            and list(self.ends) == list(other.ends)
+        )
+    
+    def __repr__(self) -> str:
+        return f'IntervalSet({self.version}, ranges={len(self)}, size={self.size})'
+    
+    def __contains__(self, value: int) -> bool:
+        idx = bisect_right(self.starts, value) - 1
+        return idx >= 0 and value <= self.ends[idx]
+    
+    @property
+    def size(self) -> int:
+        """集合包含的地址总数"""
+        return sum(self.ends) - sum(self.starts) + len(self.starts)
+    
+    # ---------- 集合运算 ----------
+    
+    def _check_compatible(self, other: 'IntervalSet') -> None:
+        if self.version != other.version:
+            raise ValueError(f'IP version mismatch: {self.version} != {other.version}')
+    
+    def union(self, other: 'IntervalSet') -> 'IntervalSet':
+        """并集"""
+        self._check_compatible(other)
+        starts, ends = coalesce(merge(self, other))
+        return IntervalSet(self.version, starts, ends)
+    
+    def difference(self, other: 'IntervalSet') -> 'IntervalSet':
+        """差集"""
+        self._check_compatible(other)
+        starts: List[int] = []
+        ends: List[int] = []
+        o_starts, o_ends = other.starts, other.ends
+        j, n = 0, len(o_starts)
+        for start, end in self:
+            # 跳过完全位于当前区间左侧的被减区间
+            while j < n and o_ends[j] < start:
+                j += 1
+            k = j
+            while k < n and o_starts[k] <= end:
+                if o_starts[k] > start:
+                    starts.append(start)
+                    ends.append(o_starts[k] - 1)
+                start = o_ends[k] + 1
+                if start > end:
+                    break
+                k += 1
+            if start <= end:
+                starts.append(start)
+                ends.append(end)
+        return IntervalSet(self.version, starts, ends)
+    
+    def intersection(self, other: 'IntervalSet') -> 'IntervalSet':
+        """交集"""
+        self._check_compatible(other)
+        starts: List[int] = []
+        ends: List[int] = []
+        a_starts, a_ends = self.starts, self.ends
+        b_starts, b_ends = other.starts, other.ends
+        i = j = 0
+        n, m = len(a_starts), len(b_starts)
+        while i < n and j < m:
+            start = max(a_starts[i], b_starts[j])
+            end = min(a_ends[i], b_ends[j])
+            if start <= end:
+                starts.append(start)
+                ends.append(end)
+            if a_ends[i] < b_ends[j]:
+                i += 1
+            else:
+                j += 1
+        return IntervalSet(self.version, starts, ends)
+    
+    def complement(self, universe: Optional['IntervalSet'] = None) -> 'IntervalSet':
+        """
+        补集
+        
+        Args:
+            universe: 全集，默认为整个地址空间
+            
+        Returns:
+            universe 中不属于当前集合的部分
+        """
+        if universe is None:
+            universe = IntervalSet.full(self.version)
+        return universe.difference(self)
+    
+    __or__ = union
+    __sub__ = difference
+    __and__ = intersection
+    
+    def __invert__(self) -> 'IntervalSet':
+        return self.complement()
+    
+    # ---------- 序列化 ----------
+    
+    def to_bytes(self) -> bytes:
+        """
+        序列化为小端字节串：全部起始地址在前，全部结束地址在后
+        
+        IPv4 每个端点 4 字节，IPv6 每个端点 16 字节。
+        """
+        if self.version == 'ipv4':
+            starts, ends = array(_UINT32_TYPECODE, self.starts), array(_UINT32_TYPECODE, self.ends)
+            if sys.byteorder == 'big':
+                starts.byteswap()
+                ends.byteswap()
+            return starts.tobytes() + ends.tobytes()
+        return b''.join(v.to_bytes(16, 'little') for v in self.starts) + b''.join(
+            v.to_bytes(16, 'little') for v in self.ends
+        )
+    
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, memoryview], version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """
+        从 to_bytes 生成的字节串还原集合
+        
+        Args:
+            data: 序列化数据
+            version: IP 版本
+            
+        Returns:
+            区间集合
+            
+        Raises:
+            ValueError: 数据长度无效时抛出
+        """
+        width = check_version(version) // 8
+        if len(data) % (2 * width):
+            raise ValueError(f'Invalid {version} interval data length: {len(data)}')
+        half = len(data) // 2
+        if version == 'ipv4':
+            values = array(_UINT32_TYPECODE)
+            values.frombytes(data)
+            if sys.byteorder == 'big':
+                values.byteswap()
+            count = len(values) // 2
+            return cls(version, values[:count], values[count:])
+        
+        view = memoryview(data)
+        from_bytes = int.from_bytes
+        numbers = [from_bytes(view[i:i + width], 'little') for i in range(0, len(data), width)]
+        count = half // width
+        return cls(version, numbers[:count], numbers[count:])
+    
+    @classmethod
+    def from_buffer(cls, buffer: memoryview, version: IpVersion = 'ipv4') -> 'IntervalSet':
+        """
+        直接引用 to_bytes 格式的缓冲区（如 mmap）构造集合，不解析也不复制数据
+        
+        IPv4 端点为缓冲区上的 uint32 视图，IPv6 端点在访问时才转换为 int；
+        大端平台上退化为 from_bytes。集合存活期间缓冲区必须保持有效，且不应再修改。
+        
+        Args:
+            buffer: 序列化数据
+            version: IP 版本
+            
+        Returns:
+            区间集合
+            
+        Raises:
+            ValueError: 数据长度无效时抛出
+        """
+        width = check_version(version) // 8
+        view = memoryview(buffer).cast('B')
+        if len(view) % (2 * width):
+            raise ValueError(f'Invalid {version} interval data length: {len(view)}')
+        values: Sequence[int]
+        if version == 'ipv4':
+            if sys.byteorder == 'big':
+                return cls.from_bytes(view, version)
+            values = view.cast(_UINT32_TYPECODE)
+        else:
+            values = _Uint128View(view)
+        
+        count = len(values) // 2
+        ip_set = cls.__new__(cls)
+        ip_set.version = version
+        ip_set.bits = width * 8
+        ip_set.starts = values[:count]
+        ip_set.ends = values[count:]
+        return ip_set
+    
+    # ---------- 输出 ----------
+    
+    def iter_prefixes(self) -> Iterator[Tuple[int, int]]:
+        """按地址顺序输出最小 CIDR 拆分结果 (网络地址, 前缀长度)"""
+        bits = self.bits
+        for start, end in self:
+            yield from range_to_prefixes(start, end, bits)
+    
+    def iter_cidrs(self) -> Iterator[str]:
+        """按地址顺序输出最小 CIDR 字符串"""
+        bits = self.bits
+        if self.version == 'ipv4':
+            for start, end in self:
+                # 内联 range_to_prefixes，IPv4 输出是补集计算的主要耗时
+                while start <= end:
+                    align_bits = (start & -start).bit_length() - 1 if start else bits
+                    span_bits = (end - start + 1).bit_length() - 1
+                    host_bits = align_bits if align_bits < span_bits else span_bits
+                    yield (
+                        f'{start >> 24}.{start >> 16 & 255}.{start >> 8 & 255}.{start & 255}'
+                        f'/{bits - host_bits}'
+                    )
+                    start += 1 << host_bits
+        else:
+            inet_ntop = socket.inet_ntop
+            family = socket.AF_INET6
+            for start, end in self:
+                while start <= end:
+                    align_bits = (start & -start).bit_length() - 1 if start else bits
+                    span_bits = (end - start + 1).bit_length() - 1
+                    host_bits = align_bits if align_bits < span_bits else span_bits
+                    yield f'{inet_ntop(family, start.to_bytes(16, "big"))}/{bits - host_bits}'
+                    start += 1 << host_bits
+    
+    def to_cidrs(self) -> List[str]:
+        """返回最小 CIDR 字符串列表"""
+        return list(self.iter_cidrs())
@@ -1,8 +1,10 @@
-from typing import List, Optional
+import socket
+from bisect import bisect_right
+from typing import Iterable, List, NamedTuple, Optional, Union
 
-import netaddr
 from IPy import IP
 
+from .interval import IntervalSet, IpVersion, format_ip, host_masks
 from .number import is_int
 from loguru import logger
 
@@ -26,9 +28,29 @@ RESERVED_IPV4_CIDRS = [
     '240.0.0.0/4',      # 保留
     '255.255.255.255/32',  # 广播
 ]
+RESERVED_IPV4_SET = IntervalSet.from_cidrs(RESERVED_IPV4_CIDRS, 'ipv4')
 
 # 全球单播 IPv6 地址段
 GLOBAL_UNICAST_IPV6 = '2000::/3'
+GLOBAL_UNICAST_IPV6_SET = IntervalSet.from_cidrs([GLOBAL_UNICAST_IPV6], 'ipv6')
+
+# 全球单播 IPv6 地址段中的保留地址段
+RESERVED_IPV6_CIDRS = [
+    '2001::/23',        # IETF 协议分配
+    '2001:db8::/32',    # 文档示例
+    '3fff::/20',        # 文档示例
+]
+
+# 非公网地址表：IPv4 为保留地址段，IPv6 为全球单播以外及其中的保留地址段
+_NON_PUBLIC_SETS = {
+    'ipv4': RESERVED_IPV4_SET,
+    'ipv6': ~GLOBAL_UNICAST_IPV6_SET | IntervalSet.from_cidrs(RESERVED_IPV6_CIDRS, 'ipv6'),
+}
+
+# 批量规范化用的查找表：非公网区间的起止点列表
+_NON_PUBLIC_BOUNDS = {
+    version: (list(ip_set.starts), list(ip_set.ends)) for version, ip_set in _NON_PUBLIC_SETS.items()
+}
 
 
 def is_ipv4(ip: str) -> bool:
@@ -88,6 +110,31 @@ def cidr_format(x: str) -> Optional[str]:
     return None
 
 
+def canonicalize_cidr(cidr: Iterable[str], ip_version: IpVersion = 'ipv4') -> List[str]:
+    """
+    规范化 CIDR 列表：排序、去重并合并重叠或相邻的网段（无损）
+    
+    Args:
+        cidr: IP 地址或 CIDR 列表
+        ip_version: IP 版本，'ipv4' 或 'ipv6'
+        
+    Returns:
+        覆盖相同地址的最小 CIDR 列表
+        
+    Raises:
+        ValueError: 存在无效 CIDR 时抛出
+    """
+    cidr = list(cidr)
+    canonical_cidr = IntervalSet.from_cidrs(cidr, ip_version).to_cidrs()
+    
+    removed = len(cidr) - len(canonical_cidr)
+    logger.info(
+        f'Canonicalized {len(cidr)} {ip_version} CIDR entries to {len(canonical_cidr)} '
+        f'(removed {removed})'
+    )
+    return canonical_cidr
+
+
 def get_opposite_cidr(cidr: List[str]) -> List[str]:
     """
     获取给定 CIDR 列表的补集（排除保留地址段）
@@ -97,13 +144,13 @@ def get_opposite_cidr(cidr: List[str]) -> List[str]:
         
     Returns:
         补集 CIDR 列表
+        
+    Raises:
+        ValueError: 存在无效 CIDR 时抛出
     """
-    full_set = netaddr.IPSet(['0.0.0.0/0'])
-    input_set = netaddr.IPSet(cidr)
-    reserved_set = netaddr.IPSet(RESERVED_IPV4_CIDRS)
-    
-    opposite_set = full_set ^ input_set ^ reserved_set
-    opposite_cidr = [str(c.cidr) for c in opposite_set.iter_cidrs()]
+    input_set = IntervalSet.from_cidrs(cidr, 'ipv4')
+    opposite_set = IntervalSet.full('ipv4') - input_set - RESERVED_IPV4_SET
+    opposite_cidr = opposite_set.to_cidrs()
     
     logger.info(f'Generated {len(opposite_cidr)} opposite IPv4 CIDR entries')
     return opposite_cidr
@@ -118,13 +165,150 @@ def get_opposite_ipv6_cidr(cidr: List[str]) -> List[str]:
         
     Returns:
         补集 CIDR 列表
+        
+    Raises:
+        ValueError: 存在无效 CIDR 时抛出
     """
-    global_unicast = netaddr.IPSet([GLOBAL_UNICAST_IPV6])
-    input_set = netaddr.IPSet(cidr)
-    
-    opposite_set = global_unicast ^ input_set
-    opposite_cidr = [str(c.cidr) for c in opposite_set.iter_cidrs()]
+    input_set = IntervalSet.from_cidrs(cidr, 'ipv6')
+    opposite_set = GLOBAL_UNICAST_IPV6_SET - input_set
+    opposite_cidr = opposite_set.to_cidrs()
     
     logger.info(f'Generated {len(opposite_cidr)} opposite IPv6 CIDR entries')
     return opposite_cidr
 
+
+class CidrEntry(NamedTuple):
+    """规范化后的 CIDR 条目"""
+    line: int           # 行号（从 1 开始）
+    ip_version: IpVersion   # 'ipv4' 或 'ipv6'
+    network: int        # 网络地址
+    prefix_len: int     # 前缀长度
+    public: bool        # 是否完全位于公网地址空间
+    
+    @property
+    def cidr(self) -> str:
+        """CIDR 字符串"""
+        return f'{format_ip(self.network, self.ip_version)}/{self.prefix_len}'
+
+
+class CidrError(NamedTuple):
+    """无效的输入行"""
+    line: int           # 行号（从 1 开始）
+    text: str           # 原始内容
+    reason: str         # 错误原因
+
+
+class NormalizedCidrs(NamedTuple):
+    """批量规范化结果"""
+    entries: List[CidrEntry]
+    errors: List[CidrError]
+    
+    def to_cidrs(self, ip_version: Optional[str] = None, public_only: bool = False) -> List[str]:
+        """
+        按输入顺序返回 CIDR 字符串
+        
+        Args:
+            ip_version: 只返回指定 IP 版本，None 表示全部
+            public_only: 只返回公网条目
+            
+        Returns:
+            CIDR 列表
+        """
+        return [
+            entry.cidr for entry in self.entries
+            if (ip_version is None or entry.ip_version == ip_version)
+            and (entry.public or not public_only)
+        ]
+    
+    def to_set(self, ip_version: IpVersion = 'ipv4', public_only: bool = False) -> IntervalSet:
+        """
+        返回指定 IP 版本条目的区间集合
+        
+        Args:
+            ip_version: IP 版本
+            public_only: 只包含公网条目
+            
+        Returns:
+            区间集合
+        """
+        bits = 32 if ip_version == 'ipv4' else 128
+        return IntervalSet.from_ranges((
+            (entry.network, entry.network + (1 << (bits - entry.prefix_len)) - 1)
+            for entry in self.entries
+            if entry.ip_version == ip_version and (entry.public or not public_only)
+        ), ip_version)
+
+
+def normalize_cidr_text(
+    text: Union[str, Iterable[str]],
+    ip_version: Optional[str] = None,
+    allow_host_bits: bool = False
+) -> NormalizedCidrs:
+    """
+    一次遍历批量校验并解析 IP 地址/CIDR 文本
+    
+    每行一个条目，忽略空行和 # 开头的注释行。不带掩码的地址视为 /32 或 /128。
+    地址按严格格式解析（不接受前导零、缩写等写法），主机位不为零的网段视为错误。
+    公网判断基于预先构建的保留地址表，不为每个地址构造对象。
+    
+    Args:
+        text: 整段文本或文本行
+        ip_version: 只接受指定 IP 版本，None 表示都接受
+        allow_host_bits: 是否接受主机位不为零的网段（清零后保留）
+        
+    Returns:
+        规范化条目及错误行
+    """
+    lines = text.splitlines() if isinstance(text, str) else text
+    
+    inet_pton = socket.inet_pton
+    from_bytes = int.from_bytes
+    new_entry = tuple.__new__
+    af_inet, af_inet6 = socket.AF_INET, socket.AF_INET6
+    accept_v4 = ip_version in (None, 'ipv4')
+    accept_v6 = ip_version in (None, 'ipv6')
+    
+    masks_v4, masks_v6 = host_masks(32), host_masks(128)
+    starts_v4, ends_v4 = _NON_PUBLIC_BOUNDS['ipv4']
+    starts_v6, ends_v6 = _NON_PUBLIC_BOUNDS['ipv6']
+    
+    entries: List[CidrEntry] = []
+    errors: List[CidrError] = []
+    append = entries.append
+    for line_no, raw in enumerate(lines, 1):
+        item = raw.strip()
+        if not item or item[0] == '#':
+            continue
+        
+        addr, sep, prefix = item.partition('/')
+        if ':' in addr:
+            version, family, masks, bits = 'ipv6', af_inet6, masks_v6, 128
+            starts, ends, accepted = starts_v6, ends_v6, accept_v6
+        else:
+            version, family, masks, bits = 'ipv4', af_inet, masks_v4, 32
+            starts, ends, accepted = starts_v4, ends_v4, accept_v4
+        if not accepted:
+            errors.append(CidrError(line_no, item, f'not an {ip_version} address'))
+            continue
+        try:
+            value = from_bytes(inet_pton(family, addr), 'big')
+            host_mask = masks[prefix] if sep else 0
+        except OSError:
+            errors.append(CidrError(line_no, item, f'invalid {version} address'))
+            continue
+        except KeyError:
+            errors.append(CidrError(line_no, item, 'invalid prefix length'))
+            continue
+        if value & host_mask:
+            if not allow_host_bits:
+                errors.append(CidrError(line_no, item, 'host bits set'))
+                continue
+            value &= ~host_mask
+        
+        # 与非公网地址表无交集即为公网
+        idx = bisect_right(starts, value | host_mask) - 1
+        append(new_entry(CidrEntry, (
+            line_no, version, value, bits - host_mask.bit_length(), idx < 0 or ends[idx] < value
+        )))
+    
+    return NormalizedCidrs(entries, errors)
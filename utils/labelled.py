@@ -0,0 +1,248 @@
+"""
+带来源标记的区间映射
+
+将多个来源的地址集合合并为一组有序、互不相交的区间，每个区间带有
+贡献它的来源位掩码（第 i 位表示 labels[i]）。映射由一次扫描线归并构建，
+之后合并结果、补集、单个来源的列表以及来源间的重叠统计都可直接从中得到，
+无需对每种输出重新做集合运算。
+"""
+from bisect import bisect_right
+from heapq import merge
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .interval import IntervalSet, IpVersion, check_version, coalesce, new_storage
+
+
+class LabelledRange(NamedTuple):
+    """带来源掩码的闭区间"""
+    start: int
+    end: int
+    mask: int
+
+
+class OverlapStats(NamedTuple):
+    """一种来源组合的统计"""
+    labels: Tuple[str, ...]    # 来源组合
+    ranges: int                # 区间数
+    addresses: int             # 地址数
+
+
+def _toggles(ip_set: IntervalSet, flag: int) -> Iterator[Tuple[int, int]]:
+    """集合的边界点 (地址, 来源位)，进入和离开区间时各切换一次"""
+    for start, end in ip_set:
+        yield start, flag
+        yield end + 1, flag
+
+
+class LabelledIntervalMap:
+    """
+    带来源标记的区间映射
+    
+    相邻且来源掩码相同的区间会被合并，因此区间数等于来源组合发生变化的次数。
+    """
+    
+    __slots__ = ('version', 'bits', 'labels', 'starts', 'ends', 'masks')
+    
+    def __init__(
+        self,
+        labels: Sequence[str],
+        version: IpVersion = 'ipv4',
+        starts: Iterable[int] = (),
+        ends: Iterable[int] = (),
+        masks: Iterable[int] = ()
+    ) -> None:
+        """
+        直接由规范区间构造映射，调用方需保证区间有序、不相交且掩码非零
+        
+        Args:
+            labels: 来源名称，顺序决定掩码位
+            version: IP 版本
+            starts: 区间起始地址
+            ends: 区间结束地址（包含）
+            masks: 区间的来源掩码
+        """
+        self.version = version
+        self.bits = check_version(version)
+        self.labels: List[str] = list(labels)
+        self.starts = new_storage(version, starts)
+        self.ends = new_storage(version, ends)
+        self.masks: List[int] = list(masks)
+    
+    # ---------- 构造 ----------
+    
+    @classmethod
+    def from_sets(
+        cls,
+        sets: Mapping[str, IntervalSet],
+        version: IpVersion = 'ipv4'
+    ) -> 'LabelledIntervalMap':
+        """
+        由各来源的区间集合构造映射
+        
+        各集合的边界点按地址多路归并后扫描一遍：同一地址上的边界切换对应来源位，
+        两个相邻边界点之间的来源组合不变。
+        
+        Args:
+            sets: 来源名称到区间集合的映射
+            version: IP 版本
+            
+        Returns:
+            区间映射
+            
+        Raises:
+            ValueError: 集合 IP 版本不一致时抛出
+        """
+        labels = list(sets)
+        for label in labels:
+            if sets[label].version != version:
+                raise ValueError(f'IP version mismatch: {sets[label].version} != {version}')
+        
+        starts: List[int] = []
+        ends: List[int] = []
+        masks: List[int] = []
+        mask = 0
+        prev = 0
+        for point, flag in merge(*(_toggles(sets[label], 1 << bit) for bit, label in enumerate(labels))):
+            if point != prev and mask:
+                if masks and masks[-1] == mask and ends[-1] == prev - 1:
+                    ends[-1] = point - 1
+                else:
+                    starts.append(prev)
+                    ends.append(point - 1)
+                    masks.append(mask)
+            mask ^= flag
+            prev = point
+        return cls(labels, version, starts, ends, masks)
+    
+    @classmethod
+    def from_cidrs(
+        cls,
+        sources: Mapping[str, Iterable[str]],
+        version: IpVersion = 'ipv4'
+    ) -> 'LabelledIntervalMap':
+        """
+        由各来源的 IP 地址或 CIDR 列表构造映射
+        
+        Args:
+            sources: 来源名称到 CIDR 列表的映射
+            version: IP 版本
+            
+        Returns:
+            区间映射
+            
+        Raises:
+            ValueError: 存在无效条目时抛出
+        """
+        return cls.from_sets(
+            {label: IntervalSet.from_cidrs(cidrs, version) for label, cidrs in sources.items()}, version
+        )
+    
+    # ---------- 基础协议 ----------
+    
+    def __len__(self) -> int:
+        """区间数量"""
+        return len(self.starts)
+    
+    def __iter__(self) -> Iterator[LabelledRange]:
+        return map(LabelledRange, self.starts, self.ends, self.masks)
+    
+    def __repr__(self) -> str:
+        return f'LabelledIntervalMap({self.version}, labels={self.labels}, ranges={len(self)})'
+    
+    def labels_of(self, mask: int) -> List[str]:
+        """将来源掩码转换为来源名称列表"""
+        return [label for bit, label in enumerate(self.labels) if mask >> bit & 1]
+    
+    def mask_of(self, labels: Iterable[str]) -> int:
+        """
+        将来源名称转换为掩码
+        
+        Raises:
+            KeyError: 来源名称不存在时抛出
+        """
+        mask = 0
+        for label in labels:
+            try:
+                mask |= 1 << self.labels.index(label)
+            except ValueError:
+                raise KeyError(label) from None
+        return mask
+    
+    def provenance(self, value: int) -> List[str]:
+        """
+        查询地址由哪些来源贡献
+        
+        Args:
+            value: 整数形式的地址
+            
+        Returns:
+            来源名称列表，不属于任何来源时为空
+        """
+        idx = bisect_right(self.starts, value) - 1
+        if idx < 0 or self.ends[idx] < value:
+            return []
+        return self.labels_of(self.masks[idx])
+    
+    # ---------- 输出 ----------
+    
+    def select(self, any_of: Optional[int] = None, none_of: int = 0) -> IntervalSet:
+        """
+        按来源掩码筛选区间
+        
+        Args:
+            any_of: 至少包含其中一个来源，None 表示任意来源
+            none_of: 不包含其中任何来源
+            
+        Returns:
+            筛选出的区间合并后的集合
+        """
+        ranges = (
+            (start, end) for start, end, mask in zip(self.starts, self.ends, self.masks)
+            if (any_of is None or mask & any_of) and not mask & none_of
+        )
+        starts, ends = coalesce(ranges)
+        return IntervalSet(self.version, starts, ends)
+    
+    def union(self) -> IntervalSet:
+        """所有来源的并集"""
+        return self.select()
+    
+    def source_set(self, label: str) -> IntervalSet:
+        """单个来源贡献的全部地址"""
+        return self.select(self.mask_of([label]))
+    
+    def exclusive_set(self, label: str) -> IntervalSet:
+        """只由该来源贡献、其他来源都不包含的地址"""
+        mask = self.mask_of([label])
+        return self.select(mask, ((1 << len(self.labels)) - 1) & ~mask)
+    
+    def complement(self, universe: Optional[IntervalSet] = None) -> IntervalSet:
+        """
+        所有来源并集的补集
+        
+        Args:
+            universe: 全集，默认为整个地址空间
+            
+        Returns:
+            universe 中不属于任何来源的部分
+        """
+        if universe is None:
+            universe = IntervalSet.full(self.version)
+        return universe - self.union()
+    
+    def overlap_stats(self) -> List[OverlapStats]:
+        """
+        各来源组合覆盖的区间数和地址数
+        
+        Returns:
+            按地址数从大到小排序的统计，单一来源的组合表示只由该来源贡献
+        """
+        ranges: Dict[int, int] = {}
+        addresses: Dict[int, int] = {}
+        for start, end, mask in zip(self.starts, self.ends, self.masks):
+            ranges[mask] = ranges.get(mask, 0) + 1
+            addresses[mask] = addresses.get(mask, 0) + end - start + 1
+        return sorted(
+            (OverlapStats(tuple(self.labels_of(mask)), ranges[mask], addresses[mask]) for mask in ranges),
+            key=lambda stats: (-stats.addresses, stats.labels)
+        )
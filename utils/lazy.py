@@ -0,0 +1,39 @@
+"""
+包级按需导入
+
+包的 __init__ 只声明导出名称与子模块的对应关系，首次访问某个名称时才导入其子模块，
+避免导入包时连带加载 requests、loguru 等较重的依赖。
+"""
+import importlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+
+def lazy_exports(
+    package: str,
+    exports: Dict[str, Iterable[str]]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    生成包模块的 __getattr__ 和 __dir__（PEP 562）
+    
+    Args:
+        package: 包名，即 __name__
+        exports: 相对子模块名（如 '.ip'）到导出名称的映射
+        
+    Returns:
+        (__getattr__, __dir__)
+    """
+    owners = {name: module for module, names in exports.items() for name in names}
+    namespace = importlib.import_module(package).__dict__
+    
+    def __getattr__(name: str) -> Any:
+        module = owners.get(name)
+        if module is None:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(module, package), name)
+        namespace[name] = value  # 之后的访问不再经过 __getattr__
+        return value
+    
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(owners))
+    
+    return __getattr__, __dir__
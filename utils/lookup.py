@@ -0,0 +1,290 @@
+"""
+批量 IP 查找
+
+将多个命名集合编译为查找索引，成批判断大量 IP 地址属于哪些集合。
+
+IPv4 使用按 /24 划分的一级表：每个 /24 块占一个字节，保存该块所属集合组合的编号；
+块内存在集合边界时标记为混合块，再对边界数组二分查找。整批地址的解析、移位和
+查表都经由 map 在 C 层完成，Python 层只处理少量混合块。
+"""
+import socket
+import sys
+from array import array
+from bisect import bisect_right
+from functools import partial
+from itertools import repeat
+from operator import and_, lshift, or_, rshift
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .interval import IntervalSet, IpVersion, format_ip, parse_cidr, range_to_prefixes
+
+_BLOCK_BITS = 8          # 一级表粒度：/24
+_MIXED = 255             # 混合块标记，同时限制集合组合数不超过 255 种
+
+_inet_pton4 = partial(socket.inet_pton, socket.AF_INET)
+_inet_pton6 = partial(socket.inet_pton, socket.AF_INET6)
+
+
+def _boundaries(ip_set: IntervalSet) -> List[int]:
+    """
+    区间集合的边界数组 [s0, e0 + 1, s1, e1 + 1, ...]
+    
+    地址 v 属于集合当且仅当 bisect_right(边界数组, v) 为奇数。
+    """
+    bounds: List[int] = []
+    for start, end in ip_set:
+        bounds.append(start)
+        bounds.append(end + 1)
+    return bounds
+
+
+def _parse_ip(ip: str) -> Optional[Tuple[str, int]]:
+    """解析单个 IP 地址，无效时返回 None"""
+    try:
+        if ':' in ip:
+            return 'ipv6', int.from_bytes(_inet_pton6(ip), 'big')
+        return 'ipv4', int.from_bytes(_inet_pton4(ip), 'big')
+    except OSError:
+        return None
+
+
+class LookupIndex:
+    """
+    多集合 IP 查找索引
+    
+    分类结果以位掩码表示：第 i 位为 1 表示属于 names[i] 对应的集合。
+    """
+    
+    def __init__(self, sets: Mapping[str, IntervalSet]) -> None:
+        """
+        Args:
+            sets: 集合名称到区间集合的映射，可混合 IPv4 和 IPv6 集合
+        """
+        self.names: List[str] = list(sets)
+        self.sets: Dict[str, IntervalSet] = dict(sets)
+        self._bounds: Dict[str, List[Tuple[int, List[int]]]] = {'ipv4': [], 'ipv6': []}
+        for bit, name in enumerate(self.names):
+            ip_set = sets[name]
+            self._bounds[ip_set.version].append((bit, _boundaries(ip_set)))
+        self._build_table()
+    
+    def _build_table(self) -> None:
+        """构建 IPv4 /24 一级表"""
+        # 扫描所有集合的边界点，相邻边界点之间的集合组合不变
+        toggles: Dict[int, int] = {}
+        for bit, bounds in self._bounds['ipv4']:
+            flag = 1 << bit
+            for point in bounds:
+                toggles[point] = toggles.get(point, 0) ^ flag
+        
+        table = bytearray(1 << (32 - _BLOCK_BITS))
+        masks = [0]
+        mask_ids = {0: 0}
+        block_mask = (1 << _BLOCK_BITS) - 1
+        points = sorted(toggles)
+        mask = 0
+        for k, start in enumerate(points):
+            mask ^= toggles[start]
+            if not mask:
+                continue
+            end = points[k + 1] if k + 1 < len(points) else 1 << 32   # 不含
+            
+            mask_id = mask_ids.get(mask)
+            if mask_id is None:
+                if len(masks) >= _MIXED:
+                    # 集合组合过多，退化为逐集合二分查找
+                    self._table: Optional[bytearray] = None
+                    return
+                mask_id = mask_ids[mask] = len(masks)
+                masks.append(mask)
+            
+            first = (start + block_mask) >> _BLOCK_BITS
+            last = end >> _BLOCK_BITS
+            if first < last:
+                table[first:last] = bytes((mask_id,)) * (last - first)
+            if start & block_mask:
+                table[start >> _BLOCK_BITS] = _MIXED
+            if end & block_mask:
+                table[end >> _BLOCK_BITS] = _MIXED
+        
+        self._table = table
+        self._masks = masks + [0] * (_MIXED + 1 - len(masks))
+    
+    def _resolve(self, value: int, version: str) -> int:
+        """二分查找单个地址的集合掩码"""
+        mask = 0
+        for bit, bounds in self._bounds[version]:
+            if bisect_right(bounds, value) & 1:
+                mask |= 1 << bit
+        return mask
+    
+    def _bisect_masks(self, values: Sequence[int], version: str) -> List[int]:
+        """对整批地址逐集合二分查找"""
+        masks = [0] * len(values)
+        for bit, bounds in self._bounds[version]:
+            members = map(and_, map(bisect_right, repeat(bounds), values), repeat(1))
+            masks = list(map(or_, masks, map(lshift, members, repeat(bit))))
+        return masks
+    
+    def _classify_ipv4(self, values: Sequence[int]) -> List[int]:
+        """分类整数形式的 IPv4 地址"""
+        if self._table is None:
+            return self._bisect_masks(values, 'ipv4')
+        
+        ids = bytes(map(self._table.__getitem__, map(rshift, values, repeat(_BLOCK_BITS))))
+        masks = list(map(self._masks.__getitem__, ids))
+        pos = ids.find(_MIXED)
+        while pos >= 0:
+            masks[pos] = self._resolve(values[pos], 'ipv4')
+            pos = ids.find(_MIXED, pos + 1)
+        return masks
+    
+    def classify(self, ips: Sequence[str]) -> Sequence[Optional[int]]:
+        """
+        成批分类 IP 地址
+        
+        Args:
+            ips: IP 地址字符串列表（不含空白）
+            
+        Returns:
+            每个地址的集合掩码，无效地址为 None
+        """
+        try:
+            packed = b''.join(map(_inet_pton4, ips))
+        except OSError:
+            # 含 IPv6 或无效地址，逐个解析后按版本分组
+            return self._classify_mixed(ips)
+        
+        values = array('I' if array('I').itemsize == 4 else 'L')
+        values.frombytes(packed)
+        if sys.byteorder == 'little':
+            values.byteswap()
+        return self._classify_ipv4(values)
+    
+    def _classify_mixed(self, ips: Sequence[str]) -> List[Optional[int]]:
+        """分类包含 IPv6 或无效地址的批次"""
+        result: List[Optional[int]] = [None] * len(ips)
+        groups: Dict[str, Tuple[List[int], List[int]]] = {'ipv4': ([], []), 'ipv6': ([], [])}
+        for pos, ip in enumerate(ips):
+            parsed = _parse_ip(ip)
+            if parsed is not None:
+                positions, values = groups[parsed[0]]
+                positions.append(pos)
+                values.append(parsed[1])
+        
+        positions, values = groups['ipv4']
+        for pos, mask in zip(positions, self._classify_ipv4(values)):
+            result[pos] = mask
+        positions, values = groups['ipv6']
+        for pos, mask in zip(positions, self._bisect_masks(values, 'ipv6')):
+            result[pos] = mask
+        return result
+    
+    def names_of(self, mask: int) -> List[str]:
+        """将集合掩码转换为集合名称列表"""
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+    
+    def lookup(self, ip: str) -> List[str]:
+        """
+        查询单个 IP 地址所属的集合
+        
+        Args:
+            ip: IP 地址
+            
+        Returns:
+            集合名称列表
+            
+        Raises:
+            ValueError: 地址无效时抛出
+        """
+        parsed = _parse_ip(ip.strip())
+        if parsed is None:
+            raise ValueError(f'Invalid IP address: {ip!r}')
+        return self.names_of(self._resolve(parsed[1], parsed[0]))
+    
+    def lookup_prefix(self, cidr: str) -> List[str]:
+        """
+        查询完整包含指定网段的集合
+        
+        Args:
+            cidr: IP 地址或 CIDR
+            
+        Returns:
+            集合名称列表
+            
+        Raises:
+            ValueError: CIDR 无效时抛出
+        """
+        cidr = cidr.strip()
+        version: IpVersion = 'ipv6' if ':' in cidr else 'ipv4'
+        start, end = parse_cidr(cidr, version)
+        
+        names = []
+        for name in self.names:
+            ip_set = self.sets[name]
+            if ip_set.version != version:
+                continue
+            idx = bisect_right(ip_set.starts, start) - 1
+            if idx >= 0 and ip_set.ends[idx] >= end:
+                names.append(name)
+        return names
+    
+    def query(self, items: Sequence[str]) -> List[Optional[List[str]]]:
+        """
+        成批查询 IP 地址或网段所属的集合
+        
+        IP 地址走批量分类，网段逐个查询完整包含它的集合。
+        
+        Args:
+            items: IP 地址或 CIDR 列表
+            
+        Returns:
+            每一项所属的集合名称列表，无效项为 None
+        """
+        items = [item.strip() for item in items]
+        prefixes = [pos for pos, item in enumerate(items) if '/' in item]
+        if not prefixes:
+            return [None if mask is None else self.names_of(mask) for mask in self.classify(items)]
+        
+        result: List[Optional[List[str]]] = [None] * len(items)
+        addresses = [pos for pos, item in enumerate(items) if '/' not in item]
+        masks = self.classify([items[pos] for pos in addresses])
+        for pos, mask in zip(addresses, masks):
+            if mask is not None:
+                result[pos] = self.names_of(mask)
+        for pos in prefixes:
+            try:
+                result[pos] = self.lookup_prefix(items[pos])
+            except ValueError:
+                pass
+        return result
+    
+    def match_prefix(self, name: str, ip: str) -> Optional[str]:
+        """
+        在集合的最小 CIDR 列表中做最长前缀匹配
+        
+        Args:
+            name: 集合名称
+            ip: IP 地址
+            
+        Returns:
+            包含该地址的 CIDR，不属于该集合时返回 None
+            
+        Raises:
+            ValueError: 地址无效时抛出
+        """
+        parsed = _parse_ip(ip.strip())
+        if parsed is None:
+            raise ValueError(f'Invalid IP address: {ip!r}')
+        version, value = parsed
+        ip_set = self.sets[name]
+        if ip_set.version != version:
+            return None
+        
+        idx = bisect_right(ip_set.starts, value) - 1
+        if idx < 0 or ip_set.ends[idx] < value:
+            return None
+        for net, prefix_len in range_to_prefixes(ip_set.starts[idx], ip_set.ends[idx], ip_set.bits):
+            if value < net + (1 << (ip_set.bits - prefix_len)):
+                return f'{format_ip(net, version)}/{prefix_len}'
+        return None
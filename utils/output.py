@@ -0,0 +1,255 @@
+"""
+流式原子输出
+
+逐行写入配置文件：按批编码后大块写入临时文件，写完再原子替换目标文件，
+写入过程中崩溃不会留下半截的脚本。内容与现有文件相同时保留原文件不动。
+"""
+import hashlib
+import os
+import secrets
+import shutil
+import tempfile
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .profiling import stage
+
+_BUFFER_SIZE = 1024 * 1024
+_BATCH_LINES = 4096
+
+# 临时文件以 0666 创建并由系统套用 umask，新文件与普通 open() 创建的文件权限一致；
+# 替换已有文件时沿用原文件的权限
+_TEMP_FLAGS = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+
+
+class WriteResult(NamedTuple):
+    """写入结果"""
+    lines: int      # 写入的行数
+    changed: bool   # 文件内容是否发生变化
+
+
+def _file_digest(path: str) -> bytes:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _replace_if_changed(tmp_path: str, path: str, size: int, digest: bytes) -> bool:
+    """
+    内容与目标文件不同时用临时文件原子替换目标文件，否则删除临时文件
+    
+    替换前先将临时文件落盘，崩溃后目标文件要么是旧内容，要么是完整的新内容。
+    
+    Returns:
+        目标文件是否被替换
+    """
+    with stage('write.commit', path=path, bytes=size):
+        try:
+            unchanged = os.path.getsize(path) == size and _file_digest(path) == digest
+        except OSError:
+            unchanged = False
+        
+        if unchanged:
+            os.remove(tmp_path)
+            logger.debug(f'Content unchanged, keeping {path}')
+            return False
+        
+        _fsync_file(tmp_path)
+        try:
+            shutil.copymode(path, tmp_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+        return True
+
+
+def _fsync_file(path: str) -> None:
+    """将文件内容写入磁盘"""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _temp_file(path: str) -> Tuple[int, str]:
+    """在目标文件所在目录创建临时文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = os.path.join(directory, f'.{os.path.basename(path)}.')
+    for _ in range(tempfile.TMP_MAX):
+        tmp_path = f'{prefix}{secrets.token_hex(4)}.tmp'
+        try:
+            return os.open(tmp_path, _TEMP_FLAGS, 0o666), tmp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f'No usable temporary file name for {path}')
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_lines(
+    lines: Iterable[str],
+    path: str,
+    encoding: str = 'utf-8'
+) -> WriteResult:
+    """
+    将文本行以换行符连接后原子写入文件（末尾不加换行）
+    
+    lines 可以是生成器，内存占用与行数无关。
+    
+    Args:
+        lines: 文本行
+        path: 输出文件路径
+        encoding: 文本编码
+        
+    Returns:
+        写入结果
+        
+    Raises:
+        OSError: 写入失败时抛出，目标文件保持不变
+    """
+    fd, tmp_path = _temp_file(path)
+    digest = hashlib.sha256()
+    count = 0
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb', buffering=_BUFFER_SIZE) as f:
+            it = iter(lines)
+            while True:
+                batch = list(islice(it, _BATCH_LINES))
+                if not batch:
+                    break
+                data = '\n'.join(batch)
+                if count:
+                    data = '\n' + data
+                chunk = data.encode(encoding)
+                digest.update(chunk)
+                f.write(chunk)
+                count += len(batch)
+                size += len(chunk)
+        
+        changed = _replace_if_changed(tmp_path, path, size, digest.digest())
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    
+    return WriteResult(count, changed)
+
+
+def write_bytes(chunks: Iterable[bytes], path: str) -> WriteResult:
+    """
+    将二进制数据块依次原子写入文件
+    
+    目标文件总是被替换而不是原地修改，其他进程已映射（mmap）的旧文件内容保持不变。
+    
+    Args:
+        chunks: 数据块
+        path: 输出文件路径
+        
+    Returns:
+        写入结果，lines 为写入的字节数
+        
+    Raises:
+        OSError: 写入失败时抛出，目标文件保持不变
+    """
+    fd, tmp_path = _temp_file(path)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb', buffering=_BUFFER_SIZE) as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        
+        changed = _replace_if_changed(tmp_path, path, size, digest.digest())
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    
+    return WriteResult(size, changed)
+
+
+def shard_path(path: str, index: int) -> str:
+    """
+    分片文件路径：在扩展名前插入从 1 开始的三位序号
+    
+    如 lst0-global -> lst0-global-001，out.rsc -> out-001.rsc
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}-{index:03d}{ext}'
+
+
+def write_shards(
+    lines: Iterable[str],
+    path: str,
+    max_lines: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    header: Sequence[str] = (),
+    encoding: str = 'utf-8'
+) -> List[str]:
+    """
+    将文本行按行数或字节数上限拆分为多个分片文件，每个分片以 header 开头
+    
+    分片按 shard_path(path, 1)、shard_path(path, 2) ... 命名并各自原子写入，
+    上次运行留下的多余分片会被删除。单行超过字节上限时独占一个分片。
+    
+    Args:
+        lines: 文本行
+        path: 基础文件路径
+        max_lines: 每个分片最多的行数（不含 header）
+        max_bytes: 每个分片最大的字节数（含 header）
+        header: 每个分片开头的文本行
+        encoding: 文本编码
+        
+    Returns:
+        按顺序排列的分片文件路径
+        
+    Raises:
+        ValueError: 上限无效或 header 本身超过字节上限时抛出
+        OSError: 写入失败时抛出
+    """
+    if max_lines is not None and max_lines < 1:
+        raise ValueError(f'Invalid shard line limit: {max_lines}')
+    header = list(header)
+    header_size = sum(len(line.encode(encoding)) + 1 for line in header)
+    if max_bytes is not None and header_size >= max_bytes:
+        raise ValueError(f'Shard byte limit {max_bytes} leaves no room after the header')
+    
+    paths: List[str] = []
+    batch: List[str] = []
+    size = header_size
+    
+    def flush() -> None:
+        shard = shard_path(path, len(paths) + 1)
+        write_lines(header + batch, shard, encoding)
+        paths.append(shard)
+    
+    for line in lines:
+        line_size = len(line.encode(encoding)) + 1
+        if batch and (
+            (max_lines is not None and len(batch) >= max_lines)
+            or (max_bytes is not None and size + line_size > max_bytes)
+        ):
+            flush()
+            batch = []
+            size = header_size
+        batch.append(line)
+        size += line_size
+    if batch or not paths:
+        flush()
+    
+    # 删除上次运行留下的多余分片
+    index = len(paths) + 1
+    while os.path.exists(shard_path(path, index)):
+        os.remove(shard_path(path, index))
+        logger.debug(f'Removed stale shard {shard_path(path, index)}')
+        index += 1
+    return paths
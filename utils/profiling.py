@@ -0,0 +1,233 @@
+"""
+分阶段性能跟踪
+
+用 stage() 标记处理阶段，启用跟踪后记录每个阶段的墙钟时间、线程 CPU 时间、
+网络下载字节数和 tracemalloc 内存峰值，可输出为 JSON 或 Chrome trace 格式
+（在 chrome://tracing 或 Perfetto 中打开），并可对指定阶段保存 cProfile 数据。
+
+未启用时 stage() 只做一次全局判断并返回共享的空上下文，开销可以忽略。
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+_NULL_STAGE = nullcontext()
+
+
+class StageRecord:
+    """单个阶段的跟踪记录"""
+    
+    __slots__ = ('name', 'args', 'thread', 'start', 'wall', 'cpu', 'bytes_fetched', 'peak')
+    
+    def __init__(self, name: str, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.args = args
+        self.thread = threading.get_ident()
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes_fetched = 0
+        self.peak = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'thread': self.thread,
+            'start_ms': round(self.start * 1000, 3),
+            'wall_ms': round(self.wall * 1000, 3),
+            'cpu_ms': round(self.cpu * 1000, 3),
+            'bytes_fetched': self.bytes_fetched,
+            'peak_kib': round(self.peak / 1024, 1),
+            'args': self.args,
+        }
+
+
+class Profiler:
+    """
+    阶段跟踪器
+    
+    阶段可以嵌套，每个线程维护自己的阶段栈。下载字节数计入当前线程所有未结束的阶段；
+    tracemalloc 峰值是进程级的，并发阶段的峰值会相互包含。
+    """
+    
+    def __init__(self, trace_memory: bool = True, cprofile_stage: Optional[str] = None) -> None:
+        """
+        Args:
+            trace_memory: 是否使用 tracemalloc 记录内存峰值（开销较大）
+            cprofile_stage: 对名称等于该值的阶段运行 cProfile
+        """
+        self.trace_memory = trace_memory
+        self.cprofile_stage = cprofile_stage
+        self.records: List[StageRecord] = []
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._reset_peak = getattr(tracemalloc, 'reset_peak', None)  # Python 3.9+
+    
+    def _stack(self) -> List[StageRecord]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextmanager
+    def stage(self, name: str, args: Dict[str, Any]) -> Iterator[StageRecord]:
+        record = StageRecord(name, args)
+        stack = self._stack()
+        if self.trace_memory and self._reset_peak is not None:
+            # 重置峰值前先把已观察到的峰值记入外层阶段
+            peak = tracemalloc.get_traced_memory()[1]
+            for outer in stack:
+                outer.peak = max(outer.peak, peak)
+            self._reset_peak()
+        
+        profile = None
+        if name == self.cprofile_stage:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            profile.enable()
+        
+        stack.append(record)
+        cpu_started = time.thread_time()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - started
+            record.cpu = time.thread_time() - cpu_started
+            record.start = started - self._origin
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+            if self.trace_memory:
+                record.peak = max(record.peak, tracemalloc.get_traced_memory()[1])
+                for outer in stack:
+                    outer.peak = max(outer.peak, record.peak)
+            with self._lock:
+                self.records.append(record)
+    
+    def add_bytes(self, size: int) -> None:
+        for record in self._stack():
+            record.bytes_fetched += size
+    
+    def to_json(self) -> Dict[str, Any]:
+        """按开始时间排序的阶段列表"""
+        records = sorted(self.records, key=lambda r: r.start)
+        return {
+            'trace_memory': self.trace_memory,
+            'stages': [record.to_dict() for record in records],
+        }
+    
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace event 格式（完整事件，时间单位为微秒）"""
+        pid = os.getpid()
+        events = []
+        for record in sorted(self.records, key=lambda r: r.start):
+            events.append({
+                'name': record.name,
+                'cat': record.name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': round(record.start * 1e6, 1),
+                'dur': round(record.wall * 1e6, 1),
+                'pid': pid,
+                'tid': record.thread,
+                'args': dict(
+                    record.args,
+                    cpu_ms=round(record.cpu * 1000, 3),
+                    bytes_fetched=record.bytes_fetched,
+                    peak_kib=round(record.peak / 1024, 1),
+                ),
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    
+    def save(self, path: str, trace_format: str = 'json') -> None:
+        """
+        保存跟踪结果，指定了 cProfile 阶段时另存为 <path>.<阶段名>.prof
+        
+        Args:
+            path: 输出文件路径
+            trace_format: 'json' 或 'chrome'
+        """
+        data = self.to_chrome_trace() if trace_format == 'chrome' else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        logger.info(f'Profile trace written to {path}')
+        
+        for name, profile in self.profiles.items():
+            prof_path = f'{path}.{name}.prof'
+            profile.dump_stats(prof_path)
+            logger.info(f'cProfile data for stage {name} written to {prof_path}')
+    
+    def summary(self) -> str:
+        """按开始时间列出各阶段的文本摘要"""
+        lines = [f'{"stage":<32} {"wall ms":>10} {"cpu ms":>10} {"fetched":>12} {"peak KiB":>10}']
+        for record in sorted(self.records, key=lambda r: r.start):
+            lines.append(
+                f'{record.name:<32} {record.wall * 1000:>10.1f} {record.cpu * 1000:>10.1f} '
+                f'{record.bytes_fetched:>12} {record.peak / 1024:>10.1f}'
+            )
+        return '\n'.join(lines)
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable_profiling(trace_memory: bool = True, cprofile_stage: Optional[str] = None) -> Profiler:
+    """
+    启用阶段跟踪
+    
+    Args:
+        trace_memory: 是否使用 tracemalloc 记录内存峰值
+        cprofile_stage: 对该名称的阶段运行 cProfile
+        
+    Returns:
+        跟踪器
+    """
+    global _profiler
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _profiler = Profiler(trace_memory, cprofile_stage)
+    return _profiler
+
+
+def disable_profiling() -> Optional[Profiler]:
+    """
+    停止阶段跟踪
+    
+    Returns:
+        停止前的跟踪器，未启用时为 None
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None and profiler.trace_memory:
+        tracemalloc.stop()
+    return profiler
+
+
+def stage(name: str, **args: Any) -> ContextManager[Any]:
+    """
+    标记一个处理阶段
+    
+    Args:
+        name: 阶段名称，点号前的部分作为类别，如 'fetch.cn'
+        **args: 附加到记录中的信息
+        
+    Returns:
+        上下文管理器，未启用跟踪时为空上下文
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name, args)
+
+
+def add_fetched_bytes(size: int) -> None:
+    """将网络下载的字节数计入当前线程正在进行的阶段"""
+    if _profiler is not None:
+        _profiler.add_bytes(size)
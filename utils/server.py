@@ -0,0 +1,249 @@
+"""
+本地分类服务
+
+常驻内存保存编译好的查找索引，通过 TCP 或 Unix 套接字以 JSON Lines 协议提供查询。
+后台定期重建集合，内容变化时整体替换索引引用，重建期间查询继续使用旧索引。
+
+协议（每行一个 JSON 对象，每个请求对应一行响应）：
+    {"query": ["1.2.3.4", "2400:da00::/32"]}  ->  {"results": [["cn"], null]}
+    {"op": "stats"}                            ->  {"sets": {...}, "fingerprint": ...}
+    {"op": "reload"}                           ->  {"ok": true}
+非 JSON 行按空白拆分为查询项。
+"""
+import asyncio
+import hashlib
+import json
+import signal
+import time
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from .interval import IntervalSet
+from .lookup import LookupIndex
+
+SetBuilder = Callable[[], Dict[str, IntervalSet]]
+
+_STREAM_LIMIT = 16 * 1024 * 1024  # 单行请求最大字节数
+_INLINE_QUERY_ITEMS = 1000  # 超过该查询项数的请求在工作线程中处理，不阻塞其他连接
+
+
+def _fingerprint(sets: Dict[str, IntervalSet]) -> str:
+    """集合内容指纹，用于判断重建结果是否变化"""
+    digest = hashlib.sha256()
+    for name in sorted(sets):
+        digest.update(f'{name}:{sets[name].version}:{len(sets[name])}'.encode('utf-8'))
+        digest.update(sets[name].to_bytes())
+    return digest.hexdigest()
+
+
+def _set_done(future: 'asyncio.Future[None]') -> None:
+    """结束等待中的 future，已结束时忽略"""
+    if not future.done():
+        future.set_result(None)
+
+
+def _query_size(request: Any) -> int:
+    """查询请求中的查询项数，其他请求返回 0"""
+    if isinstance(request, dict) and request.get('op', 'query') == 'query':
+        items = request.get('query')
+        if isinstance(items, list):
+            return len(items)
+    return 0
+
+
+class ClassifyServer:
+    """
+    IP 分类服务
+    
+    索引只通过替换 self.index 引用来更新，单次赋值是原子的，
+    正在处理的请求继续使用取到的旧索引。
+    """
+    
+    def __init__(self, builder: SetBuilder, refresh_interval: Optional[float] = 3600) -> None:
+        """
+        Args:
+            builder: 构建集合的函数，在工作线程中调用
+            refresh_interval: 后台重建间隔（秒），None 或 0 表示不自动重建
+        """
+        self.builder = builder
+        self.refresh_interval = refresh_interval
+        self.index: Optional[LookupIndex] = None
+        self.fingerprint: Optional[str] = None
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+        self._rebuilding: Optional[asyncio.Task] = None
+    
+    async def rebuild(self) -> bool:
+        """
+        在工作线程中重建集合，内容变化时替换索引
+        
+        Returns:
+            索引是否被替换
+            
+        Raises:
+            Exception: 构建失败时抛出，原索引保持不变
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        sets = await loop.run_in_executor(None, self.builder)
+        fingerprint = await loop.run_in_executor(None, _fingerprint, sets)
+        if fingerprint == self.fingerprint:
+            logger.info('Upstream sets unchanged, keeping current index')
+            return False
+        
+        index = await loop.run_in_executor(None, LookupIndex, sets)
+        self.index = index
+        self.fingerprint = fingerprint
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(f'Swapped in new index with {len(sets)} sets in {self.build_seconds:.2f}s')
+        return True
+    
+    def reload(self) -> None:
+        """在后台触发一次重建，已有重建进行中时忽略"""
+        if self._rebuilding is not None and not self._rebuilding.done():
+            logger.debug('Rebuild already in progress')
+            return
+        self._rebuilding = asyncio.ensure_future(self._safe_rebuild())
+    
+    async def _safe_rebuild(self) -> None:
+        try:
+            await self.rebuild()
+        except Exception as e:
+            logger.error(f'Index rebuild failed, keeping current index: {e}')
+    
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.reload()
+    
+    def handle_request(self, request: Any) -> Dict[str, Any]:
+        """
+        处理单个请求
+        
+        Args:
+            request: 解析后的请求对象
+            
+        Returns:
+            响应对象
+        """
+        index = self.index
+        if not isinstance(request, dict):
+            return {'error': 'Request must be a JSON object'}
+        
+        op = request.get('op', 'query')
+        if op == 'reload':
+            self.reload()
+            return {'ok': True}
+        if index is None:
+            return {'error': 'Index is not ready'}
+        if op == 'query':
+            items = request.get('query')
+            if isinstance(items, str):
+                items = [items]
+            if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+                return {'error': 'query must be a string or a list of strings'}
+            return {'results': index.query(items)}
+        if op == 'stats':
+            return {
+                'sets': {
+                    name: {'version': ip_set.version, 'ranges': len(ip_set)}
+                    for name, ip_set in index.sets.items()
+                },
+                'fingerprint': self.fingerprint,
+                'built_at': self.built_at,
+                'build_seconds': round(self.build_seconds, 3),
+            }
+        return {'error': f'Unknown op: {op}'}
+    
+    async def _dispatch(self, request: Any) -> Dict[str, Any]:
+        """处理请求，大批量查询交给工作线程，事件循环继续服务其他连接"""
+        if _query_size(request) > _INLINE_QUERY_ITEMS:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.handle_request, request)
+        return self.handle_request(request)
+    
+    async def _handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # 超过单行长度限制
+                    writer.write(b'{"error": "Request too large"}\n')
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                
+                if line.startswith(b'{'):
+                    try:
+                        request = json.loads(line)
+                    except ValueError as e:
+                        response: Dict[str, Any] = {'error': f'Invalid JSON: {e}'}
+                    else:
+                        response = await self._dispatch(request)
+                else:
+                    response = await self._dispatch({'query': line.decode('utf-8', 'replace').split()})
+                
+                writer.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        unix_path: Optional[str] = None
+    ) -> None:
+        """
+        构建初始索引并开始服务，直到被取消
+        
+        Args:
+            host: 监听地址
+            port: 监听端口
+            unix_path: Unix 套接字路径，指定时忽略 host/port
+        """
+        await self.rebuild()
+        
+        if unix_path:
+            server = await asyncio.start_unix_server(
+                self._handle_connection, unix_path, limit=_STREAM_LIMIT
+            )
+            logger.info(f'Serving on unix:{unix_path}')
+        else:
+            server = await asyncio.start_server(
+                self._handle_connection, host, port, limit=_STREAM_LIMIT
+            )
+            addr = server.sockets[0].getsockname()
+            logger.info(f'Serving on {addr[0]}:{addr[1]}')
+        
+        loop = asyncio.get_running_loop()
+        stop: 'asyncio.Future[None]' = loop.create_future()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+            loop.add_signal_handler(signal.SIGTERM, _set_done, stop)
+        except (AttributeError, NotImplementedError):
+            # Windows 不支持 SIGHUP 及事件循环信号处理
+            pass
+        
+        refresher = None
+        if self.refresh_interval:
+            refresher = asyncio.ensure_future(self._refresh_loop(self.refresh_interval))
+        try:
+            async with server:
+                await stop
+        finally:
+            if refresher is not None:
+                refresher.cancel()
+            logger.info('Server stopped')
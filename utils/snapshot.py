@@ -0,0 +1,195 @@
+"""
+编译数据集快照
+
+每个数据集（数据源 + IP 版本）保存为一个二进制文件：64 字节文件头之后是
+IntervalSet.to_bytes() 格式的有序区间端点。加载时用 mmap 映射文件并直接引用，
+不解析、不复制，多个进程打开同一文件时共享页缓存，几乎不占用私有内存。
+
+文件头（小端）：
+    magic     8s   b'BGPTSNAP'
+    format    H    格式版本
+    version   B    IP 版本（4 或 6）
+    -         x    保留
+    count     I    区间数
+    checksum  I    区间数据的 CRC32
+    name      44s  数据集名称（UTF-8，末尾补零）
+
+快照总是写入临时文件后原子替换，已映射旧文件的进程不受影响。
+"""
+import mmap
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from .interval import IP_BITS, IP_VERSIONS, IntervalSet, IpVersion
+from .output import write_bytes
+from .profiling import stage
+
+SNAPSHOT_MAGIC = b'BGPTSNAP'
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SUFFIX = '.snap'
+
+_HEADER = struct.Struct('<8sHBxII44s')
+
+DatasetKey = Tuple[str, IpVersion]  # (数据集名称, IP 版本)
+
+
+class Snapshot(NamedTuple):
+    """已打开的快照"""
+    name: str              # 数据集名称
+    ip_set: IntervalSet    # 引用映射内存的区间集合
+    path: str              # 文件路径
+
+
+def snapshot_path(directory: str, name: str, ip_version: IpVersion) -> str:
+    """数据集快照的文件路径，如 <directory>/cn.ipv4.snap"""
+    return os.path.join(directory, f'{name}.{ip_version}{SNAPSHOT_SUFFIX}')
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = name.encode('utf-8')
+    if len(encoded) > _HEADER.size - 20 or '/' in name or os.sep in name:
+        raise ValueError(f'Invalid dataset name: {name!r}')
+    return encoded
+
+
+def write_snapshot(path: str, name: str, ip_set: IntervalSet) -> bool:
+    """
+    写入单个数据集快照
+    
+    Args:
+        path: 快照文件路径
+        name: 数据集名称
+        ip_set: 区间集合
+        
+    Returns:
+        文件内容是否发生变化
+        
+    Raises:
+        ValueError: 数据集名称过长或包含路径分隔符时抛出
+    """
+    data = ip_set.to_bytes()
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, 4 if ip_set.version == 'ipv4' else 6,
+        len(ip_set), zlib.crc32(data), _encode_name(name)
+    )
+    return write_bytes((header, data), path).changed
+
+
+def open_snapshot(path: str, verify: bool = True) -> Snapshot:
+    """
+    以只读方式映射快照文件
+    
+    Args:
+        path: 快照文件路径
+        verify: 是否校验数据的 CRC32
+        
+    Returns:
+        快照，其中的集合直接引用映射的内存
+        
+    Raises:
+        OSError: 文件无法打开时抛出
+        ValueError: 文件格式无效或校验失败时抛出
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise ValueError(f'Invalid snapshot (truncated): {path}')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    view = memoryview(mapped)
+    magic, fmt, version, count, checksum, name = _HEADER.unpack_from(view, 0)
+    if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT or version not in (4, 6):
+        raise ValueError(f'Invalid snapshot: {path}')
+    
+    ip_version: IpVersion = 'ipv4' if version == 4 else 'ipv6'
+    data = view[_HEADER.size:]
+    if len(data) != count * 2 * IP_BITS[ip_version] // 8:
+        raise ValueError(f'Invalid snapshot (size mismatch): {path}')
+    if verify and zlib.crc32(data) != checksum:
+        raise ValueError(f'Invalid snapshot (checksum mismatch): {path}')
+    
+    return Snapshot(
+        name.rstrip(b'\0').decode('utf-8'), IntervalSet.from_buffer(data, ip_version), path
+    )
+
+
+def write_snapshots(datasets: Mapping[DatasetKey, IntervalSet], directory: str) -> int:
+    """
+    将多个数据集写入快照目录
+    
+    Args:
+        datasets: (数据集名称, IP 版本) 到区间集合的映射
+        directory: 快照目录
+        
+    Returns:
+        内容发生变化的文件数
+    """
+    os.makedirs(directory, exist_ok=True)
+    changed = 0
+    with stage('snapshot.write', datasets=len(datasets)):
+        for (name, ip_version), ip_set in sorted(datasets.items()):
+            if write_snapshot(snapshot_path(directory, name, ip_version), name, ip_set):
+                changed += 1
+    logger.info(f'Wrote {len(datasets)} snapshots to {directory} ({changed} changed)')
+    return changed
+
+
+def list_snapshots(directory: str) -> List[DatasetKey]:
+    """
+    列出快照目录中的数据集
+    
+    Args:
+        directory: 快照目录
+        
+    Returns:
+        按名称排序的 (数据集名称, IP 版本) 列表，目录不存在时为空
+    """
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    
+    keys: List[DatasetKey] = []
+    for filename in filenames:
+        stem, suffix = os.path.splitext(filename)
+        name, _, extension = stem.rpartition('.')
+        if suffix != SNAPSHOT_SUFFIX or not name:
+            continue
+        for ip_version in IP_VERSIONS:
+            if extension == ip_version:
+                keys.append((name, ip_version))
+    return sorted(keys)
+
+
+def load_snapshots(
+    directory: str,
+    keys: Optional[Iterable[DatasetKey]] = None,
+    verify: bool = True
+) -> Dict[DatasetKey, IntervalSet]:
+    """
+    映射快照目录中的数据集
+    
+    Args:
+        directory: 快照目录
+        keys: 要加载的 (数据集名称, IP 版本)，None 表示全部
+        verify: 是否校验数据的 CRC32
+        
+    Returns:
+        (数据集名称, IP 版本) 到区间集合的映射
+        
+    Raises:
+        OSError: 指定的快照不存在时抛出
+        ValueError: 快照格式无效或校验失败时抛出
+    """
+    keys = list_snapshots(directory) if keys is None else list(keys)
+    with stage('snapshot.load', datasets=len(keys)):
+        sets = {
+            (name, ip_version): open_snapshot(snapshot_path(directory, name, ip_version), verify).ip_set
+            for name, ip_version in keys
+        }
+    logger.debug(f'Mapped {len(sets)} snapshots from {directory}')
+    return sets
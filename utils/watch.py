@@ -0,0 +1,228 @@
+"""
+按变化驱动的持续生成
+
+每个数据源按自己的间隔轮询，对解析后的内容计算指纹；只有指纹变化的数据源
+才会触发依赖它的输出重新生成。输出文件只在内容变化时被替换（见 utils.output），
+据此判断输出是否真正改变，只对改变的输出执行生成后钩子。
+
+没有变化时每轮只有一次条件请求（HTTP 缓存返回 304）和一次解析，不写任何文件。
+"""
+import glob
+import hashlib
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from .concurrency import FetchTask, fetch_concurrently
+from .profiling import stage
+
+FileSignature = Optional[Tuple[int, int, int]]  # (inode, 修改时间, 大小)，文件不存在时为 None
+
+
+class WatchSource(NamedTuple):
+    """被轮询的数据源"""
+    name: str                              # 数据源名称
+    fetch: Callable[[], Iterable[str]]     # 获取函数，返回 CIDR 或 IP 列表
+    interval: float                        # 轮询间隔（秒）
+    timeout: Optional[float] = None        # 单次获取的超时时间（秒）
+
+
+class WatchTarget(NamedTuple):
+    """由数据源生成的输出"""
+    name: str                                            # 输出名称
+    sources: Tuple[str, ...]                             # 依赖的数据源
+    generate: Callable[[Dict[str, List[str]]], Any]      # 生成函数，参数为数据源名称到最新数据的映射
+    outputs: Tuple[str, ...]                             # 生成的文件或通配模式（如分片），用于判断输出是否变化
+
+
+def fingerprint(items: Iterable[str]) -> str:
+    """与顺序和重复无关的内容指纹"""
+    digest = hashlib.sha256()
+    for item in sorted(set(items)):
+        digest.update(item.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def file_signature(path: str) -> FileSignature:
+    """文件签名，输出被原子替换时 inode 随之改变"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def output_signatures(patterns: Iterable[str]) -> Dict[str, FileSignature]:
+    """
+    输出文件的签名，含通配符的模式展开为匹配的全部文件
+    
+    Args:
+        patterns: 文件路径或通配模式
+        
+    Returns:
+        文件路径到签名的映射
+    """
+    signatures = {}
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in paths:
+            signatures[path] = file_signature(path)
+    return signatures
+
+
+class Watcher:
+    """
+    数据源轮询与增量生成
+    
+    数据源数据和指纹只保存在内存中，启动后的第一轮会生成全部输出，
+    内容与磁盘上一致的输出不会被改写，也不会触发钩子。
+    """
+    
+    def __init__(
+        self,
+        sources: Sequence[WatchSource],
+        targets: Sequence[WatchTarget],
+        hook: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            sources: 数据源
+            targets: 输出
+            hook: 输出变化后执行的 shell 命令，环境变量 BGP_TOOLS_TARGET 为输出名称，
+                BGP_TOOLS_OUTPUTS 为变化的文件（以空格分隔）
+                
+        Raises:
+            ValueError: 输出依赖未定义的数据源时抛出
+        """
+        self.sources = {source.name: source for source in sources}
+        for target in targets:
+            unknown = [name for name in target.sources if name not in self.sources]
+            if unknown:
+                raise ValueError(f'Target {target.name} depends on unknown source(s): {", ".join(unknown)}')
+        self.targets = list(targets)
+        self.hook = hook
+        self.data: Dict[str, List[str]] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.next_poll: Dict[str, float] = {name: 0.0 for name in self.sources}
+        self.failed: Set[str] = set()  # 生成失败、下一轮需要重试的输出
+        self.fetch_failed: Set[str] = set()  # 最近一次获取失败的数据源
+    
+    def poll(self, names: Iterable[str]) -> Set[str]:
+        """
+        并发获取指定数据源，返回内容发生变化的数据源
+        
+        获取失败的数据源保留上一次的数据，不视为变化，并记录在 fetch_failed 中。
+        """
+        tasks = [
+            FetchTask(
+                name, self.sources[name].fetch,
+                timeout=self.sources[name].timeout, required=False, materialize=True
+            )
+            for name in names
+        ]
+        results = fetch_concurrently(tasks)
+        
+        changed = set()
+        for name, items in results.items():
+            if items is None:
+                self.fetch_failed.add(name)
+                continue
+            self.fetch_failed.discard(name)
+            items = list(items)
+            digest = fingerprint(items)
+            if digest == self.fingerprints.get(name):
+                logger.debug(f'Source {name} unchanged')
+                continue
+            logger.info(f'Source {name} changed ({len(items)} entries)')
+            self.data[name] = items
+            self.fingerprints[name] = digest
+            changed.add(name)
+        return changed
+    
+    def regenerate(self, changed: Set[str]) -> List[str]:
+        """
+        重新生成依赖已变化数据源的输出，上一轮生成失败的输出也会重试
+        
+        Args:
+            changed: 内容变化的数据源
+            
+        Returns:
+            文件内容真正发生变化的输出名称
+        """
+        updated = []
+        for target in self.targets:
+            if not changed.intersection(target.sources) and target.name not in self.failed:
+                continue
+            missing = [name for name in target.sources if name not in self.data]
+            if missing:
+                logger.warning(f'Skipping {target.name}: no data yet for {", ".join(missing)}')
+                continue
+            
+            before = output_signatures(target.outputs)
+            try:
+                with stage('watch.generate', target=target.name):
+                    target.generate({name: self.data[name] for name in target.sources})
+            except Exception as e:
+                logger.error(f'Failed to generate {target.name}: {e}')
+                self.failed.add(target.name)
+                continue
+            self.failed.discard(target.name)
+            
+            after = output_signatures(target.outputs)
+            modified = [
+                path for path in sorted(set(before) | set(after)) if before.get(path) != after.get(path)
+            ]
+            if not modified:
+                logger.info(f'Output {target.name} unchanged')
+                continue
+            logger.success(f'Output {target.name} updated: {", ".join(modified)}')
+            updated.append(target.name)
+            self._run_hook(target, modified)
+        return updated
+    
+    def _run_hook(self, target: WatchTarget, modified: List[str]) -> None:
+        if not self.hook:
+            return
+        env = dict(os.environ, BGP_TOOLS_TARGET=target.name, BGP_TOOLS_OUTPUTS=' '.join(modified))
+        result = subprocess.run(self.hook, shell=True, env=env)
+        if result.returncode != 0:
+            logger.error(f'Hook for {target.name} exited with status {result.returncode}')
+    
+    def run_once(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        轮询一次数据源并重新生成受影响的输出
+        
+        Args:
+            names: 要轮询的数据源，None 表示全部
+            
+        Returns:
+            文件内容发生变化的输出名称
+        """
+        names = list(self.sources) if names is None else list(names)
+        now = time.monotonic()
+        for name in names:
+            self.next_poll[name] = now + self.sources[name].interval
+        changed = self.poll(names)
+        return self.regenerate(changed) if changed or self.failed else []
+    
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        持续运行，直到 stop 被设置
+        
+        Args:
+            stop: 停止事件，None 表示一直运行
+        """
+        stop = stop or threading.Event()
+        intervals = ', '.join(f'{name} every {source.interval:g}s' for name, source in self.sources.items())
+        logger.info(f'Watching {intervals}')
+        while not stop.is_set():
+            now = time.monotonic()
+            due = [name for name, at in self.next_poll.items() if at <= now]
+            if due:
+                self.run_once(due)
+            stop.wait(max(0.0, min(self.next_poll.values()) - time.monotonic()))